@@ -0,0 +1,39 @@
+"""Add per-cycle CCV sequence counter
+
+Revision ID: 1ba8116d9de4
+Revises: fd485e0da8f1
+Create Date: 2026-10-17 09:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1ba8116d9de4'
+down_revision: Union[str, None] = 'fd485e0da8f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reading_cycles', sa.Column('ccv_sequence', sa.Integer(), server_default='0', nullable=False))
+
+    # Seed the counter from the readings already stored for each cycle
+    op.execute("""
+        UPDATE reading_cycles
+        SET ccv_sequence = COALESCE((
+            SELECT MAX(readings.sequence_number)
+            FROM readings
+            WHERE readings.cycle_id = reading_cycles.id
+              AND readings.reading_type = 'CCV'
+        ), 0)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('reading_cycles', 'ccv_sequence')
@@ -0,0 +1,28 @@
+"""Add test data version for cached exports
+
+Revision ID: 2460509c6c56
+Revises: 55dd9d745f49
+Create Date: 2026-10-17 14:03:27.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2460509c6c56'
+down_revision: Union[str, None] = '55dd9d745f49'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('test_sessions', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('test_sessions', 'data_version')
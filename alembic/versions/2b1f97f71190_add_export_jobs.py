@@ -0,0 +1,46 @@
+"""Add export_jobs table
+
+Revision ID: 2b1f97f71190
+Revises: 2460509c6c56
+Create Date: 2026-10-17 15:21:09.640217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b1f97f71190'
+down_revision: Union[str, None] = '2460509c6c56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('export_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('test_id', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('size_bytes', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['test_id'], ['test_sessions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_export_jobs_id'), 'export_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_export_jobs_test_id'), 'export_jobs', ['test_id'], unique=False)
+    op.create_index('ix_export_jobs_status_id', 'export_jobs', ['status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_export_jobs_status_id', table_name='export_jobs')
+    op.drop_index(op.f('ix_export_jobs_test_id'), table_name='export_jobs')
+    op.drop_index(op.f('ix_export_jobs_id'), table_name='export_jobs')
+    op.drop_table('export_jobs')
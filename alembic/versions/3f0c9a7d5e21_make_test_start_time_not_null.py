@@ -0,0 +1,40 @@
+"""Make test_sessions.start_time not null
+
+Revision ID: 3f0c9a7d5e21
+Revises: c85d6246d351
+Create Date: 2026-10-17 16:12:40.531208
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f0c9a7d5e21'
+down_revision: Union[str, None] = 'c85d6246d351'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination and its cursors need a start time on every test, the
+    # first cycle's is the closest for tests without one, else the bank's creation
+    op.execute("""
+        UPDATE test_sessions SET start_time = COALESCE(
+            (SELECT MIN(reading_cycles.start_time) FROM reading_cycles WHERE reading_cycles.test_id = test_sessions.id),
+            (SELECT battery_banks.created_at FROM battery_banks WHERE battery_banks.id = test_sessions.bank_id),
+            CURRENT_TIMESTAMP
+        )
+        WHERE start_time IS NULL
+    """)
+    with op.batch_alter_table('test_sessions') as batch_op:
+        batch_op.alter_column('start_time', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('test_sessions') as batch_op:
+        batch_op.alter_column('start_time', existing_type=sa.DateTime(), nullable=True)
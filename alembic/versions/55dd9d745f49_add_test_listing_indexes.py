@@ -0,0 +1,37 @@
+"""Add indexes for keyset-paginated test listings
+
+Revision ID: 55dd9d745f49
+Revises: 801cd5630e67
+Create Date: 2026-10-17 15:21:07.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '55dd9d745f49'
+down_revision: Union[str, None] = '801cd5630e67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_battery_banks_name', 'battery_banks', ['name'], unique=False)
+    op.create_index('ix_test_sessions_start_time_id', 'test_sessions', ['start_time', 'id'], unique=False)
+    op.create_index('ix_test_sessions_status_start_time_id', 'test_sessions', ['status', 'start_time', 'id'], unique=False)
+    # Supersedes the plain bank_id index, which is its prefix
+    op.create_index('ix_test_sessions_bank_start_time_id', 'test_sessions', ['bank_id', 'start_time', 'id'], unique=False)
+    op.drop_index('ix_test_sessions_bank_id', table_name='test_sessions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_test_sessions_bank_id', 'test_sessions', ['bank_id'], unique=False)
+    op.drop_index('ix_test_sessions_bank_start_time_id', table_name='test_sessions')
+    op.drop_index('ix_test_sessions_status_start_time_id', table_name='test_sessions')
+    op.drop_index('ix_test_sessions_start_time_id', table_name='test_sessions')
+    op.drop_index('ix_battery_banks_name', table_name='battery_banks')
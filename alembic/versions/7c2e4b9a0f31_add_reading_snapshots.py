@@ -0,0 +1,47 @@
+"""Add reading_snapshots table
+
+Revision ID: 7c2e4b9a0f31
+Revises: 1ba8116d9de4
+Create Date: 2026-10-17 11:40:18.226941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2e4b9a0f31'
+down_revision: Union[str, None] = '1ba8116d9de4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # float8[] on PostgreSQL, packed float32 bytes elsewhere (see models.CellValues)
+    if op.get_bind().dialect.name == 'postgresql':
+        values_type = postgresql.ARRAY(sa.Float(precision=53))
+    else:
+        values_type = sa.LargeBinary()
+
+    op.create_table('reading_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cycle_id', sa.Integer(), nullable=False),
+    sa.Column('reading_type', sa.String(length=3), nullable=False),
+    sa.Column('sequence_number', sa.Integer(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('phase', sa.String(length=20), nullable=False),
+    sa.Column('values', values_type, nullable=False),
+    sa.ForeignKeyConstraint(['cycle_id'], ['reading_cycles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reading_snapshots_id'), 'reading_snapshots', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_reading_snapshots_id'), table_name='reading_snapshots')
+    op.drop_table('reading_snapshots')
@@ -0,0 +1,34 @@
+"""Add composite indexes for the hot query paths
+
+Revision ID: 801cd5630e67
+Revises: 7c2e4b9a0f31
+Create Date: 2026-10-17 13:05:52.617304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '801cd5630e67'
+down_revision: Union[str, None] = '7c2e4b9a0f31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_test_sessions_bank_id', 'test_sessions', ['bank_id'], unique=False)
+    op.create_index('ix_reading_cycles_test_lookup', 'reading_cycles', ['test_id', 'cycle_number', 'phase', 'status'], unique=False)
+    op.create_index('ix_readings_cycle_type_seq_cell', 'readings', ['cycle_id', 'reading_type', 'sequence_number', 'cell_number'], unique=False)
+    op.create_index('ix_reading_snapshots_cycle_type_seq', 'reading_snapshots', ['cycle_id', 'reading_type', 'sequence_number'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reading_snapshots_cycle_type_seq', table_name='reading_snapshots')
+    op.drop_index('ix_readings_cycle_type_seq_cell', table_name='readings')
+    op.drop_index('ix_reading_cycles_test_lookup', table_name='reading_cycles')
+    op.drop_index('ix_test_sessions_bank_id', table_name='test_sessions')
@@ -0,0 +1,32 @@
+"""Add export job heartbeat and attempt
+
+Revision ID: 9d4e61b2c8a7
+Revises: 3f0c9a7d5e21
+Create Date: 2026-10-17 17:05:12.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e61b2c8a7'
+down_revision: Union[str, None] = '3f0c9a7d5e21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('export_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.add_column('export_jobs', sa.Column('attempt', sa.Integer(), server_default='0', nullable=False))
+    # Jobs running now are judged by their start until their worker's next heartbeat
+    op.execute("UPDATE export_jobs SET heartbeat_at = started_at WHERE status = 'running'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('export_jobs', 'attempt')
+    op.drop_column('export_jobs', 'heartbeat_at')
@@ -0,0 +1,151 @@
+"""Add cycle_cell_summary table
+
+Revision ID: c68a7c36c46f
+Revises: 2b1f97f71190
+Create Date: 2026-10-17 02:29:46.207360
+
+"""
+from array import array
+from itertools import groupby
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c68a7c36c46f'
+down_revision: Union[str, None] = '2b1f97f71190'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cycle_cell_summary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cycle_id', sa.Integer(), nullable=False),
+    sa.Column('phase', sa.String(length=20), nullable=False),
+    sa.Column('reading_type', sa.String(length=3), nullable=False),
+    sa.Column('cell_number', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('min_value', sa.Float(), nullable=False),
+    sa.Column('max_value', sa.Float(), nullable=False),
+    sa.Column('mean', sa.Float(), nullable=False),
+    sa.Column('m2', sa.Float(), nullable=False),
+    sa.Column('last_value', sa.Float(), nullable=False),
+    sa.Column('last_timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['cycle_id'], ['reading_cycles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_cycle_cell_summary_cycle_type_cell', 'cycle_cell_summary', ['cycle_id', 'reading_type', 'cell_number'], unique=True)
+    op.create_index(op.f('ix_cycle_cell_summary_id'), 'cycle_cell_summary', ['id'], unique=False)
+
+    # Summarize the readings stored so far, later ones are added as they arrive
+    op.execute(BACKFILL_READINGS)
+    _backfill_snapshots(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cycle_cell_summary_id'), table_name='cycle_cell_summary')
+    op.drop_index('ix_cycle_cell_summary_cycle_type_cell', table_name='cycle_cell_summary')
+    op.drop_table('cycle_cell_summary')
+
+
+# Exact two-pass statistics, m2 is summed around the group's mean
+BACKFILL_READINGS = """
+INSERT INTO cycle_cell_summary
+    (cycle_id, phase, reading_type, cell_number, count, min_value, max_value, mean, m2, last_value, last_timestamp)
+SELECT g.cycle_id, g.phase, g.reading_type, g.cell_number, g.count, g.min_value, g.max_value, g.mean,
+    (SELECT SUM((r.value - g.mean) * (r.value - g.mean)) FROM readings r
+     WHERE r.cycle_id = g.cycle_id AND r.reading_type = g.reading_type AND r.cell_number = g.cell_number),
+    (SELECT r.value FROM readings r
+     WHERE r.cycle_id = g.cycle_id AND r.reading_type = g.reading_type AND r.cell_number = g.cell_number
+     ORDER BY r.timestamp DESC, r.id DESC LIMIT 1),
+    COALESCE(g.last_timestamp, CURRENT_TIMESTAMP)
+FROM (
+    SELECT cycle_id, MIN(phase) AS phase, reading_type, cell_number, COUNT(*) AS count,
+        MIN(value) AS min_value, MAX(value) AS max_value, AVG(value) AS mean, MAX(timestamp) AS last_timestamp
+    FROM readings
+    GROUP BY cycle_id, reading_type, cell_number
+) g
+"""
+
+summary = sa.table(
+    'cycle_cell_summary',
+    sa.column('id', sa.Integer()),
+    sa.column('cycle_id', sa.Integer()),
+    sa.column('phase', sa.String()),
+    sa.column('reading_type', sa.String()),
+    sa.column('cell_number', sa.Integer()),
+    sa.column('count', sa.Integer()),
+    sa.column('min_value', sa.Float()),
+    sa.column('max_value', sa.Float()),
+    sa.column('mean', sa.Float()),
+    sa.column('m2', sa.Float()),
+    sa.column('last_value', sa.Float()),
+    sa.column('last_timestamp', sa.DateTime()),
+)
+
+
+def _backfill_snapshots(bind):
+    # Packed values can't be aggregated in SQL, each cycle's snapshots are read
+    # in time order and folded in here, into the rows above if a cycle has both
+    snapshots = sa.table(
+        'reading_snapshots',
+        sa.column('id', sa.Integer()),
+        sa.column('cycle_id', sa.Integer()),
+        sa.column('reading_type', sa.String()),
+        sa.column('phase', sa.String()),
+        sa.column('timestamp', sa.DateTime()),
+        sa.column('values'),
+    )
+    rows = bind.execute(
+        sa.select(snapshots.c.cycle_id, snapshots.c.reading_type, snapshots.c.phase,
+                  snapshots.c.timestamp, snapshots.c['values'])
+        .order_by(snapshots.c.cycle_id, snapshots.c.reading_type, snapshots.c.timestamp, snapshots.c.id)
+    )
+    for (cycle_id, reading_type), group in groupby(rows, key=lambda row: (row[0], row[1])):
+        stored = {
+            row.cell_number: row for row in bind.execute(
+                sa.select(summary).where(summary.c.cycle_id == cycle_id, summary.c.reading_type == reading_type)
+            )
+        }
+        cells = {}
+        for _, _, phase, timestamp, values in group:
+            for cell_number, value in enumerate(_decode(values), 1):
+                cell = cells.get(cell_number)
+                if cell is None:
+                    row = stored.get(cell_number)
+                    cell = cells[cell_number] = dict(row._mapping) if row else {
+                        'cycle_id': cycle_id, 'phase': phase, 'reading_type': reading_type,
+                        'cell_number': cell_number, 'count': 0, 'min_value': value, 'max_value': value,
+                        'mean': 0.0, 'm2': 0.0, 'last_value': value, 'last_timestamp': timestamp,
+                    }
+                # Welford's update
+                cell['count'] += 1
+                delta = value - cell['mean']
+                cell['mean'] += delta / cell['count']
+                cell['m2'] += delta * (value - cell['mean'])
+                cell['min_value'] = min(cell['min_value'], value)
+                cell['max_value'] = max(cell['max_value'], value)
+                if timestamp is not None and (cell['last_timestamp'] is None or timestamp >= cell['last_timestamp']):
+                    cell['last_value'], cell['last_timestamp'] = value, timestamp
+
+        for cell in cells.values():
+            if cell['last_timestamp'] is None:
+                cell['last_timestamp'] = sa.func.current_timestamp()
+            if 'id' in cell:
+                bind.execute(summary.update().where(summary.c.id == cell.pop('id')).values(**cell))
+            else:
+                bind.execute(summary.insert().values(**cell))
+
+
+def _decode(values):
+    # float8[] on PostgreSQL, packed float32 bytes elsewhere (see models.CellValues)
+    if isinstance(values, (bytes, memoryview)):
+        packed = array('f')
+        packed.frombytes(bytes(values))
+        return [float('%.7g' % value) for value in packed]
+    return [float(value) for value in values]
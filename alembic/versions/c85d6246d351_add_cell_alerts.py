@@ -0,0 +1,44 @@
+"""Add cell_alerts table
+
+Revision ID: c85d6246d351
+Revises: c68a7c36c46f
+Create Date: 2026-10-17 02:33:18.082509
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c85d6246d351'
+down_revision: Union[str, None] = 'c68a7c36c46f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cell_alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cycle_id', sa.Integer(), nullable=False),
+    sa.Column('cell_number', sa.Integer(), nullable=False),
+    sa.Column('sequence_number', sa.Integer(), nullable=True),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('value', sa.Float(), nullable=False),
+    sa.Column('expected', sa.Float(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['cycle_id'], ['reading_cycles.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cell_alerts_cycle_id'), 'cell_alerts', ['cycle_id'], unique=False)
+    op.create_index(op.f('ix_cell_alerts_id'), 'cell_alerts', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_cell_alerts_id'), table_name='cell_alerts')
+    op.drop_index(op.f('ix_cell_alerts_cycle_id'), table_name='cell_alerts')
+    op.drop_table('cell_alerts')
@@ -0,0 +1,472 @@
+import json
+import os
+import warnings
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import cache, crud, pivot, schemas
+
+PHASES = ("charge", "discharge")
+
+# Cell voltage at which a discharge counts as finished, when the request gives none
+DISCHARGE_CUTOFF_VOLTAGE = float(os.getenv("DISCHARGE_CUTOFF_VOLTAGE", "1.75"))
+
+# Points per cell and cycle returned by /api/tests/{test_id}/series, when the request gives none
+SERIES_POINTS = int(os.getenv("SERIES_POINTS", "500"))
+
+# The weakest cells, ranks 1 up to this, are highlighted on the details page
+WEAK_CELL_RANKS = 3
+
+# Part of the cache keys of discharge curves and series, bumped when what they
+# hold changes so entries computed the old way age out instead of being served
+CURVE_CACHE_VERSION = 2
+
+
+class ReadingCube:
+    """A test's readings as arrays indexed (cycle, phase, sequence, cell).
+
+    `ccv` has shape (cycles, phases, sequences, cells) and `ocv` (cycles, phases,
+    cells). `cycle_numbers` and `sequences` label the cycle and sequence axes, the
+    phase axis follows PHASES. Missing readings are NaN.
+    """
+
+    def __init__(self, num_cells, cycle_numbers, sequences, ocv, ccv):
+        self.num_cells = num_cells
+        self.cycle_numbers = cycle_numbers
+        self.sequences = sequences
+        self.ocv = ocv
+        self.ccv = ccv
+
+
+def build_cube(cycles, matrices, num_cells):
+    """Stack the per-cycle matrices of pivot.build_cycle_matrices into one ReadingCube.
+
+    Each cycle is copied in as a whole block, the readings themselves are never
+    looped over.
+    """
+    cycle_numbers = sorted({cycle.cycle_number for cycle in cycles})
+    sequences = np.unique(np.concatenate(
+        [np.asarray(matrix.sequences, dtype=np.int64) for matrix in matrices.values()] or [np.empty(0, np.int64)]
+    ))
+    cycle_index = {number: index for index, number in enumerate(cycle_numbers)}
+
+    ocv = np.full((len(cycle_numbers), len(PHASES), num_cells), np.nan)
+    ccv = np.full((len(cycle_numbers), len(PHASES), len(sequences), num_cells), np.nan)
+    for cycle in cycles:
+        if cycle.phase not in PHASES:
+            continue
+        matrix = matrices[cycle.id]
+        c, p = cycle_index[cycle.cycle_number], PHASES.index(cycle.phase)
+        # A repeated cycle fills the gaps of the earlier one instead of replacing it
+        ocv[c, p] = np.where(np.isnan(matrix.ocv), ocv[c, p], matrix.ocv)
+        positions = np.searchsorted(sequences, matrix.sequences)
+        ccv[c, p, positions] = np.where(np.isnan(matrix.ccv.T), ccv[c, p, positions], matrix.ccv.T)
+    return ReadingCube(num_cells, cycle_numbers, sequences.tolist(), ocv, ccv)
+
+
+def load_cube(db: Session, test):
+    """Read every reading of a test into a ReadingCube."""
+    cycles = crud.get_cycles_for_test(db, test.id)
+    cycle_ids = [cycle.id for cycle in cycles]
+    matrices = pivot.build_cycle_matrices(
+        cycle_ids, test.bank.num_cells, *crud.get_reading_columns(db, cycle_ids)
+    )
+    return build_cube(cycles, matrices, test.bank.num_cells)
+
+
+def cell_statistics(cube):
+    """Per-cell CCV statistics over every snapshot of the test, as arrays of one value per cell.
+
+    deviation is the cell's mean distance from the bank median of each snapshot, so
+    the overall voltage drop during a discharge does not count against any cell.
+    rank orders the cells from weakest (1) by end-of-discharge voltage, or by mean
+    CCV while no discharge has been recorded. Cells without readings get NaN and
+    rank 0.
+    """
+    snapshots = cube.ccv.reshape(-1, cube.num_cells)
+    recorded = ~np.isnan(snapshots).all(axis=1)
+    snapshots = snapshots[recorded]
+
+    with warnings.catch_warnings():
+        # All-NaN cells are expected, they just come out as NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(snapshots, axis=0)
+        minimum = np.nanmin(snapshots, axis=0)
+        maximum = np.nanmax(snapshots, axis=0)
+        median = np.nanmedian(snapshots, axis=1, keepdims=True)
+        deviation = np.nanmean(snapshots - median, axis=0)
+
+    end_of_discharge, cycle_number = end_of_discharge_voltage(cube)
+    key = end_of_discharge if cycle_number is not None else mean
+    return {
+        "snapshots": int(recorded.sum()),
+        "end_of_discharge_cycle": cycle_number,
+        "mean": mean,
+        "min": minimum,
+        "max": maximum,
+        "deviation": deviation,
+        "end_of_discharge": end_of_discharge,
+        "rank": rank_cells(key),
+    }
+
+
+def end_of_discharge_voltage(cube):
+    """Last discharge CCV of each cell in the latest cycle that has discharge readings.
+
+    Returns (values, cycle_number), or all NaN and None before any discharge.
+    """
+    discharge = cube.ccv[:, PHASES.index("discharge")]
+    recorded = np.flatnonzero(~np.isnan(discharge).all(axis=(1, 2)))
+    if not len(recorded):
+        return np.full(cube.num_cells, np.nan), None
+
+    values = discharge[recorded[-1]]
+    # Cells without any reading index -1, which is NaN for them too
+    last = last_reading_index(values)
+    return values[last, np.arange(cube.num_cells)], cube.cycle_numbers[recorded[-1]]
+
+
+def rank_cells(values):
+    """1 for the lowest value, counting up. NaN cells rank 0, after all others."""
+    order = np.argsort(values, kind="stable")
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.arange(1, len(values) + 1)
+    ranks[np.isnan(values)] = 0
+    return ranks
+
+
+def analyze_test(db: Session, test_id: int):
+    """Per-cell analytics of a test as plain values, None if the test does not exist."""
+    test = crud.get_test(db, test_id)
+    if test is None:
+        return None
+    return summarize(test, load_cube(db, test))
+
+
+def summarize(test, cube):
+    """Response body of /api/tests/{test_id}/analytics, see schemas.TestAnalytics."""
+    stats = cell_statistics(cube)
+    columns = {
+        name: _values(stats[name]) for name in ("mean", "min", "max", "deviation", "end_of_discharge")
+    }
+    ranks = stats["rank"].tolist()
+    return {
+        "test_id": test.id,
+        "num_cells": cube.num_cells,
+        "cycles": len(cube.cycle_numbers),
+        "snapshots": stats["snapshots"],
+        "end_of_discharge_cycle": stats["end_of_discharge_cycle"],
+        "cells": [
+            {
+                "cell_number": index + 1,
+                **{name: values[index] for name, values in columns.items()},
+                "rank": ranks[index] or None,
+            }
+            for index in range(cube.num_cells)
+        ],
+    }
+
+
+def _values(array):
+    return np.where(np.isnan(array), None, array.astype(object)).tolist()
+
+
+def cycle_summaries(db: Session, test_id: int):
+    """Per-cell statistics of every cycle from the cycle_cell_summary table.
+
+    Reads one row per cycle, reading type and cell however many snapshots were
+    taken. None if the test does not exist, see schemas.TestSummary.
+    """
+    test = crud.get_test(db, test_id)
+    if test is None:
+        return None
+    cycles = crud.get_cycles_for_test(db, test_id)
+    cells = {cycle.id: [] for cycle in cycles}
+    for row in crud.get_cell_summaries(db, list(cells)):
+        cells[row.cycle_id].append(schemas.CellSummary.model_validate(row))
+    return {
+        "test_id": test.id,
+        "cycles": [
+            {
+                "cycle_id": cycle.id,
+                "cycle_number": cycle.cycle_number,
+                "phase": cycle.phase,
+                "status": cycle.status,
+                "cells": cells[cycle.id],
+            }
+            for cycle in cycles
+        ],
+    }
+
+
+def analyze_discharge(db: Session, test_id: int, cutoff: float, current=None):
+    """Discharge curves, time to `cutoff` and capacity of every discharge cycle of a test.
+
+    `current` is the constant discharge current in amperes, capacity is left out
+    without it. Curves of completed cycles are computed once and then served from
+    the report cache, only active cycles are recomputed on every call. Returns
+    None if the test does not exist, see schemas.DischargeAnalysis.
+    """
+    test = crud.get_test(db, test_id)
+    if test is None:
+        return None
+    cycles = [cycle for cycle in crud.get_cycles_for_test(db, test_id) if cycle.phase == "discharge"]
+
+    curves, missing = {}, []
+    for cycle in cycles:
+        key = cache.cached_cycle_key(cycle, f"discharge_{cutoff!r}V.v{CURVE_CACHE_VERSION}.json")
+        file = cache.report_cache.open(key) if key else None
+        if file:
+            with file:
+                curves[cycle.id] = json.load(file)
+        else:
+            missing.append((cycle, key))
+
+    if missing:
+        cycle_ids = [cycle.id for cycle, _ in missing]
+        matrices = pivot.build_cycle_matrices(
+            cycle_ids, test.bank.num_cells, *crud.get_reading_columns(db, cycle_ids)
+        )
+        for cycle, key in missing:
+            curves[cycle.id] = discharge_curve(cycle, matrices[cycle.id], cutoff)
+            if key:
+                cache.report_cache.put(key, json.dumps(curves[cycle.id]).encode())
+
+    # Capacity scales with the current, so it is the one part not cached
+    for curve in curves.values():
+        for cell in curve["cells"]:
+            seconds = cell["discharged_seconds"]
+            cell["capacity_ah"] = current * seconds / 3600 if current is not None and seconds is not None else None
+
+    return {
+        "test_id": test.id,
+        "cutoff": cutoff,
+        "current": current,
+        "cycles": [curves[cycle.id] for cycle in cycles],
+    }
+
+
+def discharge_curve(cycle, matrix, cutoff: float):
+    """Voltage against time of each cell over one discharge cycle, with time to `cutoff`.
+
+    Snapshots are placed at their elapsed time since the cycle started, see
+    elapsed_seconds. discharged_seconds is the time to cutoff, or to the cell's
+    last reading if it never got there.
+    """
+    elapsed = elapsed_seconds(cycle, matrix)
+    known = np.flatnonzero(~np.isnan(elapsed))
+    known = known[np.argsort(elapsed[known], kind="stable")]
+    times = elapsed[known]
+    voltages = matrix.ccv[:, known].T
+
+    crossing = cutoff_times(times, voltages, cutoff)
+    last_time = end_voltage = np.full(matrix.num_cells, np.nan)
+    if len(times):
+        last = last_reading_index(voltages)
+        last_time = np.where(last >= 0, times[last], np.nan)
+        end_voltage = voltages[last, np.arange(matrix.num_cells)]
+
+    columns = {
+        "time_to_cutoff": _values(crossing),
+        "discharged_seconds": _values(np.where(np.isnan(crossing), last_time, crossing)),
+        "end_voltage": _values(end_voltage),
+    }
+    curve = _values(voltages.T)
+    return {
+        "cycle_id": cycle.id,
+        "cycle_number": cycle.cycle_number,
+        "status": cycle.status,
+        "elapsed_seconds": times.tolist(),
+        "cells": [
+            {
+                "cell_number": index + 1,
+                **{name: values[index] for name, values in columns.items()},
+                "reached_cutoff": columns["time_to_cutoff"][index] is not None,
+                "voltages": curve[index],
+            }
+            for index in range(matrix.num_cells)
+        ],
+    }
+
+
+def elapsed_seconds(cycle, matrix):
+    """Seconds from the first reading of `cycle` to each CCV snapshot of its matrix.
+
+    The cycle starts at its OCV or its earliest CCV snapshot, whichever came
+    first. Batch and stream snapshots carry the logger's clock, so
+    cycle.start_time, the server's clock, is only used when no reading has a
+    time. Uses the snapshot's recorded timestamp, or its sequence number times
+    the cycle's ccv_interval where there is none. NaN when neither is known or
+    the snapshot would fall before the start.
+    """
+    known = [timestamp for timestamp in (matrix.ocv_time, *matrix.sequence_times) if timestamp is not None]
+    start = min(known) if known else cycle.start_time
+    times = np.array(matrix.sequence_times, dtype="datetime64[us]")
+    elapsed = (times - np.datetime64(start, "us")) / np.timedelta64(1, "s")
+    if cycle.ccv_interval:
+        scheduled = np.asarray(matrix.sequences, dtype=np.float64) * cycle.ccv_interval
+        elapsed = np.where(np.isnan(elapsed), scheduled, elapsed)
+    with np.errstate(invalid="ignore"):
+        return np.where(elapsed < 0, np.nan, elapsed)
+
+
+def cutoff_times(times, voltages, cutoff: float):
+    """Time at which each cell first drops to `cutoff`, NaN if it never does.
+
+    `voltages` is (snapshots, cells) in the order of `times`. The crossing is
+    interpolated linearly between the cell's last reading above the cutoff and
+    its first one at or below, skipping gaps. A cell already below at its first
+    reading crosses at that reading.
+    """
+    snapshots, cells = voltages.shape
+    if not snapshots:
+        return np.full(cells, np.nan)
+    columns = np.arange(cells)
+    with np.errstate(invalid="ignore"):
+        below = voltages <= cutoff
+    first = np.argmax(below, axis=0)
+    reached = below.any(axis=0)
+
+    # Latest reading at or before each snapshot, so gaps are stepped over
+    latest = np.maximum.accumulate(np.where(~np.isnan(voltages), np.arange(snapshots)[:, None], -1), axis=0)
+    previous = np.where(first > 0, latest[np.maximum(first - 1, 0), columns], -1)
+    before = np.maximum(previous, 0)
+
+    t0, v0 = times[before], voltages[before, columns]
+    t1, v1 = times[first], voltages[first, columns]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        interpolated = t0 + (v0 - cutoff) / (v0 - v1) * (t1 - t0)
+    crossing = np.where(previous >= 0, interpolated, t1)
+    return np.where(reached, crossing, np.nan)
+
+
+def last_reading_index(voltages):
+    """Index of each cell's last non-NaN snapshot, -1 for cells without any."""
+    valid = ~np.isnan(voltages)
+    return np.where(valid.any(axis=0), len(voltages) - 1 - np.argmax(valid[::-1], axis=0), -1)
+
+
+def test_series(db: Session, test_id: int, points: int):
+    """CCV voltage against time of every cell and cycle, downsampled to `points` per cell.
+
+    Series of completed cycles are computed once per point budget and then served
+    from the report cache. Returns None if the test does not exist, see
+    schemas.TestSeries.
+    """
+    test = crud.get_test(db, test_id)
+    if test is None:
+        return None
+    cycles = crud.get_cycles_for_test(db, test_id)
+
+    series, missing = {}, []
+    for cycle in cycles:
+        key = cache.cached_cycle_key(cycle, f"series_{points}.v{CURVE_CACHE_VERSION}.json")
+        file = cache.report_cache.open(key) if key else None
+        if file:
+            with file:
+                series[cycle.id] = json.load(file)
+        else:
+            missing.append((cycle, key))
+
+    if missing:
+        cycle_ids = [cycle.id for cycle, _ in missing]
+        matrices = pivot.build_cycle_matrices(
+            cycle_ids, test.bank.num_cells, *crud.get_reading_columns(db, cycle_ids)
+        )
+        for cycle, key in missing:
+            series[cycle.id] = cycle_series(cycle, matrices[cycle.id], points)
+            if key:
+                cache.report_cache.put(key, json.dumps(series[cycle.id]).encode())
+
+    return {
+        "test_id": test.id,
+        "points": points,
+        "cycles": [series[cycle.id] for cycle in cycles],
+    }
+
+
+def cycle_series(cycle, matrix, points: int):
+    """Each cell's CCV readings of one cycle at their elapsed seconds, downsampled with lttb."""
+    elapsed = elapsed_seconds(cycle, matrix)
+    known = np.flatnonzero(~np.isnan(elapsed))
+    known = known[np.argsort(elapsed[known], kind="stable")]
+    times = elapsed[known]
+    voltages = matrix.ccv[:, known].T
+
+    keep = lttb(times, voltages, points)
+    return {
+        "cycle_id": cycle.id,
+        "cycle_number": cycle.cycle_number,
+        "phase": cycle.phase,
+        "status": cycle.status,
+        "snapshots": len(times),
+        "cells": [
+            {
+                "cell_number": index + 1,
+                "elapsed_seconds": times[keep[:, index]].tolist(),
+                "voltages": voltages[keep[:, index], index].tolist(),
+            }
+            for index in range(matrix.num_cells)
+        ],
+    }
+
+
+def lttb(times, voltages, points: int):
+    """Largest-Triangle-Three-Buckets over every cell at once.
+
+    `voltages` is (snapshots, cells) in the order of `times` and `points` at least
+    3. Returns a boolean mask of the same shape marking at most `points` readings
+    per cell: the cell's
+    first and last reading and, from each of `points` - 2 equal buckets of
+    snapshots in between, the one spanning the largest triangle with the point
+    kept from the bucket before and the average of the bucket after. Missing
+    readings are never picked, a bucket a cell has none in keeps nothing.
+    """
+    snapshots, cells = voltages.shape
+    valid = ~np.isnan(voltages)
+    if snapshots <= points:
+        return valid
+
+    keep = _ends(valid)
+    columns = np.arange(cells)
+    first = np.argmax(valid, axis=0)
+    last = last_reading_index(voltages)
+    anchor_t, anchor_v = times[first], voltages[first, columns]
+    end_t, end_v = times[last], voltages[last, columns]
+
+    edges = np.linspace(1, snapshots - 1, points - 1).astype(np.int64)
+    for bucket in range(points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # Average of the next bucket, the cell's last reading after the final one
+        # or where the cell has none in it
+        following = slice(stop, edges[bucket + 2] if bucket + 2 < len(edges) else snapshots)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            counts = valid[following].sum(axis=0)
+            next_v = np.where(valid[following], voltages[following], 0.0).sum(axis=0) / counts
+            next_t = (valid[following] * times[following, None]).sum(axis=0) / counts
+        empty = counts == 0
+        next_t = np.where(empty, end_t, next_t)
+        next_v = np.where(empty, end_v, next_v)
+
+        # Twice the triangle area, the factor doesn't change which point is largest
+        t, v = times[start:stop, None], voltages[start:stop]
+        area = np.abs((anchor_t - next_t) * (v - anchor_v) - (anchor_t - t) * (next_v - anchor_v))
+        area = np.where(valid[start:stop], area, -1.0)
+        picked = np.argmax(area, axis=0)
+        found = valid[start:stop].any(axis=0)
+
+        rows = start + picked
+        keep[rows[found], columns[found]] = True
+        anchor_t = np.where(found, times[rows], anchor_t)
+        anchor_v = np.where(found, voltages[rows, columns], anchor_v)
+    return keep
+
+
+def _ends(valid):
+    # Each cell's first and last reading
+    keep = np.zeros_like(valid)
+    columns = np.flatnonzero(valid.any(axis=0))
+    keep[np.argmax(valid, axis=0)[columns], columns] = True
+    keep[len(valid) - 1 - np.argmax(valid[::-1], axis=0)[columns], columns] = True
+    return keep
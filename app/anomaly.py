@@ -0,0 +1,192 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# 0 turns the detector off
+ANOMALY_DETECTION = os.getenv("ANOMALY_DETECTION", "1") != "0"
+
+# Weight of the newest snapshot in each cell's moving average and variance
+ANOMALY_ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.2"))
+
+# Standard deviations from its own trend, after the bank's common move is taken
+# out, before a cell is flagged as an outlier
+ANOMALY_Z = float(os.getenv("ANOMALY_Z", "4"))
+
+# Snapshots a cycle needs before outliers are flagged, the variance starts at 0
+ANOMALY_WARMUP = int(os.getenv("ANOMALY_WARMUP", "5"))
+
+# Floor of the standard deviation in volts, so a very steady cell isn't flagged for noise
+ANOMALY_MIN_STD = float(os.getenv("ANOMALY_MIN_STD", "0.005"))
+
+# Volts a cell may fall between consecutive snapshots beyond the bank's median
+# fall before it is flagged
+ANOMALY_MAX_DROP = float(os.getenv("ANOMALY_MAX_DROP", "0.02"))
+
+# Active cycles whose state is kept, least recently used ones are dropped beyond this
+ANOMALY_MAX_CYCLES = int(os.getenv("ANOMALY_MAX_CYCLES", "512"))
+
+
+class CycleState:
+    """Running per-cell state of one active cycle, one float64 array entry per cell.
+
+    `ewma` is each cell's exponentially weighted mean and `ewvar` the weighted
+    variance of its deviation from that mean once the bank median deviation is
+    taken out. `last` is the previous snapshot, for the drop between sequences.
+    """
+
+    __slots__ = ("count", "ewma", "ewvar", "last")
+
+    def __init__(self, count, ewma, ewvar, last):
+        self.count = count
+        self.ewma = ewma
+        self.ewvar = ewvar
+        self.last = last
+
+    @classmethod
+    def start(cls, values):
+        return cls(1, values.copy(), np.zeros_like(values), values.copy())
+
+    def copy(self):
+        return CycleState(self.count, self.ewma.copy(), self.ewvar.copy(), self.last.copy())
+
+
+class AnomalyDetector:
+    """Flags cells that break away from the bank while CCV snapshots come in.
+
+    State lives in this process only and advances when the ingest that observed
+    a snapshot commits. A cycle seen for the first time, e.g. after a restart,
+    starts from the last values in its cycle_cell_summary rows, so drops are
+    caught from the first snapshot and outliers after ANOMALY_WARMUP more.
+    Each snapshot costs a fixed number of array operations over the bank's cells.
+    """
+
+    def __init__(self, max_cycles: int):
+        self.max_cycles = max_cycles
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, db: Session, cycle_id: int, snapshots: List[dict]):
+        """Check CCV snapshots (see ingest.snapshot) of a cycle before they are written.
+
+        Alerts are added to cell_alerts in the caller's transaction. Returns
+        (alerts, update), alerts as dicts and update to pass to store() once the
+        transaction has committed. Must run before ingest.write_snapshots, which
+        already folds the snapshots into the summary a cold start reads.
+        """
+        if not ANOMALY_DETECTION or not snapshots:
+            return [], None
+        with self._lock:
+            base = self._states.get(cycle_id)
+
+        # Loaded and advanced without the lock: under run_sync the summary query
+        # yields to the event loop, where another observe would block on the lock
+        state = base.copy() if base is not None else _summary_state(db, cycle_id)
+        alerts = []
+        for snapshot in sorted(snapshots, key=lambda item: item["timestamp"]):
+            values = np.asarray(snapshot["values"], dtype=np.float64)
+            if state is None or len(values) != len(state.ewma):
+                state = CycleState.start(values)
+                continue
+            alerts.extend(
+                {"cycle_id": cycle_id, "sequence_number": snapshot["sequence_number"],
+                 "timestamp": snapshot["timestamp"], **alert}
+                for alert in check(state, values)
+            )
+
+        if alerts:
+            db.connection().execute(insert(models.CellAlert), alerts)
+        return alerts, (cycle_id, base, state)
+
+    def store(self, update):
+        """Keep the state advanced by observe() once its snapshots are committed.
+
+        If another ingest stored a state for the cycle in the meantime, neither
+        state saw the other's snapshots, so the cycle is dropped and starts again
+        from its committed summaries.
+        """
+        if update is None:
+            return
+        cycle_id, base, state = update
+        with self._lock:
+            if self._states.get(cycle_id) is not base:
+                self._states.pop(cycle_id, None)
+                return
+            self._states[cycle_id] = state
+            self._states.move_to_end(cycle_id)
+            while len(self._states) > self.max_cycles:
+                self._states.popitem(last=False)
+
+    def forget(self, cycle_id: int):
+        """Drop the state of a cycle that will get no more readings."""
+        with self._lock:
+            self._states.pop(cycle_id, None)
+
+
+def check(state: CycleState, values):
+    """Score one snapshot against `state`, advance the state and return the alerts.
+
+    Outlier: the cell's move away from its own moving average, minus the bank's
+    median move, is more than ANOMALY_Z standard deviations. Drop: since the
+    previous snapshot the cell fell more than ANOMALY_MAX_DROP volts further than
+    the bank median.
+    """
+    # Cells without history, e.g. missing from a cold start, begin at this value
+    fresh = np.isnan(state.ewma)
+    state.ewma[fresh] = values[fresh]
+    state.ewvar[fresh] = 0.0
+
+    innovation = values - state.ewma
+    common = np.nanmedian(innovation)
+    deviation = innovation - common
+    std = np.sqrt(np.maximum(state.ewvar, ANOMALY_MIN_STD ** 2))
+    score = np.abs(deviation) / std
+
+    drop = state.last - values
+    bank_drop = np.nanmedian(drop)
+    excess = drop - bank_drop
+
+    with np.errstate(invalid="ignore"):
+        outliers = np.flatnonzero(score > ANOMALY_Z) if state.count >= ANOMALY_WARMUP else np.empty(0, np.int64)
+        drops = np.flatnonzero(excess > ANOMALY_MAX_DROP)
+    alerts = [
+        {"cell_number": int(cell) + 1, "kind": "outlier", "value": float(values[cell]),
+         "expected": float(state.ewma[cell] + common), "score": float(score[cell])}
+        for cell in outliers
+    ] + [
+        {"cell_number": int(cell) + 1, "kind": "drop", "value": float(values[cell]),
+         "expected": float(state.last[cell] - bank_drop), "score": float(excess[cell])}
+        for cell in drops
+    ]
+
+    # Exponentially weighted mean and variance, updated in place
+    state.ewma += ANOMALY_ALPHA * innovation
+    state.ewvar *= 1 - ANOMALY_ALPHA
+    state.ewvar += (1 - ANOMALY_ALPHA) * ANOMALY_ALPHA * deviation ** 2
+    state.last = values
+    state.count += 1
+    return alerts
+
+
+def _summary_state(db: Session, cycle_id: int):
+    """State of a cycle rebuilt from its stored CCV summaries, None if it has none."""
+    summary = models.CycleCellSummary
+    rows = db.execute(
+        select(summary.cell_number, summary.last_value)
+        .where(summary.cycle_id == cycle_id, summary.reading_type == "CCV")
+    ).all()
+    if not rows:
+        return None
+    cells, values = zip(*rows)
+    last = np.full(max(cells), np.nan)
+    last[np.asarray(cells) - 1] = values
+    return CycleState.start(last)
+
+
+detector = AnomalyDetector(ANOMALY_MAX_CYCLES)
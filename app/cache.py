@@ -0,0 +1,192 @@
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rendered exports of completed tests are kept here, shared by all workers
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "battery-report-cache"))
+
+# Size budget of the directory, least recently used files are evicted beyond it.
+# 0 disables the cache
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Partial files older than this were left by a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+
+class ArtifactCache:
+    """On-disk LRU cache of export files, keyed by name.
+
+    Keys are expected to identify the content, e.g. test id plus data version, so
+    an entry never has to be invalidated, it just stops being asked for and ages
+    out. A file's mtime is its last use. Files are written under a temporary name
+    and renamed into place, readers never see a partial file. Hits are handed out
+    already open, so an eviction racing with the reader can't pull the file away.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Separate from the eviction lock, lookups never wait for a directory scan
+        self._counts_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def open(self, key: str):
+        """The cached file for `key` opened for binary reading, or None on a miss.
+
+        The caller closes it. Once open, the content stays readable even if the
+        entry is evicted or replaced meanwhile.
+        """
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            with self._counts_lock:
+                self.misses += 1
+            return None
+        # Mark it as used, unless it was evicted right after opening
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        with self._counts_lock:
+            self.hits += 1
+        return file
+
+    def put(self, key: str, content: bytes):
+        with self.writer(key) as file:
+            file.write(content)
+
+    @contextlib.contextmanager
+    def writer(self, key: str):
+        """Binary file to write the entry for `key` into, published when the block exits cleanly."""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                yield file
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    def tee(self, key: str, chunks):
+        """Pass `chunks` through while storing them, the entry is kept only if all of them arrive."""
+        with self.writer(key) as file:
+            for chunk in chunks:
+                file.write(chunk)
+                yield chunk
+
+    def discard(self, prefix: str):
+        """Remove every entry whose key starts with `prefix`."""
+        for entry in self._entries():
+            if entry.name.startswith(prefix):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(entry.path)
+
+    def evict(self):
+        """Remove least recently used entries until the directory fits the budget."""
+        with self._lock:
+            entries = []
+            for entry in self._entries(include_temp=True):
+                if entry.name.startswith(".tmp-"):
+                    with contextlib.suppress(FileNotFoundError):
+                        if time.time() - entry.stat().st_mtime > STALE_TEMP_SECONDS:
+                            os.remove(entry.path)
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                    logger.info("Evicted %s (%d bytes) from the report cache", path, size)
+                total -= size
+
+    def stats(self):
+        sizes = []
+        for entry in self._entries():
+            with contextlib.suppress(FileNotFoundError):
+                sizes.append(entry.stat().st_size)
+        with self._counts_lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "directory": self.directory,
+            "max_bytes": self.max_bytes,
+            "bytes": sum(sizes),
+            "entries": len(sizes),
+            "hits": hits,
+            "misses": misses,
+        }
+
+    def _entries(self, include_temp=False):
+        try:
+            with os.scandir(self.directory) as entries:
+                return [
+                    entry for entry in entries
+                    if entry.is_file() and (include_temp or not entry.name.startswith(".tmp-"))
+                ]
+        except FileNotFoundError:
+            return []
+
+
+report_cache = ArtifactCache(REPORT_CACHE_DIR, REPORT_CACHE_MAX_BYTES)
+
+
+def export_key(test_id: int, data_version: int, kind: str) -> str:
+    """Cache key of one export of a test at a given data version, e.g. test_3_v17.csv."""
+    return f"test_{test_id}_v{data_version}.{kind}"
+
+
+def iter_file(file, chunk_size: int = 64 * 1024):
+    """Yield a file returned by ArtifactCache.open in chunks and close it."""
+    with file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def cached_export_key(test, kind: str):
+    """Key of a test's cached export, None when the test may still change."""
+    if test.status != "completed" or not report_cache.enabled:
+        return None
+    return export_key(test.id, test.data_version, kind)
+
+
+def cached_cycle_key(cycle, kind: str):
+    """Key of a result computed from one cycle, None until the cycle is completed.
+
+    Readings are only ever added to active cycles, so a completed cycle's data is
+    final and the key needs no version, e.g. test_3_cycle_12.discharge.json.
+    """
+    if cycle.status != "completed" or not report_cache.enabled:
+        return None
+    return f"test_{cycle.test_id}_cycle_{cycle.id}.{kind}"
+
+
+def discard_test(test_id: int):
+    """Drop every cached export and cycle result of a test, e.g. once it is deleted."""
+    report_cache.discard(f"test_{test_id}_v")
+    report_cache.discard(f"test_{test_id}_cycle_")
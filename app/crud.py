@@ -1,6 +1,8 @@
+from sqlalchemy import case, func, select, tuple_, update
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, ingest, anomaly
 from datetime import datetime
+import base64
 from typing import List, Optional
 
 # Battery Bank operations
@@ -38,13 +40,100 @@ def create_test(db: Session, test: schemas.TestCreate):
 def get_test(db: Session, test_id: int):
     return db.query(models.TestSession).filter(models.TestSession.id == test_id).first()
 
-def get_tests(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.TestSession).offset(skip).limit(limit).all()
+# Test listings page newest first with keyset pagination on (start_time, id),
+# the cursor is the position of the last row of the previous page
+def encode_test_cursor(start_time: datetime, test_id: int) -> str:
+    raw = f"{start_time.isoformat()}|{test_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_test_cursor(cursor: str):
+    """Raises ValueError for a malformed cursor."""
+    try:
+        start_time, test_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(start_time), int(test_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+def _paginate_tests(query, limit: int, cursor: Optional[str] = None, status: Optional[str] = None,
+                    bank_name: Optional[str] = None, started_from: Optional[datetime] = None,
+                    started_to: Optional[datetime] = None):
+    if status:
+        query = query.where(models.TestSession.status == status)
+    if bank_name:
+        query = query.where(models.BatteryBank.name == bank_name)
+    if started_from:
+        query = query.where(models.TestSession.start_time >= started_from)
+    if started_to:
+        query = query.where(models.TestSession.start_time < started_to)
+    if cursor:
+        start_time, test_id = decode_test_cursor(cursor)
+        query = query.where(tuple_(models.TestSession.start_time, models.TestSession.id) < (start_time, test_id))
+    # One extra row tells whether there is a next page
+    return query.order_by(models.TestSession.start_time.desc(), models.TestSession.id.desc()).limit(limit + 1)
+
+def _split_page(rows, limit: int):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_test_cursor(rows[-1].start_time, rows[-1].id)
+
+def get_export_tests(db: Session, test_ids: Optional[List[int]] = None,
+                     started_from: Optional[datetime] = None, started_to: Optional[datetime] = None):
+    """(id, status, data_version) of the tests selected for a bulk export, oldest first."""
+    query = select(models.TestSession.id, models.TestSession.status, models.TestSession.data_version)
+    if test_ids:
+        query = query.where(models.TestSession.id.in_(test_ids))
+    if started_from:
+        query = query.where(models.TestSession.start_time >= started_from)
+    if started_to:
+        query = query.where(models.TestSession.start_time < started_to)
+    return db.execute(query.order_by(models.TestSession.start_time, models.TestSession.id)).all()
+
+def test_progress_expression():
+    """Percentage of phases done, each cycle has a charge and a discharge phase."""
+    completed_phases = (models.TestSession.current_cycle - 1) * 2 + case(
+        (models.TestSession.current_phase == "discharge", 1), else_=0
+    )
+    return completed_phases * 100.0 / (models.TestSession.total_cycles * 2)
+
+def get_dashboard_tests(db: Session, limit: int = 100, cursor: Optional[str] = None, **filters):
+    """Everything a dashboard card shows, in one query joined to the bank.
+
+    Returns (rows, next_cursor), next_cursor is None on the last page.
+    """
+    query = (
+        select(
+            models.TestSession.id,
+            models.TestSession.status,
+            models.TestSession.current_cycle,
+            models.TestSession.total_cycles,
+            models.TestSession.current_phase,
+            models.TestSession.start_time,
+            models.BatteryBank.name.label("bank_name"),
+            test_progress_expression().label("progress"),
+        )
+        .join(models.BatteryBank, models.TestSession.bank_id == models.BatteryBank.id)
+    )
+    query = _paginate_tests(query, limit, cursor, **filters)
+    return _split_page(db.execute(query).all(), limit)
+
+def bump_data_version(db: Session, test_id):
+    """Mark a test's data as changed so exports cached under the old version go stale.
+
+    `test_id` may also be a scalar subquery. Runs in the caller's transaction.
+    """
+    db.execute(
+        update(models.TestSession)
+        .where(models.TestSession.id == test_id)
+        .values(data_version=models.TestSession.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
 
 def update_test_status(db: Session, test_id: int, status_update: schemas.TestStatusUpdate):
     db_test = get_test(db, test_id)
     if db_test:
         db_test.status = status_update.status
+        bump_data_version(db, test_id)
         db.commit()
         db.refresh(db_test)
     return db_test
@@ -59,6 +148,7 @@ def create_cycle(db: Session, cycle: schemas.CycleCreate):
         status="active"
     )
     db.add(db_cycle)
+    bump_data_version(db, cycle.test_id)
     db.commit()
     db.refresh(db_cycle)
     return db_cycle
@@ -67,7 +157,9 @@ def get_cycle(db: Session, cycle_id: int):
     return db.query(models.ReadingCycle).filter(models.ReadingCycle.id == cycle_id).first()
 
 def get_cycles_for_test(db: Session, test_id: int):
-    return db.query(models.ReadingCycle).filter(models.ReadingCycle.test_id == test_id).all()
+    return db.query(models.ReadingCycle).filter(
+        models.ReadingCycle.test_id == test_id
+    ).order_by(models.ReadingCycle.cycle_number, models.ReadingCycle.id).all()
 
 def get_active_cycle(db: Session, test_id: int, cycle_number: int, phase: str):
     return db.query(models.ReadingCycle).filter(
@@ -77,6 +169,21 @@ def get_active_cycle(db: Session, test_id: int, cycle_number: int, phase: str):
         models.ReadingCycle.status == "active"
     ).first()
 
+def reserve_ccv_sequence(db: Session, cycle_id: int, count: int = 1):
+    """Atomically reserve `count` consecutive CCV sequence numbers and return the first.
+
+    The increment is a single UPDATE ... RETURNING on the cycle row, so concurrent
+    submitters serialize on the row lock instead of both reading the same maximum.
+    """
+    last = db.execute(
+        update(models.ReadingCycle)
+        .where(models.ReadingCycle.id == cycle_id)
+        .values(ccv_sequence=models.ReadingCycle.ccv_sequence + count)
+        .returning(models.ReadingCycle.ccv_sequence)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+    return last - count + 1
+
 def complete_cycle(db: Session, cycle_id: int):
     db_cycle = get_cycle(db, cycle_id)
     if db_cycle:
@@ -84,6 +191,7 @@ def complete_cycle(db: Session, cycle_id: int):
         db_cycle.end_time = datetime.utcnow()
         db.commit()
         db.refresh(db_cycle)
+        anomaly.detector.forget(cycle_id)
 
         # Update test phase or cycle
         db_test = get_test(db, db_cycle.test_id)
@@ -99,6 +207,7 @@ def complete_cycle(db: Session, cycle_id: int):
         else:
             db_test.status = "in_progress"
             
+        bump_data_version(db, db_test.id)
         db.commit()
         db.refresh(db_test)
         return db_test.status == "completed"
@@ -110,31 +219,28 @@ def create_ocv_readings(db: Session, test_id: int, readings: List[float]):
     if not test:
         return None
     
-    # Create a new cycle for OCV readings
-    cycle = create_cycle(db, schemas.CycleCreate(
+    # Create a new cycle for OCV readings, flushed so the readings can reference it
+    cycle = models.ReadingCycle(
         test_id=test_id,
         cycle_number=test.current_cycle,
-        phase=test.current_phase
-    ))
+        phase=test.current_phase,
+        status="active"
+    )
+    db.add(cycle)
+    db.flush()
     
-    # Create readings for each cell
-    for cell_num, value in enumerate(readings, 1):
-        db_reading = models.Reading(
-            cycle_id=cycle.id,
-            reading_type="OCV",
-            cell_number=cell_num,
-            value=float(value),
-            phase=test.current_phase
-        )
-        db.add(db_reading)
+    # Write the whole snapshot in one statement
+    stats = ingest.write_snapshots(db, [
+        ingest.snapshot(cycle.id, "OCV", test.current_phase, readings)
+    ])
     
     # Update test status if needed
     if test.status == "scheduled":
         test.status = "in_progress"
-        db.commit()
     
+    bump_data_version(db, test_id)
     db.commit()
-    return cycle
+    return cycle, stats
 
 def create_ccv_readings(db: Session, test_id: int, readings: List[float]):
     test = get_test(db, test_id)
@@ -146,27 +252,321 @@ def create_ccv_readings(db: Session, test_id: int, readings: List[float]):
     if not cycle:
         return None
     
-    # Calculate sequence number for this CCV reading
-    existing_ccv = [r for r in cycle.readings if r.reading_type == "CCV"]
-    sequence = len(existing_ccv) // test.bank.num_cells + 1 if existing_ccv else 1
-    
-    # Create readings for each cell
-    for cell_num, value in enumerate(readings, 1):
-        db_reading = models.Reading(
-            cycle_id=cycle.id,
-            reading_type="CCV",
-            cell_number=cell_num,
-            value=float(value),
-            sequence_number=sequence,
-            phase=test.current_phase
+    # Reserve the sequence number for this CCV reading
+    sequence = reserve_ccv_sequence(db, cycle.id)
+    
+    # Check it against the cycle's running state, then write the whole snapshot in one statement
+    snapshots = [ingest.snapshot(cycle.id, "CCV", test.current_phase, readings, sequence_number=sequence)]
+    alerts, update = anomaly.detector.observe(db, cycle.id, snapshots)
+    stats = ingest.write_snapshots(db, snapshots)
+    
+    bump_data_version(db, test_id)
+    db.commit()
+    anomaly.detector.store(update)
+    return cycle, stats, alerts
+
+def create_ccv_batch(db: Session, test_id: int, snapshots: List[schemas.TimedReadingsCreate]):
+    """Store several timestamped CCV snapshots for the active cycle in one transaction.
+
+    Snapshots get consecutive sequence numbers in timestamp order. Raises ValueError
+    if a snapshot does not have exactly one value per cell.
+    """
+    test = get_test(db, test_id)
+    if not test:
+        return None
+    
+    cycle = get_active_cycle(db, test_id, test.current_cycle, test.current_phase)
+    if not cycle:
+        return None
+    
+    num_cells = test.bank.num_cells
+    for snapshot in snapshots:
+        if len(snapshot.readings) != num_cells:
+            raise ValueError(f"Expected {num_cells} readings per snapshot, got {len(snapshot.readings)}")
+    
+    ordered = sorted(
+        ((ingest.to_utc_naive(snapshot.timestamp), snapshot.readings) for snapshot in snapshots),
+        key=lambda snapshot: snapshot[0]
+    )
+    stats, sequences, alerts = append_ccv_snapshots(db, cycle.id, test.current_phase, ordered)
+    return cycle, stats, sequences, alerts
+
+def append_ccv_snapshots(db: Session, cycle_id: int, phase: str, snapshots):
+    """Write (timestamp, readings) CCV snapshots with consecutive sequence numbers and commit.
+
+    Returns (stats, sequences, alerts), alerts as raised by the anomaly detector.
+    """
+    first_sequence = reserve_ccv_sequence(db, cycle_id, len(snapshots))
+    
+    snapshots = [
+        ingest.snapshot(
+            cycle_id, "CCV", phase, readings,
+            sequence_number=first_sequence + offset,
+            timestamp=timestamp
         )
-        db.add(db_reading)
+        for offset, (timestamp, readings) in enumerate(snapshots)
+    ]
+    alerts, update = anomaly.detector.observe(db, cycle_id, snapshots)
+    stats = ingest.write_snapshots(db, snapshots)
     
+    bump_data_version(db, select(models.ReadingCycle.test_id).where(models.ReadingCycle.id == cycle_id).scalar_subquery())
     db.commit()
-    return cycle
+    anomaly.detector.store(update)
+    return stats, [snapshot["sequence_number"] for snapshot in snapshots], alerts
 
 def get_readings_for_cycle(db: Session, cycle_id: int):
-    return db.query(models.Reading).filter(models.Reading.cycle_id == cycle_id).all()
+    readings = db.query(models.Reading).filter(models.Reading.cycle_id == cycle_id).all()
+    snapshots = db.query(models.ReadingSnapshot).filter(models.ReadingSnapshot.cycle_id == cycle_id).all()
+    for snapshot in snapshots:
+        readings.extend(snapshot.to_readings())
+    return readings
+
+def get_reading_columns(db: Session, cycle_ids: List[int]):
+    """Raw reading tuples for several cycles, as expected by pivot.build_cycle_matrices.
+
+    Returns (rows, sequence_times, snapshots) without building ORM objects. The
+    per-row timestamps are not fetched, the time of each OCV and CCV snapshot
+    comes from one grouped query over the (cycle_id, reading_type,
+    sequence_number) index.
+    """
+    if not cycle_ids:
+        return [], [], []
+    rows = db.execute(
+        select(
+            models.Reading.cycle_id,
+            models.Reading.reading_type,
+            models.Reading.sequence_number,
+            models.Reading.cell_number,
+            models.Reading.value,
+        ).where(models.Reading.cycle_id.in_(cycle_ids))
+    ).all()
+    sequence_times = db.execute(
+        select(
+            models.Reading.cycle_id,
+            models.Reading.reading_type,
+            models.Reading.sequence_number,
+            func.min(models.Reading.timestamp),
+        ).where(
+            models.Reading.cycle_id.in_(cycle_ids),
+        ).group_by(models.Reading.cycle_id, models.Reading.reading_type, models.Reading.sequence_number)
+    ).all()
+    snapshots = db.execute(
+        select(
+            models.ReadingSnapshot.cycle_id,
+            models.ReadingSnapshot.reading_type,
+            models.ReadingSnapshot.sequence_number,
+            models.ReadingSnapshot.timestamp,
+            models.ReadingSnapshot.values,
+        ).where(models.ReadingSnapshot.cycle_id.in_(cycle_ids))
+    ).all()
+    return rows, sequence_times, snapshots
+
+def get_cell_summaries(db: Session, cycle_ids: List[int]):
+    """cycle_cell_summary rows of several cycles, one per cycle, reading type and cell."""
+    if not cycle_ids:
+        return []
+    return db.query(models.CycleCellSummary).filter(
+        models.CycleCellSummary.cycle_id.in_(cycle_ids)
+    ).order_by(
+        models.CycleCellSummary.cycle_id,
+        models.CycleCellSummary.reading_type,
+        models.CycleCellSummary.cell_number,
+    ).all()
+
+def get_alerts(db: Session, test_id: int, limit: int = 100):
+    """Most recent anomaly alerts of a test with the cycle they belong to, newest first."""
+    return db.execute(
+        select(*models.CellAlert.__table__.columns, models.ReadingCycle.cycle_number, models.ReadingCycle.phase)
+        .join(models.ReadingCycle, models.CellAlert.cycle_id == models.ReadingCycle.id)
+        .where(models.ReadingCycle.test_id == test_id)
+        .order_by(models.CellAlert.id.desc())
+        .limit(limit)
+    ).all()
+
+def get_ccv_sequence_times(db: Session, cycle_ids: List[int]):
+    """(cycle_id, sequence_number, earliest timestamp) of every CCV snapshot, both layouts."""
+    if not cycle_ids:
+        return []
+    times = {}
+    for table in (models.Reading, models.ReadingSnapshot):
+        grouped = db.execute(
+            select(table.cycle_id, table.sequence_number, func.min(table.timestamp))
+            .where(table.cycle_id.in_(cycle_ids), table.reading_type == "CCV")
+            .group_by(table.cycle_id, table.sequence_number)
+        )
+        for cycle_id, sequence, timestamp in grouped:
+            key = (cycle_id, sequence)
+            if key not in times or (timestamp is not None and (times[key] is None or timestamp < times[key])):
+                times[key] = timestamp
+    return [(cycle_id, sequence, timestamp) for (cycle_id, sequence), timestamp in times.items()]
+
+def get_snapshot_cycle_ids(db: Session, cycle_ids: List[int]):
+    """Ids of the given cycles that have rows in reading_snapshots."""
+    if not cycle_ids:
+        return set()
+    return set(db.scalars(
+        select(models.ReadingSnapshot.cycle_id)
+        .where(models.ReadingSnapshot.cycle_id.in_(cycle_ids))
+        .distinct()
+    ))
+
+def iter_cycle_readings(db: Session, cycle_id: int, batch_size: int = 5000):
+    """Stream (reading_type, sequence_number, cell_number, value) of one cycle in index order.
+
+    The order is that of the (cycle_id, reading_type, sequence_number, cell_number)
+    index, so rows come straight off it without a sort, `batch_size` at a time
+    through a server-side cursor where the driver supports one.
+    """
+    return db.connection().execute(
+        select(
+            models.Reading.reading_type,
+            models.Reading.sequence_number,
+            models.Reading.cell_number,
+            models.Reading.value,
+        )
+        .where(models.Reading.cycle_id == cycle_id)
+        .order_by(models.Reading.reading_type, models.Reading.sequence_number, models.Reading.cell_number)
+        .execution_options(yield_per=batch_size)
+    )
+
+def iter_typed_readings(db: Session, cycle_id: int, batch_size: int = 5000):
+    """Stream (reading_type, sequence_number, cell_number, value, timestamp) of one cycle.
+
+    Rows come in index order, which keeps equal values together for columnar
+    encodings, and are fetched `batch_size` at a time like iter_cycle_readings.
+    """
+    # Core execution on the connection skips the ORM result layer, most of the cost per row
+    return db.connection().execute(
+        select(
+            models.Reading.reading_type,
+            models.Reading.sequence_number,
+            models.Reading.cell_number,
+            models.Reading.value,
+            models.Reading.timestamp,
+        )
+        .where(models.Reading.cycle_id == cycle_id)
+        .order_by(models.Reading.reading_type, models.Reading.sequence_number, models.Reading.cell_number)
+        .execution_options(yield_per=batch_size)
+    )
+
+def get_cycle_snapshots(db: Session, cycle_id: int):
+    """(reading_type, sequence_number, timestamp, values) of a cycle's reading_snapshots."""
+    return db.execute(
+        select(
+            models.ReadingSnapshot.reading_type,
+            models.ReadingSnapshot.sequence_number,
+            models.ReadingSnapshot.timestamp,
+            models.ReadingSnapshot.values,
+        )
+        .where(models.ReadingSnapshot.cycle_id == cycle_id)
+        .order_by(models.ReadingSnapshot.reading_type, models.ReadingSnapshot.sequence_number)
+    ).all()
+
+# Export job operations
+def create_export_job(db: Session, test_id: int, format: str):
+    db_job = models.ExportJob(test_id=test_id, format=format, status="queued")
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+def get_export_job(db: Session, job_id: int):
+    return db.query(models.ExportJob).filter(models.ExportJob.id == job_id).first()
+
+def claim_export_job(db: Session):
+    """Mark the oldest queued job as running and return it, None if the queue is empty.
+
+    The claim is a conditional UPDATE, so when several workers or processes race for
+    the same job exactly one of them gets it and the others move on to the next.
+    It bumps the job's attempt, the claimant passes that to the calls below so a
+    worker whose job was requeued and claimed again can't touch it any more.
+    """
+    while True:
+        job_id = db.scalar(
+            select(models.ExportJob.id)
+            .where(models.ExportJob.status == "queued")
+            .order_by(models.ExportJob.id)
+            .limit(1)
+        )
+        if job_id is None:
+            return None
+        now = datetime.utcnow()
+        claimed = db.execute(
+            update(models.ExportJob)
+            .where(models.ExportJob.id == job_id, models.ExportJob.status == "queued")
+            .values(status="running", started_at=now, heartbeat_at=now, attempt=models.ExportJob.attempt + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return get_export_job(db, job_id)
+
+def _running_attempt(job_id: int, attempt: int):
+    return update(models.ExportJob).where(
+        models.ExportJob.id == job_id,
+        models.ExportJob.status == "running",
+        models.ExportJob.attempt == attempt,
+    ).execution_options(synchronize_session=False)
+
+def touch_export_job(db: Session, job_id: int, attempt: int):
+    """Refresh a running job's heartbeat, False if the attempt no longer owns the job."""
+    touched = db.execute(_running_attempt(job_id, attempt).values(heartbeat_at=datetime.utcnow())).rowcount
+    db.commit()
+    return bool(touched)
+
+def owns_export_job(db: Session, job_id: int, attempt: int):
+    """Whether `attempt` is still the running claim of the job."""
+    return db.scalar(
+        select(models.ExportJob.id).where(
+            models.ExportJob.id == job_id,
+            models.ExportJob.status == "running",
+            models.ExportJob.attempt == attempt,
+        )
+    ) is not None
+
+def finish_export_job(db: Session, job_id: int, attempt: int, size_bytes: Optional[int] = None,
+                      error: Optional[str] = None):
+    """Record the outcome of a running job, failed when `error` is given.
+
+    False, and nothing changes, if `attempt` no longer owns the job.
+    """
+    finished = db.execute(
+        _running_attempt(job_id, attempt).values(
+            status="failed" if error else "completed",
+            finished_at=datetime.utcnow(),
+            size_bytes=size_bytes,
+            error=error,
+        )
+    ).rowcount
+    db.commit()
+    return bool(finished)
+
+def release_export_job(db: Session, job_id: int, attempt: int):
+    """Put a running job back in the queue, e.g. when its worker shuts down."""
+    db.execute(_running_attempt(job_id, attempt).values(status="queued", started_at=None, heartbeat_at=None))
+    db.commit()
+
+def requeue_stale_export_jobs(db: Session, heartbeat_before: datetime):
+    """Put running jobs without a heartbeat since `heartbeat_before` back in the queue, their worker is gone."""
+    requeued = db.execute(
+        update(models.ExportJob)
+        .where(models.ExportJob.status == "running", models.ExportJob.heartbeat_at < heartbeat_before)
+        .values(status="queued", started_at=None, heartbeat_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return requeued
+
+def expire_export_jobs(db: Session, finished_before: datetime):
+    """Mark completed jobs finished before `finished_before` as expired and return them."""
+    jobs = db.query(models.ExportJob).filter(
+        models.ExportJob.status == "completed",
+        models.ExportJob.finished_at < finished_before
+    ).all()
+    for job in jobs:
+        job.status = "expired"
+    db.commit()
+    return jobs
 
 #Delete functionality addition
 
@@ -184,6 +584,12 @@ def delete_test(db: Session, test_id: int):
     for cycle in cycles:
         # Delete readings for this cycle
         db.query(models.Reading).filter(models.Reading.cycle_id == cycle.id).delete()
+        db.query(models.ReadingSnapshot).filter(models.ReadingSnapshot.cycle_id == cycle.id).delete()
+        db.query(models.CycleCellSummary).filter(models.CycleCellSummary.cycle_id == cycle.id).delete()
+        db.query(models.CellAlert).filter(models.CellAlert.cycle_id == cycle.id).delete()
+    
+    # Delete its background export jobs
+    db.query(models.ExportJob).filter(models.ExportJob.test_id == test_id).delete()
     
     # Delete all cycles for this test
     db.query(models.ReadingCycle).filter(models.ReadingCycle.test_id == test_id).delete()
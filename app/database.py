@@ -1,8 +1,12 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from .metrics import PoolMetrics, instrumented_pool
 
 load_dotenv()
 
@@ -11,13 +15,51 @@ SQLALCHEMY_DATABASE_URL = os.getenv(
     "DATABASE_URL"
 )
 
+# Async drivers matching the sync backends in DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+# ASYNC_DATABASE_URL overrides the derived URL, e.g. when query options differ per driver
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+# Connection pool settings, applied to both engines
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "-1")),  # seconds, -1 disables
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes"),
+}
+
+# Checkout wait times and timeouts, reported by /api/metrics/pool
+pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
 # Remove SQLite-specific arguments
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=instrumented_pool(QueuePool, pool_metrics),
+    **POOL_SETTINGS
+)
+
+# Used by the async routes so queries don't block the event loop
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL,
+    poolclass=instrumented_pool(AsyncAdaptedQueuePool, async_pool_metrics),
+    **POOL_SETTINGS
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# expire_on_commit=False so objects returned from run_sync stay readable afterwards
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Dependency to get DB session
@@ -26,4 +68,17 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async DB session. The crud layer is synchronous, call it
+# with `await db.run_sync(crud.fn, ...)` to run it on the async connection.
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_status():
+    return {
+        "settings": POOL_SETTINGS,
+        "sync": pool_metrics.snapshot(engine.pool),
+        "async": async_pool_metrics.snapshot(async_engine.pool),
+    }
@@ -0,0 +1,300 @@
+import csv
+import io
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Column order used for both the multi-row INSERT and the COPY stream
+READING_COLUMNS = (
+    "cycle_id",
+    "reading_type",
+    "cell_number",
+    "value",
+    "sequence_number",
+    "timestamp",
+    "phase",
+)
+
+# "rows" stores one readings row per cell, "snapshot" stores one
+# reading_snapshots row per snapshot with the cell values packed together
+STORAGE_MODE = os.getenv("READING_STORAGE", "rows")
+
+# Snapshots smaller than this go through INSERT even on PostgreSQL,
+# COPY has a fixed setup cost that only pays off for larger batches
+COPY_MIN_ROWS = int(os.getenv("READING_COPY_MIN_ROWS", "100"))
+
+# Number of streamed snapshots written per transaction by the NDJSON endpoint
+STREAM_BATCH_SIZE = int(os.getenv("READING_STREAM_BATCH_SIZE", "50"))
+
+# Longest NDJSON line accepted, bounds the buffer held for a partial line
+STREAM_MAX_LINE_BYTES = int(os.getenv("READING_STREAM_MAX_LINE_BYTES", str(64 * 1024)))
+
+
+class IngestStats:
+    """Row count and wall time of a single bulk write."""
+
+    def __init__(self, rows: int, seconds: float, method: str):
+        self.rows = rows
+        self.seconds = seconds
+        self.method = method
+
+    @property
+    def rows_per_sec(self):
+        if self.seconds <= 0:
+            return float(self.rows)
+        return self.rows / self.seconds
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "seconds": round(self.seconds, 6),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+            "method": self.method,
+        }
+
+
+def to_utc_naive(timestamp: datetime) -> datetime:
+    """Convert a client-supplied timestamp to the naive UTC the readings table stores."""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def snapshot(cycle_id: int, reading_type: str, phase: str, values: List[float],
+             sequence_number: Optional[int] = None, timestamp: Optional[datetime] = None):
+    """Describe one snapshot (one value per cell, in cell order) for write_snapshots."""
+    return {
+        "cycle_id": cycle_id,
+        "reading_type": reading_type,
+        "phase": phase,
+        "sequence_number": sequence_number,
+        "timestamp": timestamp or datetime.utcnow(),
+        "values": [float(value) for value in values],
+    }
+
+
+def snapshot_rows(snapshot: dict):
+    """Expand a snapshot into per-cell reading row dicts."""
+    return [
+        {
+            "cycle_id": snapshot["cycle_id"],
+            "reading_type": snapshot["reading_type"],
+            "cell_number": cell_num,
+            "value": value,
+            "sequence_number": snapshot["sequence_number"],
+            "timestamp": snapshot["timestamp"],
+            "phase": snapshot["phase"],
+        }
+        for cell_num, value in enumerate(snapshot["values"], 1)
+    ]
+
+
+def write_snapshots(db: Session, snapshots: List[dict]) -> IngestStats:
+    """Store snapshots using the configured READING_STORAGE layout.
+
+    The caller is responsible for committing.
+    """
+    if STORAGE_MODE == "snapshot":
+        stats = insert_snapshots(db, snapshots)
+    else:
+        rows = []
+        for item in snapshots:
+            rows.extend(snapshot_rows(item))
+        stats = insert_readings(db, rows)
+    update_cell_summaries(db, snapshots)
+    return stats
+
+
+def update_cell_summaries(db: Session, snapshots: List[dict]):
+    """Fold snapshots into the cycle_cell_summary rows of their cycle and reading type.
+
+    Each (cycle, reading type) group is reduced per cell with NumPy, then merged
+    into the stored running statistics with the pairwise form of Welford's update,
+    so the cost depends on the batch and the number of cells, never on the
+    readings already stored. The caller is responsible for committing.
+
+    No row lock is needed: OCV snapshots always start a new cycle, and CCV writers
+    already hold the cycle row's lock from reserve_ccv_sequence until they commit.
+    """
+    groups = {}
+    for item in snapshots:
+        groups.setdefault((item["cycle_id"], item["reading_type"]), []).append(item)
+
+    inserts, updates = [], []
+    for (cycle_id, reading_type), items in groups.items():
+        items.sort(key=lambda item: item["timestamp"])
+        batch = _summarize_batch(items)
+        summary = models.CycleCellSummary
+        stored = {
+            row.cell_number: row
+            for row in db.execute(
+                select(
+                    summary.id, summary.cell_number, summary.count, summary.mean, summary.m2,
+                    summary.min_value, summary.max_value, summary.last_value, summary.last_timestamp,
+                ).where(summary.cycle_id == cycle_id, summary.reading_type == reading_type)
+            )
+        }
+        merged = _merge_summaries(batch, [stored.get(cell) for cell in batch["cell_number"]])
+        for cell in range(len(batch["cell_number"])):
+            if not batch["count"][cell]:
+                continue
+            values = {name: column[cell] for name, column in merged.items()}
+            row = stored.get(values["cell_number"])
+            if row is None:
+                inserts.append({"cycle_id": cycle_id, "phase": items[0]["phase"], "reading_type": reading_type, **values})
+            else:
+                del values["cell_number"]
+                updates.append({"summary_id": row.id, **values})
+
+    # Core executemany on the connection, the ORM bulk UPDATE costs twice as much per row
+    table = models.CycleCellSummary.__table__
+    if inserts:
+        db.connection().execute(insert(table), inserts)
+    if updates:
+        db.connection().execute(update(table).where(table.c.id == bindparam("summary_id")), updates)
+
+
+def _summarize_batch(items: List[dict]):
+    """count, mean, m2, min, max and last value/timestamp per cell of timestamp-ordered snapshots."""
+    width = max(len(item["values"]) for item in items)
+    values = np.full((len(items), width), np.nan)
+    for row, item in enumerate(items):
+        values[row, :len(item["values"])] = item["values"]
+
+    present = ~np.isnan(values)
+    count = present.sum(axis=0)
+    filled = np.where(present, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = filled.sum(axis=0) / count
+    last = len(items) - 1 - np.argmax(present[::-1], axis=0)
+    return {
+        "cell_number": np.arange(1, width + 1),
+        "count": count,
+        "mean": mean,
+        "m2": (np.where(present, values - mean, 0.0) ** 2).sum(axis=0),
+        "min_value": np.where(present, values, np.inf).min(axis=0),
+        "max_value": np.where(present, values, -np.inf).max(axis=0),
+        "last_value": values[last, np.arange(width)],
+        "last_timestamp": [items[index]["timestamp"] for index in last],
+    }
+
+
+def _merge_summaries(batch: dict, stored: list):
+    """Combine batch statistics with the stored row of each cell (None for new cells)."""
+    count = np.array([row.count if row else 0 for row in stored])
+    mean = np.array([row.mean if row else 0.0 for row in stored])
+    m2 = np.array([row.m2 if row else 0.0 for row in stored])
+    total = count + batch["count"]
+    delta = batch["mean"] - mean
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = batch["count"] / total
+    # A stored value newer than the whole batch stays the last one
+    newer = [
+        row is None or timestamp >= row.last_timestamp
+        for row, timestamp in zip(stored, batch["last_timestamp"])
+    ]
+    return {
+        "cell_number": batch["cell_number"].tolist(),
+        "count": total.tolist(),
+        "mean": (mean + delta * share).tolist(),
+        "m2": (m2 + batch["m2"] + delta ** 2 * count * share).tolist(),
+        "min_value": np.fmin(batch["min_value"], [row.min_value if row else np.inf for row in stored]).tolist(),
+        "max_value": np.fmax(batch["max_value"], [row.max_value if row else -np.inf for row in stored]).tolist(),
+        "last_value": np.where(newer, batch["last_value"], [row.last_value if row else 0.0 for row in stored]).tolist(),
+        "last_timestamp": [
+            timestamp if is_newer else row.last_timestamp
+            for row, timestamp, is_newer in zip(stored, batch["last_timestamp"], newer)
+        ],
+    }
+
+
+def insert_snapshots(db: Session, snapshots: List[dict]) -> IngestStats:
+    """Write one reading_snapshots row per snapshot in one set-based statement."""
+    if not snapshots:
+        return IngestStats(0, 0.0, "none")
+
+    start = time.perf_counter()
+    db.connection().execute(insert(models.ReadingSnapshot), snapshots)
+    cells = sum(len(item["values"]) for item in snapshots)
+    stats = IngestStats(cells, time.perf_counter() - start, "snapshot")
+
+    logger.info(
+        "Inserted %d readings as %d snapshots in %.4fs (%.0f rows/sec)",
+        stats.rows, len(snapshots), stats.seconds, stats.rows_per_sec
+    )
+    return stats
+
+
+def insert_readings(db: Session, rows: List[dict]) -> IngestStats:
+    """Write reading rows in one set-based statement inside the current transaction.
+
+    Uses COPY on psycopg2 connections and a multi-row INSERT everywhere else.
+    The caller is responsible for committing.
+    """
+    if not rows:
+        return IngestStats(0, 0.0, "none")
+
+    start = time.perf_counter()
+    connection = db.connection()
+    driver = connection.dialect.driver
+    if driver == "psycopg2" and len(rows) >= COPY_MIN_ROWS:
+        _copy_psycopg2(connection, rows)
+        method = "copy"
+    elif driver == "asyncpg" and len(rows) >= COPY_MIN_ROWS:
+        _copy_asyncpg(connection, rows)
+        method = "copy"
+    else:
+        # executemany form, rendered as batched INSERT ... VALUES by SQLAlchemy 2.x
+        connection.execute(insert(models.Reading), rows)
+        method = "insert"
+    stats = IngestStats(len(rows), time.perf_counter() - start, method)
+
+    logger.info(
+        "Inserted %d readings via %s in %.4fs (%.0f rows/sec)",
+        stats.rows, stats.method, stats.seconds, stats.rows_per_sec
+    )
+    return stats
+
+
+def _copy_psycopg2(connection, rows: List[dict]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            "" if row[column] is None else row[column]
+            for column in READING_COLUMNS
+        ])
+    buffer.seek(0)
+
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {models.Reading.__tablename__} ({', '.join(READING_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _copy_asyncpg(connection, rows: List[dict]):
+    # Called from AsyncSession.run_sync, so the coroutine can be awaited in place.
+    # The transaction was already opened by the caller's earlier statements
+    # (cycle flush or sequence reservation), the COPY joins it.
+    records = [tuple(row[column] for column in READING_COLUMNS) for row in rows]
+    await_only(connection.connection.driver_connection.copy_records_to_table(
+        models.Reading.__tablename__,
+        records=records,
+        columns=list(READING_COLUMNS)
+    ))
@@ -0,0 +1,208 @@
+import asyncio
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from . import cache, crud, database, pdf, reports
+
+logger = logging.getLogger(__name__)
+
+# Finished background exports are written here until they expire
+EXPORT_JOB_DIR = os.getenv("EXPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "battery-export-jobs"))
+
+# Jobs run at the same time by each application process
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "1"))
+
+# How often idle workers look for jobs queued by other processes
+EXPORT_JOB_POLL_SECONDS = float(os.getenv("EXPORT_JOB_POLL_SECONDS", "2"))
+
+# How often a worker refreshes the heartbeat of the job it is running
+EXPORT_JOB_HEARTBEAT_SECONDS = float(os.getenv("EXPORT_JOB_HEARTBEAT_SECONDS", "30"))
+
+# A running job without a heartbeat for this long is presumed lost with its process and requeued
+EXPORT_JOB_TIMEOUT = int(os.getenv("EXPORT_JOB_TIMEOUT", "300"))
+
+# Completed exports can be downloaded for this long
+EXPORT_JOB_RETENTION = int(os.getenv("EXPORT_JOB_RETENTION", str(24 * 3600)))
+
+MEDIA_TYPES = {"csv": "text/csv", "pdf": "application/pdf"}
+
+
+def job_path(job) -> str:
+    return os.path.join(EXPORT_JOB_DIR, f"test_{job.test_id}_job_{job.id}.{job.format}")
+
+
+def download_name(job) -> str:
+    if job.format == "pdf":
+        return f"test_{job.test_id}_report.pdf"
+    return f"test_{job.test_id}_export.csv"
+
+
+def discard_test(test_id: int):
+    """Remove the job files of a deleted test."""
+    with contextlib.suppress(FileNotFoundError):
+        for name in os.listdir(EXPORT_JOB_DIR):
+            if name.startswith(f"test_{test_id}_job_"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(EXPORT_JOB_DIR, name))
+
+
+class ExportWorker:
+    """Runs queued export jobs in the background of the application process.
+
+    The export_jobs table is the queue, so jobs survive restarts and are shared by
+    every process. notify() only wakes an idle worker up early. A job interrupted
+    by shutdown goes back to the queue. While a job runs its worker refreshes the
+    job's heartbeat, a job whose heartbeat stops is requeued for another worker.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._tasks = []
+        self._wakeup = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                async with database.AsyncSessionLocal() as db:
+                    await db.run_sync(self._housekeeping)
+                    job = await db.run_sync(crud.claim_export_job)
+                if job is not None:
+                    await self._execute(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Export worker iteration failed")
+
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), EXPORT_JOB_POLL_SECONDS)
+
+    @staticmethod
+    def _housekeeping(db):
+        now = datetime.utcnow()
+        requeued = crud.requeue_stale_export_jobs(db, now - timedelta(seconds=EXPORT_JOB_TIMEOUT))
+        if requeued:
+            logger.warning("Requeued %d export jobs that stopped without finishing", requeued)
+        for job in crud.expire_export_jobs(db, now - timedelta(seconds=EXPORT_JOB_RETENTION)):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(job_path(job))
+
+    async def _execute(self, job):
+        path = job_path(job)
+        # Per attempt, so a run that lost its claim never writes into another's file
+        partial = f"{path}.{job.attempt}.part"
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            os.makedirs(EXPORT_JOB_DIR, exist_ok=True)
+            source = await asyncio.to_thread(reports.export_source, job.test_id, job.format)
+            if source is None:
+                raise ValueError("Test not found")
+            key, cached, report = source
+
+            if cached:
+                await asyncio.to_thread(_copy_file, cached, partial)
+            elif job.format == "csv":
+                await asyncio.to_thread(_write_csv, job.test_id, partial, key)
+            else:
+                content = await _render_pdf(report)
+                await asyncio.to_thread(_write_file, partial, content)
+                if key:
+                    await asyncio.to_thread(cache.report_cache.put, key, content)
+
+            # Publish only while this attempt still owns the job, if its heartbeat
+            # lapsed it may have been requeued and run by another worker meanwhile
+            async with database.AsyncSessionLocal() as db:
+                owned = await db.run_sync(crud.owns_export_job, job.id, job.attempt)
+            if not owned:
+                os.remove(partial)
+                logger.warning("Export job %d attempt %d lost its claim, result discarded", job.id, job.attempt)
+                return
+            os.replace(partial, path)
+            size = os.path.getsize(path)
+        except asyncio.CancelledError:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(partial)
+            async with database.AsyncSessionLocal() as db:
+                await db.run_sync(crud.release_export_job, job.id, job.attempt)
+            raise
+        except Exception as exc:
+            logger.exception("Export job %d failed", job.id)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(partial)
+            await self._finish(job, error=str(exc) or type(exc).__name__)
+            return
+        finally:
+            heartbeat.cancel()
+        await self._finish(job, size_bytes=size)
+
+    @staticmethod
+    async def _heartbeat(job):
+        while True:
+            await asyncio.sleep(EXPORT_JOB_HEARTBEAT_SECONDS)
+            try:
+                async with database.AsyncSessionLocal() as db:
+                    if not await db.run_sync(crud.touch_export_job, job.id, job.attempt):
+                        logger.warning("Export job %d attempt %d is no longer running here", job.id, job.attempt)
+                        return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Heartbeat of export job %d failed", job.id)
+
+    @staticmethod
+    async def _finish(job, **outcome):
+        async with database.AsyncSessionLocal() as db:
+            finished = await db.run_sync(crud.finish_export_job, job.id, job.attempt, **outcome)
+        if not finished:
+            logger.warning("Export job %d attempt %d lost its claim before finishing", job.id, job.attempt)
+
+
+async def _render_pdf(report):
+    # Shares the render pool with the synchronous route, waits for room
+    # instead of failing when interactive requests have filled it
+    while True:
+        try:
+            return await pdf.render_pool.run(pdf.render_test_report, report)
+        except pdf.RenderPoolFull:
+            await asyncio.sleep(EXPORT_JOB_POLL_SECONDS)
+
+
+def _write_csv(test_id: int, path: str, key):
+    chunks = reports.iter_test_csv(test_id)
+    if key:
+        chunks = cache.report_cache.tee(key, chunks)
+    with open(path, "wb") as file:
+        for chunk in chunks:
+            file.write(chunk)
+
+
+def _copy_file(source, path: str):
+    with source, open(path, "wb") as file:
+        shutil.copyfileobj(source, file)
+
+
+def _write_file(path: str, content: bytes):
+    with open(path, "wb") as file:
+        file.write(content)
+
+
+export_worker = ExportWorker(EXPORT_JOB_WORKERS)
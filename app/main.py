@@ -2,13 +2,14 @@ import uvicorn
 from fastapi import FastAPI, Request, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
-from pathlib import Path
+from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import get_db
-from . import models, crud
-from .routers import tests, cycles, readings, exports
+from .database import get_async_db, get_db
+from . import models, jobs, pdf
+from .routers import tests, cycles, readings, streams, exports, metrics, analytics
+from .routers.tests import dashboard_filters, render_dashboard
 
 # Remove database creation line since Alembic will handle this
 # models.Base.metadata.create_all(bind=engine)  <- removed
@@ -29,30 +30,34 @@ templates = Jinja2Templates(directory="app/templates")
 app.include_router(tests.router)
 app.include_router(cycles.router)
 app.include_router(readings.router)
+app.include_router(streams.router)
 app.include_router(exports.router)
+app.include_router(metrics.router)
+app.include_router(analytics.router)
 
-# Helper function to get test progress
-def get_test_progress(test):
-    total_phases = test.total_cycles * 2  # Each cycle has charge and discharge
-    completed_phases = (test.current_cycle - 1) * 2
-    if test.current_phase == "discharge":
-        completed_phases += 1
-    return (completed_phases / total_phases) * 100
+@app.on_event("startup")
+async def start_export_worker():
+    jobs.export_worker.start()
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    await jobs.export_worker.stop()
+    pdf.render_pool.shutdown()
 
 @app.get("/", response_class=HTMLResponse)
-async def root(request: Request, db: Session = Depends(get_db)):
-    tests = crud.get_tests(db)
-    return templates.TemplateResponse(
-        "dashboard.html", 
-        {"request": request, "tests": tests, "get_test_progress": get_test_progress}
-    )
+def root(
+    request: Request,
+    filters: dict = Depends(dashboard_filters),
+    db: Session = Depends(get_db)
+):
+    return render_dashboard(db, request, filters)
 
 @app.get("/create_test", response_class=HTMLResponse)
 async def create_test_page(request: Request):
     return templates.TemplateResponse("create_test.html", {"request": request})
 
 @app.post("/create_test")
-async def create_test(request: Request, db: Session = Depends(get_db)):
+async def create_test(request: Request, db: AsyncSession = Depends(get_async_db)):
     form = await request.form()
     bank = models.BatteryBank(
         name=form.get("name"),
@@ -60,14 +65,14 @@ async def create_test(request: Request, db: Session = Depends(get_db)):
         num_cells=int(form.get("num_cells"))
     )
     db.add(bank)
-    db.flush()
+    await db.flush()
     
     test = models.TestSession(
         bank_id=bank.id,
         total_cycles=int(form.get("total_cycles"))
     )
     db.add(test)
-    db.commit()
+    await db.commit()
     
     return {"success": True, "test_id": test.id}
 
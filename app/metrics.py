@@ -0,0 +1,133 @@
+import threading
+import time
+
+from sqlalchemy import exc
+
+
+class Histogram:
+    """Cumulative wait-time histogram, buckets are upper bounds in seconds."""
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self._counts[i] += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": round(self.total, 6),
+                "max": round(self.max, 6),
+                "buckets": {f"le_{bound:g}": n for bound, n in zip(self.BUCKETS, self._counts)},
+            }
+
+
+class PoolMetrics:
+    """Connection checkout waits and timeouts for one engine's pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait = Histogram()
+        self.timeouts = 0
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool):
+        stats = {"pool_class": type(pool).__name__}
+        # Only queue pools track size and overflow
+        if hasattr(pool, "checkedout"):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        with self._lock:
+            stats["timeouts"] = self.timeouts
+        stats["wait_seconds"] = self.wait.as_dict()
+        return stats
+
+
+def instrumented_pool(pool_class, metrics: PoolMetrics):
+    """Subclass a SQLAlchemy pool so every checkout records how long it waited."""
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                metrics.timed_out()
+                raise
+            finally:
+                metrics.wait.observe(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+class WorkerPoolMetrics:
+    """Queue depth, rejections and timings of a bounded worker pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait = Histogram()
+        self.run = Histogram()
+
+    def admit(self, max_pending: int) -> bool:
+        """Count a new job as pending unless `max_pending` already are."""
+        with self._lock:
+            if self.pending >= max_pending:
+                self.rejected += 1
+                return False
+            self.pending += 1
+            return True
+
+    def finish(self, outcome: str, wait: float = 0.0, run: float = 0.0):
+        """Record a job leaving the pool, outcome is completed, failed or cancelled."""
+        with self._lock:
+            self.pending -= 1
+            if outcome == "completed":
+                self.completed += 1
+            elif outcome == "failed":
+                self.failed += 1
+        if outcome == "completed":
+            self.wait.observe(wait)
+            self.run.observe(run)
+
+    def snapshot(self, workers: int, max_pending: int):
+        with self._lock:
+            pending = self.pending
+            stats = {
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+        return {
+            "workers": workers,
+            "max_pending": max_pending,
+            "pending": pending,
+            "queue_depth": max(pending - workers, 0),
+            **stats,
+            "wait_seconds": self.wait.as_dict(),
+            "run_seconds": self.run.as_dict(),
+        }
@@ -1,14 +1,47 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text, Enum
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Text, Enum, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+from array import array
 from .database import Base
 import uuid
 
 def generate_uuid():
     return str(uuid.uuid4())
 
+class CellValues(TypeDecorator):
+    """One value per cell: float8[] on PostgreSQL, packed float32 bytes elsewhere."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(ARRAY(Float(precision=53)))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == "postgresql":
+            return [float(v) for v in value]
+        return array("f", value).tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == "postgresql":
+            return list(value)
+        values = array("f")
+        values.frombytes(value)
+        # float32 holds ~7 significant digits, drop the widening noise
+        return [float("%.7g" % v) for v in values]
+
 class BatteryBank(Base):
     __tablename__ = "battery_banks"
+    __table_args__ = (
+        Index("ix_battery_banks_name", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
@@ -21,14 +54,21 @@ class BatteryBank(Base):
 
 class TestSession(Base):
     __tablename__ = "test_sessions"
+    __table_args__ = (
+        # Keyset pagination on (start_time, id), unfiltered and per status or bank
+        Index("ix_test_sessions_start_time_id", "start_time", "id"),
+        Index("ix_test_sessions_status_start_time_id", "status", "start_time", "id"),
+        Index("ix_test_sessions_bank_start_time_id", "bank_id", "start_time", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     bank_id = Column(Integer, ForeignKey("battery_banks.id"), nullable=False)
-    start_time = Column(DateTime, default=datetime.utcnow)
+    start_time = Column(DateTime, nullable=False, default=datetime.utcnow)  # keyset pagination needs one on every test
     status = Column(String(20), default="scheduled")  # scheduled, in_progress, completed
     total_cycles = Column(Integer, nullable=False)
     current_cycle = Column(Integer, default=1)
     current_phase = Column(String(20), default="charge")  # charge, discharge
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped on every write, keys cached exports
     
     # Relationships
     bank = relationship("BatteryBank", back_populates="tests")
@@ -44,6 +84,10 @@ class TestSession(Base):
 
 class ReadingCycle(Base):
     __tablename__ = "reading_cycles"
+    __table_args__ = (
+        # get_active_cycle, and get_cycles_for_test through the leading column
+        Index("ix_reading_cycles_test_lookup", "test_id", "cycle_number", "phase", "status"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     test_id = Column(Integer, ForeignKey("test_sessions.id"), nullable=False)
@@ -53,16 +97,29 @@ class ReadingCycle(Base):
     start_time = Column(DateTime, default=datetime.utcnow)
     end_time = Column(DateTime, nullable=True)
     status = Column(String(20), default="active")  # active, completed
+    ccv_sequence = Column(Integer, nullable=False, default=0, server_default="0")  # last CCV sequence number issued
     
     # Relationships
     test = relationship("TestSession", back_populates="cycles")
     readings = relationship("Reading", back_populates="cycle")
+    snapshots = relationship("ReadingSnapshot", back_populates="cycle")
+
+    @property
+    def cell_readings(self):
+        """Per-cell readings regardless of the storage layout they were written with."""
+        readings = list(self.readings)
+        for snapshot in self.snapshots:
+            readings.extend(snapshot.to_readings())
+        return readings
 
     def get_readings_by_type(self, reading_type):
-        return [r for r in self.readings if r.reading_type == reading_type]
+        return [r for r in self.cell_readings if r.reading_type == reading_type]
 
 class Reading(Base):
     __tablename__ = "readings"
+    __table_args__ = (
+        Index("ix_readings_cycle_type_seq_cell", "cycle_id", "reading_type", "sequence_number", "cell_number"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cycle_id = Column(Integer, ForeignKey("reading_cycles.id"), nullable=False)
@@ -74,4 +131,103 @@ class Reading(Base):
     phase = Column(String(20), nullable=False)  # charge, discharge
     
     # Relationships
-    cycle = relationship("ReadingCycle", back_populates="readings")
\ No newline at end of file
+    cycle = relationship("ReadingCycle", back_populates="readings")
+
+class ReadingSnapshot(Base):
+    """A whole snapshot in one row, used when READING_STORAGE=snapshot."""
+    __tablename__ = "reading_snapshots"
+    __table_args__ = (
+        Index("ix_reading_snapshots_cycle_type_seq", "cycle_id", "reading_type", "sequence_number"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    cycle_id = Column(Integer, ForeignKey("reading_cycles.id"), nullable=False)
+    reading_type = Column(String(3), nullable=False)  # OCV, CCV
+    sequence_number = Column(Integer, nullable=True)  # For CCV readings
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    phase = Column(String(20), nullable=False)  # charge, discharge
+    values = Column(CellValues, nullable=False)  # index 0 is cell 1
+
+    # Relationships
+    cycle = relationship("ReadingCycle", back_populates="snapshots")
+
+    def to_readings(self):
+        """Expand into transient Reading objects, one per cell, for per-cell consumers."""
+        return [
+            Reading(
+                cycle_id=self.cycle_id,
+                reading_type=self.reading_type,
+                cell_number=cell_num,
+                value=value,
+                sequence_number=self.sequence_number,
+                timestamp=self.timestamp,
+                phase=self.phase
+            )
+            for cell_num, value in enumerate(self.values, 1)
+        ]
+
+
+class CycleCellSummary(Base):
+    """Running statistics of one cell's OCV or CCV readings in a cycle.
+
+    Kept up to date by ingest.write_snapshots in the transaction that stores the
+    readings, so summaries never need the readings themselves. m2 is the sum of
+    squared deviations from the mean (Welford), the variance is m2 / count.
+    """
+    __tablename__ = "cycle_cell_summary"
+    __table_args__ = (
+        Index("ix_cycle_cell_summary_cycle_type_cell", "cycle_id", "reading_type", "cell_number", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    cycle_id = Column(Integer, ForeignKey("reading_cycles.id"), nullable=False)
+    phase = Column(String(20), nullable=False)  # charge, discharge
+    reading_type = Column(String(3), nullable=False)  # OCV, CCV
+    cell_number = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False)
+    min_value = Column(Float, nullable=False)
+    max_value = Column(Float, nullable=False)
+    mean = Column(Float, nullable=False)
+    m2 = Column(Float, nullable=False)
+    last_value = Column(Float, nullable=False)
+    last_timestamp = Column(DateTime, nullable=False)
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else None
+
+
+class CellAlert(Base):
+    """A cell flagged by the anomaly detector while CCV readings came in, see app/anomaly.py."""
+    __tablename__ = "cell_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cycle_id = Column(Integer, ForeignKey("reading_cycles.id"), nullable=False, index=True)
+    cell_number = Column(Integer, nullable=False)
+    sequence_number = Column(Integer, nullable=True)
+    kind = Column(String(10), nullable=False)  # outlier, drop
+    value = Column(Float, nullable=False)
+    expected = Column(Float, nullable=False)
+    score = Column(Float, nullable=False)  # standard deviations for outliers, volts beyond the bank for drops
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+
+class ExportJob(Base):
+    """A report rendered in the background, see app/jobs.py."""
+    __tablename__ = "export_jobs"
+    __table_args__ = (
+        # Workers claim the oldest queued job
+        Index("ix_export_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    test_id = Column(Integer, ForeignKey("test_sessions.id"), nullable=False, index=True)
+    format = Column(String(10), nullable=False)  # csv, pdf
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, completed, failed, expired
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed by the worker running it
+    attempt = Column(Integer, nullable=False, default=0, server_default="0")  # bumped by every claim, identifies the running worker
+    finished_at = Column(DateTime, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
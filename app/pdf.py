@@ -0,0 +1,207 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .metrics import WorkerPoolMetrics
+
+# Reports rendered at the same time. "process" keeps reportlab off the GIL
+# entirely, "thread" avoids the worker start-up cost on small deployments
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_WORKER_KIND = os.getenv("PDF_WORKER_KIND", "process")
+
+# Renders queued or running before new requests are turned away
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", str(PDF_WORKERS * 4)))
+
+
+class RenderPoolFull(Exception):
+    """Raised when PDF_MAX_PENDING renders are already queued or running."""
+
+
+class RenderPool:
+    """Bounded executor for CPU-bound report rendering, created on first use."""
+
+    def __init__(self, workers: int, kind: str, max_pending: int):
+        self.workers = workers
+        self.kind = kind
+        self.max_pending = max_pending
+        self.metrics = WorkerPoolMetrics()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # spawn, forking a process that runs threads and an event loop is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="pdf")
+            return self._executor
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` in the pool and await its result without blocking the loop."""
+        metrics = self.metrics
+        if not metrics.admit(self.max_pending):
+            raise RenderPoolFull(f"{metrics.pending} reports already pending")
+        submitted = time.perf_counter()
+
+        def done(future):
+            # Runs when the worker finishes, even if the awaiting request went away
+            if future.cancelled():
+                metrics.finish("cancelled")
+            elif future.exception() is not None:
+                metrics.finish("failed")
+            else:
+                seconds = future.result()[1]
+                metrics.finish("completed", max(time.perf_counter() - submitted - seconds, 0.0), seconds)
+
+        try:
+            future = self.executor().submit(_timed, fn, *args)
+        except Exception:
+            metrics.finish("failed")
+            raise
+        future.add_done_callback(done)
+        result, _ = await asyncio.wrap_future(future)
+        return result
+
+    def status(self):
+        return self.metrics.snapshot(self.workers, self.max_pending)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+render_pool = RenderPool(PDF_WORKERS, PDF_WORKER_KIND, PDF_MAX_PENDING)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+# Built once and shared by every report instead of per table
+STYLES = getSampleStyleSheet()
+
+INFO_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+# Readings tables use a small fixed grid so reportlab never has to measure cells
+READINGS_FONT_SIZE = 7
+READINGS_ROW_HEIGHT = 11
+CELL_COLUMN_WIDTH = 0.45 * inch
+VALUE_COLUMN_WIDTH = 0.6 * inch
+
+READINGS_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('BACKGROUND', (0, 1), (0, -1), colors.whitesmoke),
+    ('FONTSIZE', (0, 0), (-1, -1), READINGS_FONT_SIZE),
+    ('LEADING', (0, 0), (-1, -1), READINGS_FONT_SIZE + 1),
+    ('PADDING', (0, 0), (-1, -1), 2),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+
+def readings_tables(table, width):
+    """Split a readings table into LongTables that fit `width`.
+
+    The first column (cell number) is repeated in every column chunk and the header
+    row is repeated on every page, so any bank size and snapshot count paginates.
+    Yields (first_header, last_header, LongTable) per chunk.
+    """
+    header = table[0]
+    per_chunk = max(1, int((width - CELL_COLUMN_WIDTH) // VALUE_COLUMN_WIDTH))
+    for start in range(1, len(header), per_chunk):
+        end = min(start + per_chunk, len(header))
+        data = [[row[0], *row[start:end]] for row in table]
+        yield header[start], header[end - 1], LongTable(
+            data,
+            colWidths=[CELL_COLUMN_WIDTH] + [VALUE_COLUMN_WIDTH] * (end - start),
+            rowHeights=READINGS_ROW_HEIGHT,
+            repeatRows=1,
+            style=READINGS_TABLE_STYLE,
+            hAlign='LEFT',
+        )
+
+
+def render_test_report(report: dict) -> bytes:
+    """Render a test report to PDF bytes.
+
+    `report` holds only plain values so it can be sent to a worker process:
+    bank_name, test_id, status, total_cycles, generated and cycles, a list of
+    {"cycle_number", "table", "duration"} where table is header row + cell rows.
+    """
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=A4,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+
+    # Container for the 'Flowable' objects
+    elements = []
+
+    title_style = STYLES['Heading1']
+    heading_style = STYLES['Heading2']
+    chunk_style = STYLES['Heading4']
+    normal_style = STYLES['Normal']
+
+    # Add title
+    elements.append(Paragraph(f"Battery Test Report - {report['bank_name']}", title_style))
+    elements.append(Spacer(1, 12))
+
+    # Add test information
+    elements.append(Paragraph("Test Information", heading_style))
+
+    test_info = [
+        ["Test ID:", str(report['test_id'])],
+        ["Status:", report['status']],
+        ["Total Cycles:", str(report['total_cycles'])],
+        ["Generated:", report['generated']]
+    ]
+
+    elements.append(Table(test_info, colWidths=[2*inch, 4*inch], style=INFO_TABLE_STYLE))
+    elements.append(Spacer(1, 12))
+
+    # Add cycle data, wide tables continue below in column chunks
+    for cycle in report['cycles']:
+        elements.append(Paragraph(f"Cycle {cycle['cycle_number']}", heading_style))
+
+        chunks = list(readings_tables(cycle['table'], doc.width))
+        for first, last, table in chunks:
+            if len(chunks) > 1:
+                elements.append(Paragraph(f"{first} to {last}", chunk_style))
+            elements.append(table)
+            elements.append(Spacer(1, 6))
+
+        if cycle['duration']:
+            elements.append(Paragraph(f"Duration: {cycle['duration']}", normal_style))
+
+        elements.append(Spacer(1, 12))
+
+    # Build the PDF
+    doc.build(elements)
+    return output.getvalue()
@@ -0,0 +1,135 @@
+import numpy as np
+
+
+class CycleMatrix:
+    """Readings of one cycle pivoted to cells x CCV sequences.
+
+    `ocv` has one value per cell and `ccv` one row per cell and one column per
+    entry of `sequences`. Missing readings are NaN. `sequence_times` holds the
+    earliest timestamp of each CCV snapshot and `ocv_time` that of the OCV, None
+    where unknown.
+    """
+
+    def __init__(self, num_cells, ocv, sequences, sequence_times, ccv, ocv_time=None):
+        self.num_cells = num_cells
+        self.ocv = ocv
+        self.sequences = sequences
+        self.sequence_times = sequence_times
+        self.ccv = ccv
+        self.ocv_time = ocv_time
+
+    def formatted_rows(self, fmt="%.2f", missing="-"):
+        """Yield (cell_number, ocv, [ccv, ...]) with values formatted as strings."""
+        ocv = format_values(self.ocv, fmt, missing).tolist()
+        ccv = format_values(self.ccv, fmt, missing).tolist()
+        for index in range(self.num_cells):
+            yield index + 1, ocv[index], ccv[index]
+
+    def value_rows(self, missing=None):
+        """Yield (cell_number, ocv, [ccv, ...]) as floats, NaN becomes `missing`."""
+        ocv = np.where(np.isnan(self.ocv), missing, self.ocv.astype(object)).tolist()
+        ccv = np.where(np.isnan(self.ccv), missing, self.ccv.astype(object)).tolist()
+        for index in range(self.num_cells):
+            yield index + 1, ocv[index], ccv[index]
+
+    def sequence_headers(self, time_format="%I:%M %p"):
+        """Column titles like "CCV-3 (02:15 PM)", one per entry of `sequences`."""
+        return [
+            sequence_header(sequence, timestamp, time_format)
+            for sequence, timestamp in zip(self.sequences, self.sequence_times)
+        ]
+
+
+def sequence_header(sequence, timestamp, time_format="%I:%M %p"):
+    """Title of one CCV column, shared by the details page and the exports."""
+    return f"CCV-{sequence} ({timestamp.strftime(time_format) if timestamp else ''})"
+
+
+def format_values(values, fmt="%.2f", missing="-"):
+    """Format an array of floats as strings in bulk, NaN becomes `missing`."""
+    formatted = np.char.mod(fmt, np.nan_to_num(values)).astype(object)
+    formatted[np.isnan(values)] = missing
+    return formatted
+
+
+def build_cycle_matrices(cycle_ids, num_cells, rows, sequence_times, snapshots):
+    """Pivot every cycle's readings in one vectorized pass over the fetched columns.
+
+    `rows` are (cycle_id, reading_type, sequence_number, cell_number, value) tuples
+    from the readings table, `sequence_times` are (cycle_id, reading_type,
+    sequence_number, timestamp) tuples of the earliest OCV and CCV times and
+    `snapshots` are (cycle_id, reading_type, sequence_number, timestamp, values)
+    tuples from reading_snapshots, see crud.get_reading_columns.
+    """
+    cycles, types, sequences, cells, values = _columns(rows, 5)
+    columns = (
+        np.asarray(cycles, dtype=np.int64),
+        np.asarray(types, dtype=object),
+        np.asarray(sequences, dtype=np.float64),  # None becomes NaN
+        np.asarray(cells, dtype=np.int64),
+        np.asarray(values, dtype=np.float64),
+    )
+
+    # One entry per snapshot, few enough to group in Python
+    times_by_cycle, ocv_times = {}, {}
+    for cycle_id, reading_type, sequence, timestamp in sequence_times:
+        if timestamp is None:
+            continue
+        if reading_type == "OCV":
+            ocv_times[cycle_id] = min(timestamp, ocv_times.get(cycle_id, timestamp))
+        elif sequence is not None:
+            times_by_cycle.setdefault(cycle_id, {})[sequence] = timestamp
+    snapshots_by_cycle = {}
+    for snapshot in snapshots:
+        snapshots_by_cycle.setdefault(snapshot[0], []).append(snapshot[1:])
+
+    matrices = {}
+    for cycle_id in cycle_ids:
+        mask = columns[0] == cycle_id
+        matrices[cycle_id] = _build_matrix(
+            num_cells,
+            *(column[mask] for column in columns[1:]),
+            times_by_cycle.get(cycle_id, {}),
+            ocv_times.get(cycle_id),
+            snapshots_by_cycle.get(cycle_id, [])
+        )
+    return matrices
+
+
+def _columns(records, width):
+    if not records:
+        return [[] for _ in range(width)]
+    return list(zip(*records))
+
+
+def _build_matrix(num_cells, types, sequences, cells, values, sequence_times, ocv_time, snapshots):
+    in_range = (cells >= 1) & (cells <= num_cells)
+    is_ocv = (types == "OCV") & in_range
+    is_ccv = (types == "CCV") & in_range & ~np.isnan(sequences)
+
+    ccv_snapshots = [s for s in snapshots if s[0] == "CCV" and s[1] is not None]
+    columns = np.unique(np.concatenate([
+        sequences[is_ccv],
+        np.asarray([s[1] for s in ccv_snapshots], dtype=np.float64),
+    ])).astype(np.int64)
+
+    ocv = np.full(num_cells, np.nan)
+    ocv[cells[is_ocv] - 1] = values[is_ocv]
+
+    ccv = np.full((num_cells, len(columns)), np.nan)
+    ccv[cells[is_ccv] - 1, np.searchsorted(columns, sequences[is_ccv])] = values[is_ccv]
+
+    times = dict(sequence_times)
+    for reading_type, sequence, timestamp, snapshot_values in snapshots:
+        snapshot_values = np.asarray(snapshot_values[:num_cells], dtype=np.float64)
+        if reading_type == "OCV":
+            ocv[:len(snapshot_values)] = snapshot_values
+            if timestamp is not None:
+                ocv_time = min(timestamp, ocv_time or timestamp)
+        elif sequence is not None:
+            ccv[:len(snapshot_values), np.searchsorted(columns, sequence)] = snapshot_values
+            if timestamp is not None:
+                times[sequence] = min(timestamp, times.get(sequence, timestamp))
+
+    columns = columns.tolist()
+    return CycleMatrix(num_cells, ocv, columns, [times.get(sequence) for sequence in columns], ccv, ocv_time)
@@ -0,0 +1,436 @@
+import csv
+import io
+import os
+import tempfile
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc
+import pyarrow.parquet as pq
+import xlsxwriter
+from sqlalchemy.orm import Session
+
+from . import cache, crud, database, pivot
+
+# Rows fetched per round trip by the server-side cursor of a streamed export
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "5000"))
+
+# CSV rows buffered before a chunk is handed to the response
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "500"))
+
+# Rows per Parquet row group and per Arrow record batch
+COLUMNAR_BATCH_ROWS = int(os.getenv("EXPORT_COLUMNAR_BATCH_ROWS", str(128 * 1024)))
+
+# zstd, snappy, lz4, gzip or none
+COLUMNAR_COMPRESSION = os.getenv("EXPORT_COLUMNAR_COMPRESSION", "zstd")
+
+# Size of the chunks a finished workbook is streamed in
+XLSX_CHUNK_BYTES = 64 * 1024
+
+CSV_COLUMNS = ["Cycle", "Phase", "Cell No.", "OCV"]
+MISSING = "-"
+
+PHASES = pa.array(["charge", "discharge"])
+PHASE_INDEX = {phase: index for index, phase in enumerate(PHASES.to_pylist())}
+READING_TYPES = pa.array(["OCV", "CCV"])
+
+# Long format, one row per reading. Phase and type are dictionary encoded
+# against the fixed value sets above, so every batch shares one dictionary.
+# Values are float32, the precision the snapshot layout stores them in
+READINGS_SCHEMA = pa.schema([
+    ("cycle", pa.int32()),
+    ("phase", pa.dictionary(pa.int8(), pa.string())),
+    ("reading_type", pa.dictionary(pa.int8(), pa.string())),
+    ("sequence_number", pa.int32()),
+    ("cell_number", pa.int32()),
+    ("value", pa.float32()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+])
+
+
+def iter_test_csv(test_id: int):
+    """Yield the CSV export of a test as encoded chunks.
+
+    The header is built from one grouped query, then each cycle's readings are
+    streamed in index order, pivoted and written out one row per cell, so memory
+    is bounded by one cycle and one chunk no matter how many cycles the test has.
+
+    Opens its own session because the response outlives the request's dependencies.
+    """
+    with database.SessionLocal() as db:
+        test = crud.get_test(db, test_id)
+        if test is None:
+            return
+        num_cells = test.bank.num_cells
+        cycles = crud.get_cycles_for_test(db, test_id)
+        cycle_ids = [cycle.id for cycle in cycles]
+
+        # Headers carry the snapshot time, so each cycle gets its own CCV columns
+        # unless two cycles share sequence and minute
+        cycle_headers = _cycle_headers(db, cycle_ids)
+        headers = {}
+        for cycle in cycles:
+            for _, header in cycle_headers[cycle.id]:
+                headers.setdefault(header, len(headers))
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS + list(headers))
+        yield _drain(buffer)
+
+        snapshot_cycles = crud.get_snapshot_cycle_ids(db, cycle_ids)
+        pending = 0
+        for cycle in sorted(cycles, key=lambda c: (c.cycle_number, c.phase.capitalize(), c.id)):
+            positions = {sequence: headers[header] for sequence, header in cycle_headers[cycle.id]}
+            # Columns of other cycles stay empty, this cycle's own gaps show MISSING
+            blank = [""] * len(headers)
+            for position in positions.values():
+                blank[position] = MISSING
+
+            cells = _cycle_cells(db, cycle.id, cycle.id in snapshot_cycles, num_cells, positions, blank)
+            phase = cycle.phase.capitalize()
+            for cell_number, ocv, ccv in cells:
+                writer.writerow([cycle.cycle_number, phase, cell_number, ocv, *ccv])
+                pending += 1
+                if pending >= EXPORT_CHUNK_ROWS:
+                    yield _drain(buffer)
+                    pending = 0
+
+        if pending:
+            yield _drain(buffer)
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    chunk = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def _cycle_headers(db, cycle_ids):
+    """(sequence, header) of every CCV snapshot, in sequence order, per cycle id."""
+    sequences = {cycle_id: [] for cycle_id in cycle_ids}
+    for cycle_id, sequence, timestamp in crud.get_ccv_sequence_times(db, cycle_ids):
+        if sequence is not None:
+            sequences[cycle_id].append((sequence, timestamp))
+    return {
+        cycle_id: [(sequence, pivot.sequence_header(sequence, timestamp)) for sequence, timestamp in sorted(times)]
+        for cycle_id, times in sequences.items()
+    }
+
+
+def _cycle_cells(db, cycle_id, snapshots, num_cells, positions, blank, fmt="%.2f", missing=MISSING):
+    """One (cell, ocv, ccv) row per cell of a cycle, ccv laid out by `positions`.
+
+    Values are formatted with `fmt`, or left as floats when it is None.
+    """
+    if snapshots:
+        matrix = pivot.build_cycle_matrices(
+            [cycle_id], num_cells, *crud.get_reading_columns(db, [cycle_id])
+        )[cycle_id]
+    else:
+        readings = crud.iter_cycle_readings(db, cycle_id, EXPORT_FETCH_SIZE)
+        matrix = _streamed_matrix(readings, num_cells, list(positions))
+    return _matrix_cells(matrix, positions, blank, fmt, missing)
+
+
+def _streamed_matrix(readings, num_cells, sequences):
+    """Pivot readings streamed in index order into a CycleMatrix over `sequences`.
+
+    Rows arrive grouped by type and sequence rather than by cell, so one cycle is
+    held as a cells x sequences array, each fetched batch is placed in it at once.
+    """
+    columns = {sequence: index for index, sequence in enumerate(sequences)}
+    ocv = np.full(num_cells, np.nan)
+    ccv = np.full((num_cells, len(sequences)), np.nan)
+    for batch in readings.partitions():
+        types, sequence_numbers, cells, values = zip(*batch)
+        cells = np.asarray(cells, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)  # None becomes NaN
+        types = np.asarray(types, dtype=object)
+        keep = (cells >= 1) & (cells <= num_cells) & ~np.isnan(values)
+
+        is_ocv = keep & (types == "OCV")
+        ocv[cells[is_ocv] - 1] = values[is_ocv]
+
+        positions = np.array([columns.get(sequence, -1) for sequence in sequence_numbers], dtype=np.int64)
+        is_ccv = keep & (types == "CCV") & (positions >= 0)
+        ccv[cells[is_ccv] - 1, positions[is_ccv]] = values[is_ccv]
+    return pivot.CycleMatrix(num_cells, ocv, sequences, [None] * len(sequences), ccv)
+
+
+def _matrix_cells(matrix, positions, blank, fmt, missing):
+    """Rows of a pivoted cycle with each sequence's value moved to its CSV column."""
+    rows = matrix.value_rows(missing) if fmt is None else matrix.formatted_rows(fmt, missing)
+    for cell_number, ocv, values in rows:
+        ccv = list(blank)
+        for sequence, value in zip(matrix.sequences, values):
+            if sequence in positions:
+                ccv[positions[sequence]] = value
+        yield cell_number, ocv, ccv
+
+
+def iter_test_xlsx(test_id: int):
+    """Yield an Excel workbook of a test with one sheet per cycle and phase, in chunks.
+
+    Rows come from the same readings as the CSV export and are written with
+    xlsxwriter in constant_memory mode, which flushes every row to a temporary
+    file as soon as it is complete, so memory stays at one row however large the
+    test is. The workbook is assembled into a temporary file once all sheets are
+    written and streamed from there, nothing can be sent before that.
+    """
+    fd, path = tempfile.mkstemp(prefix="test_export_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        with database.SessionLocal() as db:
+            test = crud.get_test(db, test_id)
+            if test is None:
+                return
+            _write_xlsx(db, test, path)
+        # The session is closed again before the file goes out
+        with open(path, "rb") as file:
+            while chunk := file.read(XLSX_CHUNK_BYTES):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def _write_xlsx(db, test, path):
+    num_cells = test.bank.num_cells
+    cycles = crud.get_cycles_for_test(db, test.id)
+    cycle_ids = [cycle.id for cycle in cycles]
+    cycle_headers = _cycle_headers(db, cycle_ids)
+    snapshot_cycles = crud.get_snapshot_cycle_ids(db, cycle_ids)
+
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    header_format = workbook.add_format({"bold": True, "bg_color": "#D9D9D9", "border": 1})
+    value_format = workbook.add_format({"num_format": "0.00"})
+
+    names = set()
+    for cycle in sorted(cycles, key=lambda c: (c.cycle_number, c.phase.capitalize(), c.id)):
+        name = _sheet_name(f"Cycle {cycle.cycle_number} {cycle.phase.capitalize()}", names)
+        sheet = workbook.add_worksheet(name)
+        headers = cycle_headers[cycle.id]
+        sheet.set_column(0, 0, 8)
+        sheet.set_column(1, 1 + len(headers), 18, value_format)
+        sheet.freeze_panes(1, 1)
+        sheet.write_row(0, 0, ["Cell No.", "OCV", *(header for _, header in headers)], header_format)
+
+        # Gaps stay empty cells so every value column is numeric
+        positions = {sequence: position for position, (sequence, _) in enumerate(headers)}
+        cells = _cycle_cells(
+            db, cycle.id, cycle.id in snapshot_cycles, num_cells, positions, [None] * len(headers),
+            fmt=None, missing=None
+        )
+        for row, (cell_number, ocv, ccv) in enumerate(cells, start=1):
+            sheet.write_row(row, 0, [cell_number, ocv, *ccv])
+
+    if not names:
+        workbook.add_worksheet("No cycles")
+    workbook.close()
+
+
+def _sheet_name(name, taken):
+    """Unique sheet name within Excel's 31 character limit."""
+    candidate, suffix = name[:31], 2
+    while candidate.lower() in taken:
+        tag = f" ({suffix})"
+        candidate, suffix = name[:31 - len(tag)] + tag, suffix + 1
+    taken.add(candidate.lower())
+    return candidate
+
+
+def iter_test_readings(test_id: int, format: str):
+    """Yield a test's raw readings as a Parquet file or an Arrow IPC stream, in chunks.
+
+    `format` is "parquet" or "arrow". Values stay float32 numbers and timestamps
+    stay typed, nothing is rounded to text. Readings are streamed from the
+    database and written one row group (Parquet) or record batch (Arrow) of
+    COLUMNAR_BATCH_ROWS at a time, so memory is bounded by one batch.
+    """
+    with database.SessionLocal() as db:
+        test = crud.get_test(db, test_id)
+        if test is None:
+            return
+        schema = READINGS_SCHEMA.with_metadata({
+            "test_id": str(test.id),
+            "bank_name": test.bank.name,
+            "num_cells": str(test.bank.num_cells),
+        })
+
+        sink = _ChunkSink()
+        compression = None if COLUMNAR_COMPRESSION == "none" else COLUMNAR_COMPRESSION
+        if format == "parquet":
+            writer = pq.ParquetWriter(sink, schema, compression=compression or "none", use_dictionary=True)
+        else:
+            writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression=compression))
+        with writer:
+            for table in _reading_tables(db, test_id, schema):
+                writer.write_table(table)
+                yield sink.drain()
+        yield sink.drain()
+
+
+def iter_zip(entries):
+    """Yield a ZIP archive as it is written, `entries` are (name, chunks, compress) tuples.
+
+    Entries are consumed one after another, each chunk is compressed and handed on
+    right away, so the archive never sits in memory. The sink is not seekable, sizes
+    and checksums go into data descriptors after each entry.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for name, chunks, compress in entries:
+            info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with archive.open(info, "w", force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    yield from sink.pending()
+            yield from sink.pending()
+    yield from sink.pending()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out everything written since the last drain."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        chunk = b"".join(self._chunks)
+        self._chunks = []
+        return chunk
+
+    def pending(self):
+        """Yield the drained bytes unless nothing was written since the last drain."""
+        if self._chunks:
+            yield self.drain()
+
+
+def _reading_tables(db, test_id, schema):
+    """Group the small per-fetch batches into tables of about COLUMNAR_BATCH_ROWS rows."""
+    pending, rows = [], 0
+    for batch in _reading_batches(db, test_id, schema):
+        pending.append(batch)
+        rows += batch.num_rows
+        if rows >= COLUMNAR_BATCH_ROWS:
+            yield pa.Table.from_batches(pending, schema).combine_chunks()
+            pending, rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending, schema).combine_chunks()
+
+
+def _reading_batches(db, test_id, schema):
+    cycles = crud.get_cycles_for_test(db, test_id)
+    snapshot_cycles = crud.get_snapshot_cycle_ids(db, [cycle.id for cycle in cycles])
+    for cycle in cycles:
+        readings = crud.iter_typed_readings(db, cycle.id, EXPORT_FETCH_SIZE)
+        for partition in readings.partitions():
+            yield _readings_batch(schema, cycle, *zip(*partition))
+
+        if cycle.id not in snapshot_cycles:
+            continue
+        # One batch per snapshot, expanded to one row per cell
+        for reading_type, sequence, timestamp, snapshot_values in crud.get_cycle_snapshots(db, cycle.id):
+            count = len(snapshot_values)
+            yield _readings_batch(
+                schema, cycle,
+                [reading_type] * count,
+                [sequence] * count,
+                np.arange(1, count + 1, dtype=np.int32),
+                np.asarray(snapshot_values, dtype=np.float32),
+                [timestamp] * count,
+            )
+
+
+def _readings_batch(schema, cycle, types, sequences, cells, values, timestamps):
+    count = len(cells)
+    phase = PHASE_INDEX.get(cycle.phase)
+    phase_indices = pa.nulls(count, pa.int8()) if phase is None else pa.array(np.full(count, phase, dtype=np.int8))
+    type_indices = pc.index_in(pa.array(types, pa.string()), value_set=READING_TYPES).cast(pa.int8())
+    return pa.RecordBatch.from_arrays([
+        pa.array(np.full(count, cycle.cycle_number, dtype=np.int32)),
+        pa.DictionaryArray.from_arrays(phase_indices, PHASES),
+        pa.DictionaryArray.from_arrays(type_indices, READING_TYPES),
+        pa.array(sequences, pa.int32()),
+        pa.array(cells, pa.int32()),
+        pa.array(np.asarray(values, dtype=np.float32)),
+        pa.array(timestamps, pa.timestamp("us")).cast(pa.timestamp("us", tz="UTC")),
+    ], schema=schema)
+
+
+# Helper function to format duration
+def format_duration(start_time, end_time):
+    if not end_time:
+        return "In Progress"
+    duration = end_time - start_time
+    hours = duration.seconds // 3600
+    minutes = (duration.seconds % 3600) // 60
+    return f"{hours}h {minutes}m"
+
+
+def pdf_report(db: Session, test_id: int):
+    """Collect everything the PDF shows as plain values, see pdf.render_test_report."""
+    test = crud.get_test(db, test_id)
+    if test is None:
+        return None
+
+    num_cells = test.bank.num_cells
+    cycles = crud.get_cycles_for_test(db, test_id)
+    cycle_ids = [cycle.id for cycle in cycles]
+    matrices = pivot.build_cycle_matrices(cycle_ids, num_cells, *crud.get_reading_columns(db, cycle_ids))
+
+    report_cycles = []
+    for cycle in cycles:
+        matrix = matrices[cycle.id]
+        table = [['Cell #', 'OCV (V)'] + [f'CCV {seq} (V)' for seq in matrix.sequences]]
+        table.extend([str(cell), ocv, *ccv] for cell, ocv, ccv in matrix.formatted_rows())
+        report_cycles.append({
+            "cycle_number": cycle.cycle_number,
+            "table": table,
+            "duration": format_duration(cycle.start_time, cycle.end_time) if cycle.end_time else None,
+        })
+
+    return {
+        "bank_name": test.bank.name,
+        "test_id": test.id,
+        "status": test.status.capitalize() if test.status else 'Unknown',
+        "total_cycles": test.total_cycles,
+        "generated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "cycles": report_cycles,
+    }
+
+
+def export_source(test_id: int, kind: str):
+    """Look up a test's export in the report cache, on a session of its own.
+
+    Returns None if the test does not exist, otherwise (key, cached, report):
+    the cache key or None while the test may change, the cached file already
+    open if there is one, and for a PDF that isn't cached the report to render.
+    Blocking, async callers run it in a thread.
+    """
+    with database.SessionLocal() as db:
+        test = crud.get_test(db, test_id)
+        if test is None:
+            return None
+        key = cache.cached_export_key(test, kind)
+        cached = cache.report_cache.open(key) if key else None
+        report = pdf_report(db, test_id) if kind == "pdf" and cached is None else None
+        return key, cached, report
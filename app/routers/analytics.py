@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from .. import analytics, crud, schemas, database
+
+router = APIRouter(
+    prefix="/api",
+    tags=["analytics"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Building the reading cube and the NumPy statistics is CPU-bound, so these are
+# plain `def` handlers on the sync session and run in the threadpool
+@router.get("/tests/{test_id}/analytics", response_model=schemas.TestAnalytics)
+def read_test_analytics(test_id: int, db: Session = Depends(database.get_db)):
+    """Per-cell CCV mean/min/max, deviation from the bank median, end-of-discharge voltage and rank."""
+    result = analytics.analyze_test(db, test_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return result
+
+@router.get("/tests/{test_id}/summary", response_model=schemas.TestSummary)
+def read_test_summary(test_id: int, db: Session = Depends(database.get_db)):
+    """Count, min, max, mean, variance and last reading per cell, cycle and reading type."""
+    result = analytics.cycle_summaries(db, test_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return result
+
+# These also read and write the report cache files
+@router.get("/tests/{test_id}/discharge", response_model=schemas.DischargeAnalysis)
+def read_discharge_analysis(
+    test_id: int,
+    cutoff: float = Query(analytics.DISCHARGE_CUTOFF_VOLTAGE, gt=0, description="Cell cutoff voltage"),
+    current: Optional[float] = Query(None, gt=0, description="Constant discharge current in amperes"),
+    db: Session = Depends(database.get_db)
+):
+    """Per-cell discharge curves, time to cutoff and, given the current, capacity per discharge cycle."""
+    result = analytics.analyze_discharge(db, test_id, cutoff, current)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return result
+
+@router.get("/tests/{test_id}/series", response_model=schemas.TestSeries)
+def read_test_series(
+    test_id: int,
+    points: int = Query(analytics.SERIES_POINTS, ge=3, le=10000, description="Most points per cell and cycle"),
+    db: Session = Depends(database.get_db)
+):
+    """Per-cell CCV voltage against elapsed time of each cycle, downsampled with LTTB for charts."""
+    result = analytics.test_series(db, test_id, points)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return result
+
+def _test_alerts(db, test_id: int, limit: int):
+    if crud.get_test(db, test_id) is None:
+        return None
+    return [row._mapping for row in crud.get_alerts(db, test_id, limit)]
+
+@router.get("/tests/{test_id}/alerts", response_model=List[schemas.CellAlert])
+async def read_test_alerts(
+    test_id: int,
+    limit: int = Query(100, gt=0, le=1000),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Cells the anomaly detector flagged during CCV ingest, newest first."""
+    alerts = await db.run_sync(_test_alerts, test_id, limit)
+    if alerts is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return alerts
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from .. import crud, schemas, database
 
@@ -9,25 +9,29 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Serialize while still inside run_sync, relationships may lazy-load
+def _cycle_response(db_cycle):
+    return schemas.Cycle.model_validate(db_cycle) if db_cycle is not None else None
+
 @router.post("/", response_model=schemas.Cycle)
-async def create_cycle(cycle: schemas.CycleCreate, db: Session = Depends(database.get_db)):
-    return crud.create_cycle(db, cycle)
+async def create_cycle(cycle: schemas.CycleCreate, db: AsyncSession = Depends(database.get_async_db)):
+    return await db.run_sync(lambda session: _cycle_response(crud.create_cycle(session, cycle)))
 
 @router.get("/{cycle_id}", response_model=schemas.Cycle)
-async def read_cycle(cycle_id: int, db: Session = Depends(database.get_db)):
-    db_cycle = crud.get_cycle(db, cycle_id)
+async def read_cycle(cycle_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    db_cycle = await db.run_sync(lambda session: _cycle_response(crud.get_cycle(session, cycle_id)))
     if db_cycle is None:
         raise HTTPException(status_code=404, detail="Cycle not found")
     return db_cycle
 
 @router.put("/{cycle_id}/complete")
-async def complete_cycle(cycle_id: int, db: Session = Depends(database.get_db)):
-    test_completed = crud.complete_cycle(db, cycle_id)
+async def complete_cycle(cycle_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    test_completed = await db.run_sync(crud.complete_cycle, cycle_id)
     if test_completed is None:
         raise HTTPException(status_code=404, detail="Cycle not found")
     return {"success": True, "test_completed": test_completed}
 
 @router.get("/{cycle_id}/readings", response_model=List[schemas.Reading])
-async def read_cycle_readings(cycle_id: int, db: Session = Depends(database.get_db)):
-    readings = crud.get_readings_for_cycle(db, cycle_id)
-    return readings
\ No newline at end of file
+async def read_cycle_readings(cycle_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    readings = await db.run_sync(crud.get_readings_for_cycle, cycle_id)
+    return readings
@@ -1,20 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .. import crud, schemas, database
-from fastapi.responses import StreamingResponse, FileResponse
-import pandas as pd
-import io
-from datetime import datetime
+from typing import List, Optional
+from datetime import date, datetime, time, timedelta
 import os
-import tempfile
-from fastapi.templating import Jinja2Templates
-from pathlib import Path
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from ..routers.tests import format_duration
+from .. import cache, crud, database, jobs, pdf, reports, schemas
 
 router = APIRouter(
     prefix="/api",
@@ -22,162 +14,200 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-templates = Jinja2Templates(directory="app/templates")
-
+# Most tests one bulk export may contain
+BULK_EXPORT_MAX_TESTS = int(os.getenv("BULK_EXPORT_MAX_TESTS", "500"))
+
+def cached_response(file, media_type: str, headers: dict):
+    """Stream a file opened by the report cache, it stays readable if evicted meanwhile."""
+    headers = {**headers, "Content-Length": str(os.fstat(file.fileno()).st_size)}
+    return StreamingResponse(cache.iter_file(file), media_type=media_type, headers=headers)
+
+def streamed_export(test, kind: str, chunks, media_type: str, filename: str):
+    """Serve a finished test's export from the cache, or stream `chunks` and cache them on the way."""
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    key = cache.cached_export_key(test, kind)
+    if key:
+        file = cache.report_cache.open(key)
+        if file:
+            chunks.close()
+            return cached_response(file, media_type, headers)
+        chunks = cache.report_cache.tee(key, chunks)
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+# Exports are CPU-bound and use the sync session, plain `def` handlers run in
+# the threadpool so a large export doesn't stall the event loop
 @router.get("/tests/{test_id}/export")
-async def export_csv(test_id: int, db: Session = Depends(database.get_db)):
+def export_csv(test_id: int, db: Session = Depends(database.get_db)):
     test = crud.get_test(db, test_id)
     if test is None:
         raise HTTPException(status_code=404, detail="Test not found")
-    
-    export_data = []
-
-    for cycle in test.cycles:
-        # Get all CCV readings for this cycle
-        ccv_readings = [r for r in cycle.readings if r.reading_type == "CCV"]
-        ccv_sequences = sorted(set(r.sequence_number for r in ccv_readings if r.sequence_number is not None))
-
-        # Prepare data for each cell
-        for cell_num in range(1, test.bank.num_cells + 1):
-            row = {
-                'Cycle': cycle.cycle_number,
-                'Phase': cycle.phase.capitalize(),
-                'Cell No.': cell_num
-            }
-
-            # Add OCV reading
-            ocv = next((r for r in cycle.readings 
-                     if r.reading_type == "OCV" and r.cell_number == cell_num), None)
-            row['OCV'] = f"{ocv.value:.2f}" if ocv else '-'
-
-            # Add CCV readings with timestamps
-            for seq in ccv_sequences:
-                ccv = next((r for r in ccv_readings 
-                        if r.sequence_number == seq and r.cell_number == cell_num), None)
-                header = f"CCV-{seq} ({ccv.timestamp.strftime('%I:%M %p') if ccv else ''})"
-                row[header] = f"{ccv.value:.2f}" if ccv else '-'
-
-            export_data.append(row)
-
-    # Create DataFrame and sort
-    df = pd.DataFrame(export_data)
-    if not df.empty:
-        df = df.sort_values(['Cycle', 'Phase', 'Cell No.'])
-
-    # Export to CSV
-    output = io.StringIO()
-    df.to_csv(output, index=False)
-    output.seek(0)
 
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode()),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=test_{test_id}_export.csv"}
+    # Rows are produced while the readings are still being read, the first
+    # chunk goes out before the query finishes and nothing is built in memory
+    return streamed_export(
+        test, "csv", reports.iter_test_csv(test_id), "text/csv", f"test_{test_id}_export.csv"
     )
 
-@router.get("/tests/{test_id}/export/pdf")
-async def export_pdf(test_id: int, db: Session = Depends(database.get_db)):
+# Raw typed readings in long format for analysis tools, see reports.READINGS_SCHEMA
+@router.get("/tests/{test_id}/export/parquet")
+def export_parquet(test_id: int, db: Session = Depends(database.get_db)):
+    test = crud.get_test(db, test_id)
+    if test is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    return streamed_export(
+        test, "parquet", reports.iter_test_readings(test_id, "parquet"),
+        "application/vnd.apache.parquet", f"test_{test_id}_readings.parquet"
+    )
+
+@router.get("/tests/{test_id}/export/arrow")
+def export_arrow(test_id: int, db: Session = Depends(database.get_db)):
+    test = crud.get_test(db, test_id)
+    if test is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    return streamed_export(
+        test, "arrows", reports.iter_test_readings(test_id, "arrow"),
+        "application/vnd.apache.arrow.stream", f"test_{test_id}_readings.arrows"
+    )
+
+# One sheet per cycle and phase, written in constant memory
+@router.get("/tests/{test_id}/export/xlsx")
+def export_xlsx(test_id: int, db: Session = Depends(database.get_db)):
     test = crud.get_test(db, test_id)
     if test is None:
         raise HTTPException(status_code=404, detail="Test not found")
 
-    # Create a temporary file for the PDF
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-        # Create the PDF document
-        doc = SimpleDocTemplate(
-            temp_file.name,
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
+    return streamed_export(
+        test, "xlsx", reports.iter_test_xlsx(test_id),
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", f"test_{test_id}_export.xlsx"
+    )
+
+# Monthly bulk download: one file per test in a ZIP archive that streams while
+# the tests are exported one after another
+@router.get("/export/bulk")
+def export_bulk(
+    test_ids: Optional[List[int]] = Query(None),
+    started_from: Optional[date] = None,
+    started_to: Optional[date] = None,
+    format: schemas.BulkExportFormat = schemas.BulkExportFormat.csv,
+    db: Session = Depends(database.get_db)
+):
+    if not test_ids and not (started_from or started_to):
+        raise HTTPException(status_code=400, detail="Pass test_ids or a started_from/started_to range")
+
+    tests = crud.get_export_tests(
+        db,
+        test_ids=test_ids,
+        # Whole days, the end date is inclusive, as on the dashboard
+        started_from=datetime.combine(started_from, time.min) if started_from else None,
+        started_to=datetime.combine(started_to + timedelta(days=1), time.min) if started_to else None,
+    )
+    found = {test.id for test in tests}
+    if test_ids and (started_from or started_to):
+        # Both filters narrow the selection, an id outside the range exists
+        # and is simply not exported, only ids with no test at all are missing
+        found = {test.id for test in crud.get_export_tests(db, test_ids=test_ids)}
+    missing = sorted(set(test_ids or []) - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Tests not found: {missing}")
+    if not tests:
+        raise HTTPException(status_code=404, detail="No tests in that range")
+    if len(tests) > BULK_EXPORT_MAX_TESTS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_EXPORT_MAX_TESTS} tests per bulk export")
+
+    def entries():
+        for test in tests:
+            if format == schemas.BulkExportFormat.parquet:
+                # Already compressed, stored as is
+                yield f"test_{test.id}_readings.parquet", bulk_chunks(test, "parquet"), False
+            else:
+                yield f"test_{test.id}_export.csv", bulk_chunks(test, "csv"), True
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return StreamingResponse(
+        reports.iter_zip(entries()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=tests_export_{stamp}.zip"}
+    )
+
+def bulk_chunks(test, kind: str):
+    """One test's export for a bulk archive, from the cache when it has it."""
+    key = cache.cached_export_key(test, kind)
+    file = cache.report_cache.open(key) if key else None
+    if file:
+        yield from cache.iter_file(file)
+        return
+    chunks = reports.iter_test_csv(test.id) if kind == "csv" else reports.iter_test_readings(test.id, kind)
+    if key:
+        chunks = cache.report_cache.tee(key, chunks)
+    yield from chunks
+
+@router.get("/tests/{test_id}/export/pdf")
+async def export_pdf(test_id: int):
+    # The cache lookup and building the report from the readings block too, they
+    # run in the threadpool on a sync session before the render pool takes over
+    source = await run_in_threadpool(reports.export_source, test_id, "pdf")
+    if source is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    key, cached, report = source
+    headers = {"Content-Disposition": f"attachment; filename=test_{test_id}_report.pdf"}
+    if cached:
+        return cached_response(cached, "application/pdf", headers)
+
+    # Rendering is CPU-bound, it runs in the bounded render pool and the result
+    # is kept in memory so nothing is left behind on disk
+    try:
+        content = await pdf.render_pool.run(pdf.render_test_report, report)
+    except pdf.RenderPoolFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many reports are being generated, try again shortly",
+            headers={"Retry-After": "5"}
         )
 
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Get styles
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        heading_style = styles['Heading2']
-        normal_style = styles['Normal']
-
-        # Add title
-        elements.append(Paragraph(f"Battery Test Report - {test.bank.name}", title_style))
-        elements.append(Spacer(1, 12))
-        
-        # Add test information
-        elements.append(Paragraph("Test Information", heading_style))
-        
-        # Format status properly
-        status_text = test.status.capitalize() if hasattr(test, 'status') else 'Unknown'
-        
-        test_info = [
-            ["Test ID:", str(test.id)],
-            ["Status:", status_text],
-            ["Total Cycles:", str(test.total_cycles)],
-            ["Generated:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
-        ]
-        
-        t = Table(test_info, colWidths=[2*inch, 4*inch])
-        t.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
-        elements.append(t)
-        elements.append(Spacer(1, 12))
-
-        # Add cycle data
-        for cycle in test.cycles:
-            elements.append(Paragraph(f"Cycle {cycle.cycle_number}", heading_style))
-            
-            # Prepare readings table data
-            headers = ['Cell #', 'OCV (V)']
-            ccv_readings = [r for r in cycle.readings if r.reading_type == "CCV"]
-            ccv_sequences = sorted(set(r.sequence_number for r in ccv_readings if r.sequence_number is not None))
-            
-            for seq in ccv_sequences:
-                headers.append(f'CCV {seq} (V)')
-            
-            table_data = [headers]
-            
-            for cell in range(1, test.bank.num_cells + 1):
-                row = [str(cell)]
-                # Add OCV reading
-                ocv = next((r for r in cycle.readings 
-                         if r.reading_type == "OCV" and r.cell_number == cell), None)
-                row.append(f"{ocv.value:.2f}" if ocv and hasattr(ocv, 'value') else '-')
-                
-                # Add CCV readings
-                for seq in ccv_sequences:
-                    ccv = next((r for r in ccv_readings 
-                            if r.sequence_number == seq and r.cell_number == cell), None)
-                    row.append(f"{ccv.value:.2f}" if ccv and hasattr(ccv, 'value') else '-')
-                
-                table_data.append(row)
-            
-            # Create and style the table
-            t = Table(table_data)
-            t.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                ('PADDING', (0, 0), (-1, -1), 4),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ]))
-            elements.append(t)
-            
-            if hasattr(cycle, 'end_time') and cycle.end_time:
-                duration = format_duration(cycle.start_time, cycle.end_time)
-                elements.append(Paragraph(f"Duration: {duration}", normal_style))
-            
-            elements.append(Spacer(1, 12))
-
-        # Build the PDF
-        doc.build(elements)
-        
-        return FileResponse(
-            temp_file.name,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=test_{test_id}_report.pdf"}
-        )
\ No newline at end of file
+    if key:
+        await run_in_threadpool(cache.report_cache.put, key, content)
+    return Response(content, media_type="application/pdf", headers=headers)
+
+# Background exports for reports too slow to wait for behind a proxy: submit a
+# job, poll its status, then download the file once it is completed
+@router.post("/tests/{test_id}/export/jobs", response_model=schemas.ExportJob, status_code=202)
+async def create_export_job(
+    test_id: int,
+    response: Response,
+    job: schemas.ExportJobCreate = schemas.ExportJobCreate(),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    test = await db.run_sync(crud.get_test, test_id)
+    if test is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    db_job = await db.run_sync(crud.create_export_job, test_id, job.format.value)
+    jobs.export_worker.notify()
+    response.headers["Location"] = f"/api/export/jobs/{db_job.id}"
+    return db_job
+
+@router.get("/export/jobs/{job_id}", response_model=schemas.ExportJob)
+async def read_export_job(job_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    db_job = await db.run_sync(crud.get_export_job, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return db_job
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export_job(job_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    db_job = await db.run_sync(crud.get_export_job, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if db_job.status == "expired":
+        raise HTTPException(status_code=410, detail="Export has expired, submit a new job")
+    if db_job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Export job is {db_job.status}")
+
+    return FileResponse(
+        jobs.job_path(db_job),
+        media_type=jobs.MEDIA_TYPES[db_job.format],
+        filename=jobs.download_name(db_job)
+    )
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from .. import cache, database, pdf
+
+router = APIRouter(
+    prefix="/api/metrics",
+    tags=["metrics"],
+)
+
+@router.get("/pool")
+async def read_pool_metrics():
+    """Checked-out, idle and overflow connections plus checkout wait histograms."""
+    return database.pool_status()
+
+@router.get("/reports")
+async def read_report_metrics():
+    """Pending renders, queue depth, rejections and wait/render time histograms of the PDF pool."""
+    return pdf.render_pool.status()
+
+@router.get("/cache")
+async def read_cache_metrics():
+    """Size, entry count and hit/miss counters of the on-disk report cache."""
+    return cache.report_cache.stats()
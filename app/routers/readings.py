@@ -1,8 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
 from .. import crud, schemas, database
-import datetime
 
 router = APIRouter(
     prefix="/api",
@@ -14,33 +12,50 @@ router = APIRouter(
 async def submit_ocv_readings(
     test_id: int, 
     readings_data: schemas.BulkReadingsCreate, 
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    cycle = crud.create_ocv_readings(db, test_id, readings_data.readings)
-    if cycle is None:
+    result = await db.run_sync(crud.create_ocv_readings, test_id, readings_data.readings)
+    if result is None:
         raise HTTPException(status_code=404, detail="Test not found")
-    return {"success": True}
+    cycle, stats = result
+    return {"success": True, "ingest": stats.as_dict()}
 
 @router.post("/tests/{test_id}/ccv", status_code=201)
 async def submit_ccv_readings(
     test_id: int, 
     readings_data: schemas.BulkReadingsCreate, 
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    cycle = crud.create_ccv_readings(db, test_id, readings_data.readings)
-    if cycle is None:
+    result = await db.run_sync(crud.create_ccv_readings, test_id, readings_data.readings)
+    if result is None:
         raise HTTPException(status_code=404, detail="Test or active cycle not found")
-    return {"success": True}
+    cycle, stats, alerts = result
+    return {"success": True, "ingest": stats.as_dict(), "alerts": alerts}
+
+@router.post("/tests/{test_id}/ccv/batch", status_code=201)
+async def submit_ccv_batch(
+    test_id: int, 
+    batch_data: schemas.BatchReadingsCreate, 
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    try:
+        result = await db.run_sync(crud.create_ccv_batch, test_id, batch_data.snapshots)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Test or active cycle not found")
+    cycle, stats, sequences, alerts = result
+    return {"success": True, "sequences": sequences, "ingest": stats.as_dict(), "alerts": alerts}
 
 @router.post("/tests/{test_id}/end-phase")
-async def end_phase(test_id: int, db: Session = Depends(database.get_db)):
-    test = crud.get_test(db, test_id)
+async def end_phase(test_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    test = await db.run_sync(crud.get_test, test_id)
     if test is None:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    current_cycle = crud.get_active_cycle(db, test_id, test.current_cycle, test.current_phase)
+    current_cycle = await db.run_sync(crud.get_active_cycle, test_id, test.current_cycle, test.current_phase)
     if current_cycle is None:
         raise HTTPException(status_code=404, detail="Active cycle not found")
     
-    test_completed = crud.complete_cycle(db, current_cycle.id)
+    test_completed = await db.run_sync(crud.complete_cycle, current_cycle.id)
     return {"success": True, "test_completed": test_completed}
\ No newline at end of file
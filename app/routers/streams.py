@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from datetime import datetime
+from .. import crud, schemas, database, ingest
+
+router = APIRouter(
+    prefix="/api",
+    tags=["streams"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Only the first few rejected lines are echoed back, the rest are counted
+MAX_REPORTED_ERRORS = 20
+
+@router.post("/tests/{test_id}/ccv/stream", status_code=201)
+async def stream_ccv_readings(
+    test_id: int,
+    request: Request,
+    batch_size: int = Query(ingest.STREAM_BATCH_SIZE, gt=0, le=10000),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Ingest a chunked NDJSON body of CCV snapshots, one JSON object per line.
+
+    Each line is {"readings": [...], "timestamp": optional ISO time}. Lines are parsed
+    as they arrive and written every `batch_size` snapshots, so only one partial line
+    and one pending batch are ever held in memory.
+
+    Each batch is committed on its own. `committed_lines` in the response is the
+    last line up to which every valid snapshot is stored. Invalid lines are
+    skipped and listed in `errors` while the valid ones around them are stored,
+    `success` is then False. A line over READING_STREAM_MAX_LINE_BYTES ends the
+    stream with a 413: the pending batch is discarded and the detail reports the
+    committed_lines to resume after.
+    """
+    test = await db.run_sync(crud.get_test, test_id)
+    if test is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    cycle = await db.run_sync(crud.get_active_cycle, test_id, test.current_cycle, test.current_phase)
+    if cycle is None:
+        raise HTTPException(status_code=404, detail="Active cycle not found")
+
+    cycle_id = cycle.id
+    phase = test.current_phase
+    num_cells = await db.run_sync(lambda session: test.bank.num_cells)
+
+    pending = []
+    summary = {
+        "accepted": 0, "rejected": 0, "batches": 0, "rows": 0, "alerts": 0, "committed_lines": 0, "errors": []
+    }
+
+    async def flush(through_line):
+        if pending:
+            stats, _, alerts = await db.run_sync(crud.append_ccv_snapshots, cycle_id, phase, pending)
+            summary["batches"] += 1
+            summary["rows"] += stats.rows
+            summary["alerts"] += len(alerts)
+            pending.clear()
+        summary["committed_lines"] = through_line
+
+    def reject(line_number, message):
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line_number, "error": message})
+
+    async def handle(line_number, line):
+        if not line.strip():
+            return
+        try:
+            snapshot = schemas.StreamedReadingsCreate.model_validate_json(line)
+        except ValidationError as exc:
+            reject(line_number, exc.errors(include_url=False)[0]["msg"])
+            return
+        if len(snapshot.readings) != num_cells:
+            reject(line_number, f"Expected {num_cells} readings, got {len(snapshot.readings)}")
+            return
+        timestamp = ingest.to_utc_naive(snapshot.timestamp) if snapshot.timestamp else datetime.utcnow()
+        pending.append((timestamp, snapshot.readings))
+        summary["accepted"] += 1
+        if len(pending) >= batch_size:
+            await flush(line_number)
+
+    line_number = 0
+    partial = b""
+    async for chunk in request.stream():
+        partial += chunk
+        *lines, partial = partial.split(b"\n")
+        for line in lines:
+            line_number += 1
+            await handle(line_number, line)
+        if len(partial) > ingest.STREAM_MAX_LINE_BYTES:
+            # Lines since the last commit are dropped, the client resends from committed_lines
+            summary["accepted"] -= len(pending)
+            pending.clear()
+            raise HTTPException(status_code=413, detail={
+                "error": f"Line {line_number + 1} exceeds {ingest.STREAM_MAX_LINE_BYTES} bytes",
+                **{name: summary[name] for name in ("committed_lines", "accepted", "batches", "rows")},
+            })
+
+    if partial:
+        line_number += 1
+        await handle(line_number, partial)
+    await flush(line_number)
+
+    return {"success": summary["rejected"] == 0, "lines": line_number, **summary}
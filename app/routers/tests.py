@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
-from .. import crud, schemas, models, database
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import date, datetime, time, timedelta
+from .. import analytics, cache, crud, jobs, schemas, models, database, pivot
+from ..reports import format_duration
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from pathlib import Path
@@ -14,49 +17,76 @@ router = APIRouter(
 
 templates = Jinja2Templates(directory="app/templates")
 
-# Helper function to format duration
-def format_duration(start_time, end_time):
-    if not end_time:
-        return "In Progress"
-    duration = end_time - start_time
-    hours = duration.seconds // 3600
-    minutes = (duration.seconds % 3600) // 60
-    return f"{hours}h {minutes}m"
-
-# Helper function to calculate test progress
-def get_test_progress(test):
-    total_phases = test.total_cycles * 2  # Each cycle has charge and discharge
-    completed_phases = (test.current_cycle - 1) * 2
-    if test.current_phase == "discharge":
-        completed_phases += 1
-    return (completed_phases / total_phases) * 100
+# Dashboard query parameters, shared by / and /test/
+def dashboard_filters(
+    status: Optional[schemas.TestStatus] = None,
+    bank: Optional[str] = None,
+    started_from: Optional[date] = None,
+    started_to: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(30, gt=0, le=100)
+):
+    return {
+        "status": status.value if status else None,
+        "bank_name": bank or None,
+        # Whole days, the end date is inclusive
+        "started_from": datetime.combine(started_from, time.min) if started_from else None,
+        "started_to": datetime.combine(started_to + timedelta(days=1), time.min) if started_to else None,
+        "cursor": cursor,
+        "limit": limit,
+    }
 
-@router.get("/", response_class=HTMLResponse)
-async def read_dashboard(request: Request, db: Session = Depends(database.get_db)):
-    tests = crud.get_tests(db)
+# Page renders are CPU-bound, so the HTML routes are plain def handlers on the
+# sync session, which FastAPI runs in its threadpool instead of on the event loop
+def render_dashboard(db: Session, request: Request, filters: dict):
+    try:
+        tests, next_cursor = crud.get_dashboard_tests(db, **filters)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_url = str(request.url.include_query_params(cursor=next_cursor)) if next_cursor else None
     return templates.TemplateResponse(
         "dashboard.html", 
-        {"request": request, "tests": tests, "get_test_progress": get_test_progress}
+        {"request": request, "tests": tests, "next_url": next_url, "filters": request.query_params}
     )
 
+@router.get("/", response_class=HTMLResponse)
+def read_dashboard(
+    request: Request,
+    filters: dict = Depends(dashboard_filters),
+    db: Session = Depends(database.get_db)
+):
+    return render_dashboard(db, request, filters)
+
 @router.get("/create", response_class=HTMLResponse)
 async def create_test_form(request: Request):
     return templates.TemplateResponse("create_test.html", {"request": request})
 
+# Serialize while still inside run_sync, relationships may lazy-load
+def _test_response(db_test):
+    return schemas.Test.model_validate(db_test) if db_test is not None else None
+
 @router.post("/", response_model=schemas.Test)
-async def create_test(test: schemas.TestCreate, db: Session = Depends(database.get_db)):
-    db_test = crud.create_test(db, test)
+async def create_test(test: schemas.TestCreate, db: AsyncSession = Depends(database.get_async_db)):
+    db_test = await db.run_sync(lambda session: _test_response(crud.create_test(session, test)))
     return db_test
 
-@router.get("/{test_id}", response_model=schemas.Test)
-def read_test(request: Request, test_id: int, db: Session = Depends(database.get_db)):
+def render_test_details(db: Session, request: Request, test_id: int):
     db_test = crud.get_test(db, test_id=test_id)
     if db_test is None:
-        raise HTTPException(status_code=404, detail="Test not found")
+        return None
     
     # Get cycles data for this test
     cycles = crud.get_cycles_for_test(db, test_id)
     
+    # Pivot each cycle to cells x CCV sequences once, the template only iterates it
+    cycle_ids = [cycle.id for cycle in cycles]
+    matrices = pivot.build_cycle_matrices(
+        cycle_ids, db_test.bank.num_cells, *crud.get_reading_columns(db, cycle_ids)
+    )
+    cell_analytics = analytics.summarize(
+        db_test, analytics.build_cube(cycles, matrices, db_test.bank.num_cells)
+    )
+    
     # Return a rendered template
     return templates.TemplateResponse(
         "test_details.html",
@@ -64,18 +94,34 @@ def read_test(request: Request, test_id: int, db: Session = Depends(database.get
             "request": request,
             "test": db_test,
             "cycles": cycles,
+            "matrices": matrices,
+            "analytics": cell_analytics,
+            "weak_cell_ranks": analytics.WEAK_CELL_RANKS,
             "format_duration": format_duration
         }
     )
 
-@router.get("/{test_id}/readings", response_class=HTMLResponse)
-async def take_readings_form(request: Request, test_id: int, db: Session = Depends(database.get_db)):
+@router.get("/{test_id}", response_model=schemas.Test)
+def read_test(request: Request, test_id: int, db: Session = Depends(database.get_db)):
+    response = render_test_details(db, request, test_id)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return response
+
+def render_take_readings(db: Session, request: Request, test_id: int):
     test = crud.get_test(db, test_id)
     if test is None:
-        raise HTTPException(status_code=404, detail="Test not found")
+        return None
     
     return templates.TemplateResponse("take_readings.html", {"request": request, "test": test})
 
+@router.get("/{test_id}/readings", response_class=HTMLResponse)
+def take_readings_form(request: Request, test_id: int, db: Session = Depends(database.get_db)):
+    response = render_take_readings(db, request, test_id)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return response
+
 @router.get("/{test_id}/readings")
 def test_readings(test_id: int, request: Request, db: Session = Depends(database.get_db)):
     # Your handler code here
@@ -85,18 +131,20 @@ def test_readings(test_id: int, request: Request, db: Session = Depends(database
 async def update_test_status(
     test_id: int, 
     status_update: schemas.TestStatusUpdate, 
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    db_test = crud.update_test_status(db, test_id, status_update)
+    db_test = await db.run_sync(lambda session: _test_response(crud.update_test_status(session, test_id, status_update)))
     if db_test is None:
         raise HTTPException(status_code=404, detail="Test not found")
     return db_test
 
 
 @router.delete("/{test_id}")
-async def delete_test(test_id: int, db: Session = Depends(database.get_db)):
+async def delete_test(test_id: int, db: AsyncSession = Depends(database.get_async_db)):
     """Delete a test and all its associated data."""
-    success = crud.delete_test(db, test_id)
+    success = await db.run_sync(crud.delete_test, test_id)
     if not success:
         raise HTTPException(status_code=404, detail="Test not found")
+    cache.discard_test(test_id)
+    jobs.discard_test(test_id)
     return {"success": True}
\ No newline at end of file
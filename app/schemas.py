@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import AliasChoices, BaseModel, Field, validator
 from typing import List, Optional, Union
 from datetime import datetime
 from enum import Enum
@@ -17,6 +17,21 @@ class ReadingType(str, Enum):
     OCV = "OCV"
     CCV = "CCV"
 
+class ExportFormat(str, Enum):
+    csv = "csv"
+    pdf = "pdf"
+
+class BulkExportFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
+
+class ExportJobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+    expired = "expired"
+
 # Base schemas
 class BankBase(BaseModel):
     name: str
@@ -54,6 +69,15 @@ class ReadingCreate(ReadingBase):
 class BulkReadingsCreate(BaseModel):
     readings: List[float]
 
+class TimedReadingsCreate(BulkReadingsCreate):
+    timestamp: datetime
+
+class StreamedReadingsCreate(BulkReadingsCreate):
+    timestamp: Optional[datetime] = None
+
+class BatchReadingsCreate(BaseModel):
+    snapshots: List[TimedReadingsCreate] = Field(..., min_length=1)
+
 # Response schemas
 class Bank(BankBase):
     id: int
@@ -63,7 +87,7 @@ class Bank(BankBase):
         from_attributes = True
 
 class Reading(ReadingBase):
-    id: int
+    id: Optional[int] = None  # None for readings stored as part of a snapshot row
     cycle_id: int
     sequence_number: Optional[int] = None
     timestamp: datetime
@@ -80,7 +104,7 @@ class Cycle(BaseModel):
     start_time: datetime
     end_time: Optional[datetime] = None
     status: str
-    readings: List[Reading] = []
+    readings: List[Reading] = Field(default=[], validation_alias=AliasChoices("cell_readings", "readings"))
 
     class Config:
         from_attributes = True
@@ -109,4 +133,123 @@ class TestStatusUpdate(BaseModel):
 
 class CycleStatusUpdate(BaseModel):
     status: str = "completed"
-    end_time: Optional[datetime] = None
\ No newline at end of file
+    end_time: Optional[datetime] = None
+
+# Background export schemas
+class ExportJobCreate(BaseModel):
+    format: ExportFormat = ExportFormat.pdf
+
+class ExportJob(BaseModel):
+    id: int
+    test_id: int
+    format: ExportFormat
+    status: ExportJobStatus
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    size_bytes: Optional[int] = None
+    error: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+# Analytics schemas
+class CellAnalytics(BaseModel):
+    cell_number: int
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    deviation: Optional[float] = None
+    end_of_discharge: Optional[float] = None
+    rank: Optional[int] = None
+
+class TestAnalytics(BaseModel):
+    test_id: int
+    num_cells: int
+    cycles: int
+    snapshots: int
+    end_of_discharge_cycle: Optional[int] = None
+    cells: List[CellAnalytics]
+
+class DischargeCell(BaseModel):
+    cell_number: int
+    time_to_cutoff: Optional[float] = None  # seconds, None if the cell never reached the cutoff
+    discharged_seconds: Optional[float] = None
+    end_voltage: Optional[float] = None
+    reached_cutoff: bool
+    capacity_ah: Optional[float] = None
+    voltages: List[Optional[float]]  # one per entry of DischargeCycle.elapsed_seconds
+
+class DischargeCycle(BaseModel):
+    cycle_id: int
+    cycle_number: int
+    status: str
+    elapsed_seconds: List[float]
+    cells: List[DischargeCell]
+
+class DischargeAnalysis(BaseModel):
+    test_id: int
+    cutoff: float
+    current: Optional[float] = None
+    cycles: List[DischargeCycle]
+
+class SeriesCell(BaseModel):
+    cell_number: int
+    elapsed_seconds: List[float]
+    voltages: List[float]  # one per entry of elapsed_seconds
+
+class SeriesCycle(BaseModel):
+    cycle_id: int
+    cycle_number: int
+    phase: str
+    status: str
+    snapshots: int  # before downsampling
+    cells: List[SeriesCell]
+
+class TestSeries(BaseModel):
+    test_id: int
+    points: int
+    cycles: List[SeriesCycle]
+
+class CellSummary(BaseModel):
+    reading_type: ReadingType
+    cell_number: int
+    count: int
+    min_value: float
+    max_value: float
+    mean: float
+    variance: Optional[float] = None
+    last_value: float
+    last_timestamp: datetime
+
+    class Config:
+        from_attributes = True
+
+class CycleSummary(BaseModel):
+    cycle_id: int
+    cycle_number: int
+    phase: Phase
+    status: str
+    cells: List[CellSummary]
+
+class TestSummary(BaseModel):
+    test_id: int
+    cycles: List[CycleSummary]
+
+class AlertKind(str, Enum):
+    outlier = "outlier"
+    drop = "drop"
+
+class CellAlert(BaseModel):
+    id: int
+    cycle_id: int
+    cycle_number: int
+    phase: Phase
+    cell_number: int
+    sequence_number: Optional[int] = None
+    kind: AlertKind
+    value: float
+    expected: float
+    score: float
+    timestamp: datetime
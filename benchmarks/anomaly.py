@@ -0,0 +1,68 @@
+"""Per-snapshot cost of the anomaly detector in the CCV ingest path.
+
+    python -m benchmarks.anomaly
+
+Times anomaly.check alone for 50, 200 and 1000 cells, then single-snapshot
+CCV ingest through crud.append_ccv_snapshots with the detector on and off,
+which is the overhead a /ccv request pays.
+"""
+from benchmarks import common
+
+import itertools
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app import anomaly, crud, database, models
+
+SIZES = [50, 200, 1000]
+CHECKS = 2000
+INGESTS = 200
+
+
+def check_seconds(num_cells):
+    values = 2.0 + np.random.default_rng(0).normal(0, 0.005, (CHECKS + 1, num_cells))
+    state = anomaly.CycleState.start(values[0])
+    snapshots = iter(values[1:])
+    return common.timed(lambda: anomaly.check(state, next(snapshots)), repeat=CHECKS)[0]
+
+
+def ingest_seconds(db, cycle_id, num_cells):
+    """Median ingest time with the detector off and on, alternating so drift hits both."""
+    rng = np.random.default_rng(1)
+    minutes = itertools.count(1)
+    times = {False: [], True: []}
+    for _ in range(INGESTS):
+        for enabled in (False, True):
+            anomaly.ANOMALY_DETECTION = enabled
+            # Quiet cells, so the cost measured is the detector's and not alert inserts
+            readings = (2.0 + rng.normal(0, 0.002, num_cells)).tolist()
+            timestamp = datetime(2026, 1, 2) + timedelta(minutes=next(minutes))
+            start = time.perf_counter()
+            crud.append_ccv_snapshots(db, cycle_id, "discharge", [(timestamp, readings)])
+            times[enabled].append(time.perf_counter() - start)
+    return statistics.median(times[False]), statistics.median(times[True])
+
+
+def main():
+    common.migrate()
+    print(f"check() per snapshot, median of {CHECKS}")
+    for num_cells in SIZES:
+        print(f"{num_cells:5d} cells   {check_seconds(num_cells) * 1e6:7.1f} us")
+
+    db = database.SessionLocal()
+    print(f"\n{database.engine.dialect.name}, single-snapshot CCV ingest, median of {INGESTS}")
+    for num_cells in SIZES:
+        test = common.seed_test(db, num_cells=num_cells, name=f"Bench {num_cells}")
+        cycle = models.ReadingCycle(test_id=test.id, cycle_number=1, phase="discharge", status="active")
+        db.add(cycle)
+        db.commit()
+        off, on = ingest_seconds(db, cycle.id, num_cells)
+        print(f"{num_cells:5d} cells   off {off * 1e3:6.2f} ms   on {on * 1e3:6.2f} ms   +{(on - off) * 1e6:6.0f} us")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""The original implementations of reworked code paths, kept as references.
+
+Benchmarks time them against the current code and tests compare outputs with
+them. They read through the ORM relationships exactly as they used to, only
+reading_snapshots cycles are expanded with ReadingCycle.cell_readings.
+"""
+import io
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+
+def baseline_csv(test) -> str:
+    """CSV export as built by the original export_csv route."""
+    export_data = []
+
+    for cycle in test.cycles:
+        readings = cycle.cell_readings
+        ccv_readings = [r for r in readings if r.reading_type == "CCV"]
+        ccv_sequences = sorted(set(r.sequence_number for r in ccv_readings if r.sequence_number is not None))
+
+        for cell_num in range(1, test.bank.num_cells + 1):
+            row = {
+                'Cycle': cycle.cycle_number,
+                'Phase': cycle.phase.capitalize(),
+                'Cell No.': cell_num
+            }
+
+            ocv = next((r for r in readings
+                     if r.reading_type == "OCV" and r.cell_number == cell_num), None)
+            row['OCV'] = f"{ocv.value:.2f}" if ocv else '-'
+
+            for seq in ccv_sequences:
+                ccv = next((r for r in ccv_readings
+                        if r.sequence_number == seq and r.cell_number == cell_num), None)
+                header = f"CCV-{seq} ({ccv.timestamp.strftime('%I:%M %p') if ccv else ''})"
+                row[header] = f"{ccv.value:.2f}" if ccv else '-'
+
+            export_data.append(row)
+
+    df = pd.DataFrame(export_data)
+    if not df.empty:
+        df = df.sort_values(['Cycle', 'Phase', 'Cell No.'])
+
+    output = io.StringIO()
+    df.to_csv(output, index=False)
+    return output.getvalue()
+
+
+def baseline_pdf(report: dict) -> bytes:
+    """PDF report as rendered before readings tables were split, one Table per cycle.
+
+    Takes the same plain report dict as pdf.render_test_report. Columns past the
+    page width are clipped, not laid out.
+    """
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
+    styles = getSampleStyleSheet()
+    elements = [
+        Paragraph(f"Battery Test Report - {report['bank_name']}", styles['Heading1']),
+        Spacer(1, 12),
+        Paragraph("Test Information", styles['Heading2']),
+    ]
+
+    test_info = [
+        ["Test ID:", str(report['test_id'])],
+        ["Status:", report['status']],
+        ["Total Cycles:", str(report['total_cycles'])],
+        ["Generated:", report['generated']]
+    ]
+    t = Table(test_info, colWidths=[2*inch, 4*inch])
+    t.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('PADDING', (0, 0), (-1, -1), 6),
+    ]))
+    elements.extend([t, Spacer(1, 12)])
+
+    for cycle in report['cycles']:
+        elements.append(Paragraph(f"Cycle {cycle['cycle_number']}", styles['Heading2']))
+        t = Table(cycle['table'])
+        t.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('PADDING', (0, 0), (-1, -1), 4),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ]))
+        elements.append(t)
+        if cycle['duration']:
+            elements.append(Paragraph(f"Duration: {cycle['duration']}", styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+    doc.build(elements)
+    return output.getvalue()
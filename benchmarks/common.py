@@ -0,0 +1,82 @@
+"""Shared set-up of the benchmark scripts, import it before anything from app.
+
+Benchmarks run against DATABASE_URL when it is set, otherwise against a fresh
+SQLite file in a temporary directory, migrated to head either way.
+"""
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+WORKDIR = tempfile.mkdtemp(prefix="battery-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORKDIR}/bench.db")
+os.environ.setdefault("REPORT_CACHE_DIR", os.path.join(WORKDIR, "cache"))
+os.chdir(ROOT)
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+
+
+def migrate():
+    config = Config()
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+    command.upgrade(config, "head")
+
+
+def timed(fn, repeat=5):
+    """Median wall time of `fn()` in seconds over `repeat` runs, and its last result."""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def seed_test(db, num_cells, cycles=1, ccv_snapshots=0, name="Bench"):
+    """A test with `cycles` completed charge/discharge cycle pairs of synthetic readings.
+
+    Each phase gets an OCV snapshot and `ccv_snapshots` CCV snapshots, written
+    with the app's own ingest path. Returns the test.
+    """
+    from datetime import datetime, timedelta
+
+    import numpy as np
+
+    from app import crud, ingest, models
+
+    bank = models.BatteryBank(name=name, num_cells=num_cells)
+    db.add(bank)
+    db.flush()
+    test = models.TestSession(bank_id=bank.id, total_cycles=cycles, status="in_progress",
+                              current_cycle=1, current_phase="charge")
+    db.add(test)
+    db.flush()
+
+    rng = np.random.default_rng(0)
+    start = datetime(2026, 1, 1)
+    for number in range(1, cycles + 1):
+        for phase in ("charge", "discharge"):
+            cycle = models.ReadingCycle(test_id=test.id, cycle_number=number, phase=phase, ccv_interval=60,
+                                        status="completed", start_time=start, end_time=start)
+            db.add(cycle)
+            db.flush()
+            snapshots = [ingest.snapshot(cycle.id, "OCV", phase, 2.1 + rng.normal(0, 0.01, num_cells),
+                                         timestamp=start)]
+            for sequence in range(1, ccv_snapshots + 1):
+                level = 2.0 - 0.3 * sequence / ccv_snapshots if phase == "discharge" else 2.0
+                snapshots.append(ingest.snapshot(
+                    cycle.id, "CCV", phase, level + rng.normal(0, 0.005, num_cells),
+                    sequence_number=sequence, timestamp=start + timedelta(minutes=sequence),
+                ))
+            ingest.write_snapshots(db, snapshots)
+            cycle.ccv_sequence = ccv_snapshots
+            start += timedelta(hours=8)
+    test.current_cycle = cycles + 1
+    test.status = "completed"
+    db.commit()
+    return crud.get_test(db, test.id)
@@ -0,0 +1,99 @@
+"""Throughput and latency of the async API as concurrent clients are added.
+
+    python -m benchmarks.concurrency
+
+Serves the app with uvicorn in a separate process on a local port and runs 1
+to 64 clients. Each
+client loops over GET /api/tests/{id}/summary, a route that awaits its query
+on the async engine. Requests per second and p50/p95 latency are printed.
+The same loads then run again while a client keeps reloading a large test's
+details page, a CPU-bound render. That shows whether the page stalls the event
+loop for everyone else.
+"""
+from benchmarks import common
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app import database
+
+DURATION = 3.0
+CLIENTS = (1, 4, 16, 64)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            httpx.get(base + "/api/metrics/pool").raise_for_status()
+            return
+        except httpx.TransportError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+async def client_loop(client, url, deadline, latencies):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get(url)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_load(base, light_url, clients, heavy_url=None):
+    limits = httpx.Limits(max_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + DURATION
+        latencies, heavy = [], []
+        tasks = [client_loop(client, light_url, deadline, latencies) for _ in range(clients)]
+        if heavy_url:
+            tasks.append(client_loop(client, heavy_url, deadline, heavy))
+        await asyncio.gather(*tasks)
+    latencies.sort()
+    return len(latencies) / DURATION, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], len(heavy)
+
+
+def main():
+    common.migrate()
+    db = database.SessionLocal()
+    light = common.seed_test(db, num_cells=16, cycles=1, ccv_snapshots=5, name="Light")
+    heavy = common.seed_test(db, num_cells=200, cycles=3, ccv_snapshots=60, name="Heavy")
+    light_id, heavy_id = light.id, heavy.id
+    db.close()
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    wait_until_up(base)
+
+    light_url = f"/api/tests/{light_id}/summary"
+    print(f"{database.engine.dialect.name}, {DURATION:.0f} s per run")
+    for heavy_url in (None, f"/test/{heavy_id}"):
+        print("with the details page reloading" if heavy_url else "light requests only")
+        print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'pages':>6}")
+        for clients in CLIENTS:
+            rate, p50, p95, pages = asyncio.run(run_load(base, light_url, clients, heavy_url))
+            print(f"{clients:>8} {rate:>8.0f} {p50 * 1000:>8.1f} {p95 * 1000:>8.1f} {pages:>6}")
+
+    server.terminate()
+    server.wait()
+
+
+if __name__ == "__main__":
+    main()
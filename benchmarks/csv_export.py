@@ -0,0 +1,44 @@
+"""CSV export of a full test: the original per-cell scan against reports.iter_test_csv.
+
+    python -m benchmarks.csv_export [ccv_snapshots_per_phase]
+
+Seeds a 5-cycle, 200-cell test with dense CCVs, 30 snapshots per phase by
+default, and times both exports. It fails if their output differs. The
+original export scans every reading for each cell and sequence, so it takes
+minutes once the snapshot count goes much higher.
+"""
+from benchmarks import common
+
+import sys
+
+from app import crud, database, reports
+from benchmarks.baselines import baseline_csv
+
+
+def main():
+    ccv = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    common.migrate()
+    db = database.SessionLocal()
+    test_id = common.seed_test(db, num_cells=200, cycles=5, ccv_snapshots=ccv).id
+
+    def original():
+        db.expire_all()
+        return baseline_csv(crud.get_test(db, test_id))
+
+    def current():
+        return b"".join(reports.iter_test_csv(test_id)).decode()
+
+    old_seconds, old = common.timed(original, repeat=1)
+    new_seconds, new = common.timed(current, repeat=3)
+    assert new == old, "CSV output differs from the original export"
+
+    rows = new.count("\n") - 1
+    print(f"{database.engine.dialect.name}, 5 cycles x 2 phases, 200 cells, {ccv} CCV snapshots per phase")
+    print(f"{rows} rows, {len(new) / 1e6:.1f} MB, output identical")
+    print(f"original {old_seconds:8.2f} s")
+    print(f"current  {new_seconds:8.2f} s   {old_seconds / new_seconds:.0f}x faster")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
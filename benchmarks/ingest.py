@@ -0,0 +1,54 @@
+"""Snapshot ingest: one ORM object per cell against the set-based insert_readings.
+
+    python -m benchmarks.ingest
+
+Writes CCV snapshots of 50, 200 and 1000 cells both ways, each in its own
+transaction like /api/tests/{test_id}/ccv, and prints rows/sec and the speed-up.
+On PostgreSQL with psycopg2 snapshots of READING_COPY_MIN_ROWS cells or more go
+through COPY.
+"""
+from benchmarks import common
+
+from datetime import datetime
+
+from app import database, ingest, models
+
+SNAPSHOTS = 50
+
+
+def orm_per_object(db, cycle_id, values):
+    # The write path before the set-based ingest
+    for cell_num, value in enumerate(values, 1):
+        db.add(models.Reading(cycle_id=cycle_id, reading_type="CCV", cell_number=cell_num,
+                              value=float(value), sequence_number=1, phase="discharge",
+                              timestamp=datetime.utcnow()))
+    db.commit()
+
+
+def set_based(db, cycle_id, values):
+    ingest.insert_readings(db, ingest.snapshot_rows(
+        ingest.snapshot(cycle_id, "CCV", "discharge", values, sequence_number=1)
+    ))
+    db.commit()
+
+
+def main():
+    common.migrate()
+    db = database.SessionLocal()
+    test = common.seed_test(db, num_cells=1)
+    cycle_id = test.cycles[0].id
+
+    print(f"{database.engine.dialect.name}, {SNAPSHOTS} snapshots per run")
+    print(f"{'cells':>6} {'orm rows/s':>12} {'bulk rows/s':>12} {'speed-up':>9}")
+    for cells in (50, 200, 1000):
+        values = [2.0 + cell / 10000 for cell in range(cells)]
+        rates = []
+        for write in (orm_per_object, set_based):
+            seconds, _ = common.timed(lambda: [write(db, cycle_id, values) for _ in range(SNAPSHOTS)], repeat=3)
+            rates.append(cells * SNAPSHOTS / seconds)
+        print(f"{cells:>6} {rates[0]:>12,.0f} {rates[1]:>12,.0f} {rates[1] / rates[0]:>8.1f}x")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""PDF report rendering of large synthetic tests: the original single Table against pdf.render_test_report.
+
+    python -m benchmarks.pdf_render
+
+Renders 2-cycle reports for a range of bank sizes and CCV snapshot counts and
+prints the render time, peak traced memory and page count of both. The
+original clips every column past the page width, so its page count stays flat
+while the current report lays out all of them.
+"""
+from benchmarks import common
+
+import re
+import tracemalloc
+
+from app import pdf
+from benchmarks.baselines import baseline_pdf
+
+SIZES = [(50, 10), (200, 10), (200, 60), (500, 60), (200, 120)]
+
+
+def synthetic_report(num_cells, ccv_snapshots, cycles=2):
+    """Plain report dict shaped like reports.pdf_report, without a database."""
+    header = ['Cell #', 'OCV (V)'] + [f'CCV {seq} (V)' for seq in range(1, ccv_snapshots + 1)]
+    table = [header] + [
+        [str(cell), f"{2.1 + cell % 7 * 0.01:.2f}", *(f"{2.0 - seq * 0.001:.2f}" for seq in range(ccv_snapshots))]
+        for cell in range(1, num_cells + 1)
+    ]
+    return {
+        "bank_name": "Bench",
+        "test_id": 1,
+        "status": "Completed",
+        "total_cycles": cycles,
+        "generated": "2026-03-01 08:00:00",
+        "cycles": [{"cycle_number": number, "table": table, "duration": "4h 0m"} for number in range(1, cycles + 1)],
+    }
+
+
+def page_count(content: bytes) -> int:
+    return len(re.findall(rb"/Type /Page\b", content))
+
+
+def measured(render, report):
+    seconds, content = common.timed(lambda: render(report), repeat=3)
+    # Traced separately, tracemalloc slows rendering down several times
+    tracemalloc.start()
+    render(report)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1e6, page_count(content)
+
+
+def main():
+    print("2 cycles per report, time / peak traced memory / pages")
+    print(f"{'cells x CCVs':>14}   {'original':>24}   {'current':>24}")
+    for num_cells, ccv in SIZES:
+        report = synthetic_report(num_cells, ccv)
+        old = measured(baseline_pdf, report)
+        new = measured(pdf.render_test_report, report)
+        print(f"{f'{num_cells} x {ccv}':>14}   "
+              f"{old[0]:6.2f} s {old[1]:6.1f} MB {old[2]:4d} pp   "
+              f"{new[0]:6.2f} s {new[1]:6.1f} MB {new[2]:4d} pp")
+
+
+if __name__ == "__main__":
+    main()
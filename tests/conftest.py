@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# app.database connects when imported, so the test database is chosen first.
+# TEST_DATABASE_URL runs the suite against e.g. PostgreSQL, a throwaway SQLite
+# file is used otherwise.
+_workdir = tempfile.mkdtemp(prefix="battery-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{_workdir}/test.db"
+os.environ["REPORT_CACHE_DIR"] = os.path.join(_workdir, "cache")
+os.environ.setdefault("ANOMALY_DETECTION", "1")
+
+# Templates and static files are looked up relative to the working directory
+os.chdir(ROOT)
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+
+from app import database, models, schemas  # noqa: E402
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated():
+    """Schema built by the migrations, so they are exercised too."""
+    config = Config()
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"])
+    command.upgrade(config, "head")
+    yield
+    database.engine.dispose()
+
+
+@pytest.fixture
+def db():
+    """A session on the test database, emptied again after the test.
+
+    Ids are reused once the tables are empty, so the report cache and the
+    anomaly detector's per-cycle state are cleared too.
+    """
+    from app import anomaly, cache
+
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(models.Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
+        shutil.rmtree(cache.REPORT_CACHE_DIR, ignore_errors=True)
+        anomaly.detector._states.clear()
+
+
+@pytest.fixture
+def client(db):
+    """Requests against the app, without the startup hooks' background workers."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_test(db):
+    """Create a scheduled test of a new bank through the crud layer."""
+    from app import crud
+
+    def make(num_cells=8, total_cycles=2, name="Bank"):
+        return crud.create_test(db, schemas.TestCreate(
+            bank=schemas.BankBase(name=name, num_cells=num_cells),
+            total_cycles=total_cycles,
+        ))
+
+    return make
+
+
+@pytest.fixture(params=["rows", "snapshot"])
+def storage_mode(request, monkeypatch):
+    """Run the test once per READING_STORAGE layout."""
+    from app import ingest
+
+    monkeypatch.setattr(ingest, "STORAGE_MODE", request.param)
+    return request.param
+
+
+@pytest.fixture
+def record_cycles(db):
+    """Run a test through its cycles with the crud ingest path.
+
+    Each phase gets an OCV snapshot and `ccv` timestamped CCV snapshots one
+    minute apart (a list gives a count per phase), then is completed. The first
+    CCV is a minute after the phase's OCV, or at `start` plus five hours per
+    phase already recorded when `start` is given.
+    """
+    from datetime import timedelta
+
+    import numpy as np
+
+    from app import crud
+
+    def record(test, cycles=1, ccv=3, start=None):
+        rng = np.random.default_rng(test.id)
+        counts = iter(ccv if isinstance(ccv, list) else [ccv] * cycles * 2)
+        num_cells = test.bank.num_cells
+        for _ in range(cycles * 2):
+            cycle, _ = crud.create_ocv_readings(db, test.id, (2.1 + rng.normal(0, 0.01, num_cells)).tolist())
+            first = start or cycle.start_time + timedelta(minutes=1)
+            snapshots = [
+                schemas.TimedReadingsCreate(
+                    readings=(2.0 - 0.01 * index + rng.normal(0, 0.005, num_cells)).tolist(),
+                    timestamp=first + timedelta(minutes=index),
+                )
+                for index in range(next(counts))
+            ]
+            if snapshots:
+                crud.create_ccv_batch(db, test.id, snapshots)
+            crud.complete_cycle(db, cycle.id)
+            db.refresh(test)
+            if start:
+                start += timedelta(hours=5)
+        return test
+
+    return record
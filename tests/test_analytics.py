@@ -0,0 +1,198 @@
+import inspect
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import analytics, cache, crud, pivot, schemas
+
+# Cell 1 crosses 1.75 V halfway-ish between its 2nd and 3rd snapshot, cell 2 never does
+VOLTAGES = [[2.0, 2.0], [1.9, 1.95], [1.7, 1.9]]
+
+
+def start_discharge(db, test):
+    """Complete the charge phase and take the discharge OCV, returns the cycle and the OCV's time."""
+    cycle, _ = crud.create_ocv_readings(db, test.id, [2.1] * test.bank.num_cells)
+    crud.complete_cycle(db, cycle.id)
+    cycle, _ = crud.create_ocv_readings(db, test.id, [2.1] * test.bank.num_cells)
+    matrix = pivot.build_cycle_matrices([cycle.id], test.bank.num_cells, *crud.get_reading_columns(db, [cycle.id]))
+    return cycle, matrix[cycle.id].ocv_time
+
+
+def post_ccv(db, test, first, voltages=VOLTAGES):
+    crud.create_ccv_batch(db, test.id, [
+        schemas.TimedReadingsCreate(readings=readings, timestamp=first + timedelta(minutes=index))
+        for index, readings in enumerate(voltages)
+    ])
+
+
+def test_cutoff_time_and_capacity_are_measured_from_the_ocv(db, make_test, storage_mode):
+    test = make_test(num_cells=2)
+    cycle, ocv_time = start_discharge(db, test)
+    post_ccv(db, test, ocv_time + timedelta(minutes=1))
+
+    result = analytics.analyze_discharge(db, test.id, 1.75, current=10)
+
+    curve = result["cycles"][0]
+    assert curve["elapsed_seconds"] == pytest.approx([60, 120, 180])
+    crossed, steady = curve["cells"]
+    # Linear between 1.9 V at 120 s and 1.7 V at 180 s
+    assert crossed["reached_cutoff"]
+    assert crossed["time_to_cutoff"] == pytest.approx(165)
+    assert crossed["discharged_seconds"] == pytest.approx(165)
+    assert crossed["capacity_ah"] == pytest.approx(10 * 165 / 3600)
+    assert not steady["reached_cutoff"]
+    assert steady["time_to_cutoff"] is None
+    assert steady["discharged_seconds"] == pytest.approx(180)
+    assert steady["end_voltage"] == pytest.approx(1.9)
+    assert steady["capacity_ah"] == pytest.approx(10 * 180 / 3600)
+
+
+def test_logger_clock_behind_the_server_gives_no_negative_times(db, make_test, storage_mode):
+    test = make_test(num_cells=2)
+    start_discharge(db, test)
+    # Snapshots stamped well before the server took the OCV
+    post_ccv(db, test, datetime(2026, 3, 1, 8, 0))
+
+    curve = analytics.analyze_discharge(db, test.id, 1.75, current=10)["cycles"][0]
+
+    assert curve["elapsed_seconds"] == pytest.approx([0, 60, 120])
+    assert curve["cells"][0]["time_to_cutoff"] == pytest.approx(105)
+    assert all(cell["capacity_ah"] > 0 for cell in curve["cells"])
+
+
+def test_close_cutoffs_get_their_own_cached_curves(db, make_test, record_cycles):
+    test = record_cycles(make_test(), ccv=5)
+    low, high = 1.97, 1.9700001
+
+    cached = analytics.analyze_discharge(db, test.id, low)
+    from_cache = analytics.analyze_discharge(db, test.id, high)
+    cache.report_cache.discard("")
+    fresh = analytics.analyze_discharge(db, test.id, high)
+
+    assert from_cache["cycles"] == fresh["cycles"]
+    assert from_cache["cycles"] != cached["cycles"]
+
+
+# Routes whose work is CPU-bound or does file I/O, they must not run on the event loop
+THREADPOOL_ROUTES = [
+    "/api/tests/{test_id}/analytics",
+    "/api/tests/{test_id}/summary",
+    "/api/tests/{test_id}/discharge",
+    "/api/tests/{test_id}/series",
+]
+
+
+@pytest.mark.parametrize("path", THREADPOOL_ROUTES)
+def test_heavy_routes_are_sync_handlers(path):
+    from app.main import app
+
+    endpoint = next(route.endpoint for route in app.routes if getattr(route, "path", None) == path)
+    assert not inspect.iscoroutinefunction(endpoint)
+
+
+def test_analytics_and_summary_routes(client, make_test, record_cycles):
+    test = record_cycles(make_test(num_cells=4), ccv=3)
+
+    analytics_response = client.get(f"/api/tests/{test.id}/analytics")
+    summary_response = client.get(f"/api/tests/{test.id}/summary")
+
+    assert analytics_response.status_code == 200
+    assert len(analytics_response.json()["cells"]) == 4
+    assert summary_response.status_code == 200
+    assert len(summary_response.json()["cycles"]) == 2
+    assert client.get("/api/tests/999999/analytics").status_code == 404
+    assert client.get("/api/tests/999999/summary").status_code == 404
+
+
+def test_discharge_route(client, db, make_test):
+    test = make_test(num_cells=2)
+    _, ocv_time = start_discharge(db, test)
+    post_ccv(db, test, ocv_time + timedelta(minutes=1))
+
+    response = client.get(f"/api/tests/{test.id}/discharge", params={"cutoff": 1.75, "current": 10})
+
+    assert response.status_code == 200
+    cells = response.json()["cycles"][0]["cells"]
+    assert cells[0]["time_to_cutoff"] == pytest.approx(165)
+    assert cells[1]["capacity_ah"] == pytest.approx(0.5)
+    assert client.get(f"/api/tests/{test.id}/discharge", params={"cutoff": 0}).status_code == 422
+    assert client.get("/api/tests/999999/discharge").status_code == 404
+
+
+def reference_lttb(times, values, points):
+    """Textbook single-series LTTB, indices of the kept points."""
+    every = (len(times) - 2) / (points - 2)
+    kept = [0]
+    for bucket in range(points - 2):
+        start, stop = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        following = slice(stop, min(int((bucket + 2) * every) + 1, len(times)))
+        if bucket == points - 3:
+            following = slice(len(times) - 1, len(times))
+        next_t, next_v = times[following].mean(), values[following].mean()
+        anchor_t, anchor_v = times[kept[-1]], values[kept[-1]]
+        area = np.abs((anchor_t - next_t) * (values[start:stop] - anchor_v)
+                      - (anchor_t - times[start:stop]) * (next_v - anchor_v))
+        kept.append(start + int(np.argmax(area)))
+    return kept + [len(times) - 1]
+
+
+def test_lttb_keeps_exactly_the_budget_with_both_ends():
+    rng = np.random.default_rng(0)
+    times = np.arange(1000, dtype=np.float64) * 60
+    voltages = 2.0 - np.cumsum(rng.normal(0.001, 0.002, (1000, 3)), axis=0)
+
+    keep = analytics.lttb(times, voltages, 50)
+
+    assert keep.sum(axis=0).tolist() == [50, 50, 50]
+    assert keep[0].all() and keep[-1].all()
+    for cell in range(3):
+        assert np.flatnonzero(keep[:, cell]).tolist() == reference_lttb(times, voltages[:, cell], 50)
+
+
+def test_lttb_returns_short_input_unchanged():
+    times = np.arange(20, dtype=np.float64)
+    voltages = np.linspace(2.0, 1.8, 40).reshape(20, 2)
+    voltages[5, 1] = np.nan
+
+    keep = analytics.lttb(times, voltages, 50)
+
+    np.testing.assert_array_equal(keep, ~np.isnan(voltages))
+
+
+def test_lttb_never_keeps_missing_readings():
+    rng = np.random.default_rng(1)
+    times = np.arange(300, dtype=np.float64)
+    voltages = 2.0 + rng.normal(0, 0.01, (300, 2))
+    # Cell 2 starts late and stops early
+    voltages[:10, 1] = voltages[-10:, 1] = np.nan
+
+    keep = analytics.lttb(times, voltages, 20)
+
+    assert not keep[np.isnan(voltages)].any()
+    assert keep[10, 1] and keep[289, 1]
+    assert keep[:, 1].sum() <= 20
+
+
+def test_series_route(client, make_test, record_cycles):
+    test = record_cycles(make_test(num_cells=2), ccv=[30, 4])
+
+    response = client.get(f"/api/tests/{test.id}/series", params={"points": 10})
+
+    assert response.status_code == 200
+    long_phase, short_phase = response.json()["cycles"]
+    assert long_phase["snapshots"] == 30
+    assert all(len(cell["elapsed_seconds"]) == len(cell["voltages"]) == 10 for cell in long_phase["cells"])
+    assert all(len(cell["voltages"]) == 4 for cell in short_phase["cells"])
+    assert long_phase["cells"][0]["elapsed_seconds"][0] == pytest.approx(60, abs=1)
+
+
+@pytest.mark.parametrize("points", ["2", "10001", "many"])
+def test_series_rejects_bad_point_budgets(client, make_test, points):
+    test = make_test()
+
+    assert client.get(f"/api/tests/{test.id}/series", params={"points": points}).status_code == 422
+
+
+def test_series_of_a_missing_test_is_404(client):
+    assert client.get("/api/tests/999999/series").status_code == 404
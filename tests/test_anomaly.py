@@ -0,0 +1,102 @@
+import asyncio
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import anomaly, crud, database, ingest
+
+
+def ccv_snapshots(cycle_id, values, first_sequence=1, start=datetime(2026, 3, 1, 8, 0)):
+    return [
+        ingest.snapshot(cycle_id, "CCV", "discharge", list(readings),
+                        sequence_number=first_sequence + offset, timestamp=start + timedelta(minutes=offset))
+        for offset, readings in enumerate(values)
+    ]
+
+
+def active_cycle(db, make_test, record_cycles, name):
+    """An active cycle with stored CCV summaries but no detector state, as after a restart."""
+    test = record_cycles(make_test(name=name), cycles=1, ccv=[3, 3])
+    crud.create_ocv_readings(db, test.id, [2.1] * test.bank.num_cells)
+    crud.create_ccv_readings(db, test.id, [2.0] * test.bank.num_cells)
+    anomaly.detector._states.clear()
+    return crud.get_active_cycle(db, test.id, test.current_cycle, test.current_phase)
+
+
+def test_concurrent_cold_starts_do_not_block_the_event_loop(db, make_test, record_cycles):
+    cycle_ids = [active_cycle(db, make_test, record_cycles, name).id for name in ("A", "B")]
+
+    async def observe(cycle_id):
+        async with database.AsyncSessionLocal() as session:
+            return await session.run_sync(
+                anomaly.detector.observe, cycle_id, ccv_snapshots(cycle_id, [[1.99] * 8], first_sequence=2)
+            )
+
+    async def main():
+        try:
+            return await asyncio.wait_for(asyncio.gather(*map(observe, cycle_ids)), timeout=10)
+        finally:
+            await database.async_engine.dispose()
+
+    results = []
+    # A blocked loop can't time itself out, so the loop runs in a thread the test can give up on
+    runner = threading.Thread(target=lambda: results.append(asyncio.run(main())), daemon=True)
+    runner.start()
+    runner.join(timeout=15)
+
+    assert not runner.is_alive(), "event loop blocked by concurrent observes"
+    assert len(results[0]) == 2
+
+
+def test_state_only_advances_when_the_ingest_commits(db, make_test, record_cycles, monkeypatch):
+    cycle = active_cycle(db, make_test, record_cycles, "Bank")
+    snapshots = [(datetime(2026, 3, 1, 12, minute), [1.99] * 8) for minute in range(3)]
+    crud.append_ccv_snapshots(db, cycle.id, "discharge", snapshots[:1])
+    state = anomaly.detector._states[cycle.id]
+    count, ewma = state.count, state.ewma.copy()
+
+    def fail(db, snapshots):
+        raise RuntimeError("write failed")
+
+    monkeypatch.setattr(ingest, "write_snapshots", fail)
+    with pytest.raises(RuntimeError):
+        crud.append_ccv_snapshots(db, cycle.id, "discharge", snapshots[1:])
+    db.rollback()
+
+    assert anomaly.detector._states[cycle.id] is state
+    assert state.count == count
+    np.testing.assert_array_equal(state.ewma, ewma)
+
+    monkeypatch.undo()
+    crud.append_ccv_snapshots(db, cycle.id, "discharge", snapshots[1:])
+    assert anomaly.detector._states[cycle.id].count == count + 2
+
+
+def test_overlapping_ingests_fall_back_to_the_committed_summary(db, make_test, record_cycles):
+    cycle = active_cycle(db, make_test, record_cycles, "Bank")
+    first = anomaly.detector.observe(db, cycle.id, ccv_snapshots(cycle.id, [[1.99] * 8], first_sequence=2))[1]
+    second = anomaly.detector.observe(db, cycle.id, ccv_snapshots(cycle.id, [[1.98] * 8], first_sequence=3))[1]
+
+    anomaly.detector.store(first)
+    assert cycle.id in anomaly.detector._states
+    anomaly.detector.store(second)
+    assert cycle.id not in anomaly.detector._states
+
+
+def test_check_stays_within_its_per_snapshot_budget():
+    rng = np.random.default_rng(0)
+    values = 2.0 + rng.normal(0, 0.005, (300, 200))
+    state = anomaly.CycleState.start(values[0])
+
+    times = []
+    for snapshot in values[1:]:
+        start = time.perf_counter()
+        anomaly.check(state, snapshot)
+        times.append(time.perf_counter() - start)
+
+    # About 0.1 ms here, the budget leaves room for slow CI machines
+    assert statistics.median(times) < 0.001
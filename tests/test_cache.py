@@ -0,0 +1,77 @@
+import os
+import threading
+
+import pytest
+
+from app import cache
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    return cache.ArtifactCache(str(tmp_path), max_bytes=1024 * 1024)
+
+
+def test_open_counts_hits_and_misses(artifacts):
+    artifacts.put("a.csv", b"content")
+
+    with artifacts.open("a.csv") as file:
+        assert file.read() == b"content"
+    assert artifacts.open("b.csv") is None
+
+    stats = artifacts.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_concurrent_lookups_are_all_counted(artifacts):
+    artifacts.put("a.csv", b"content")
+
+    def look_up():
+        for _ in range(500):
+            artifacts.open("a.csv").close()
+            artifacts.open("missing.csv")
+
+    threads = [threading.Thread(target=look_up) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = artifacts.stats()
+    assert (stats["hits"], stats["misses"]) == (4000, 4000)
+
+
+def test_opened_entry_survives_eviction(artifacts):
+    artifacts.put("a.csv", b"x" * 100_000)
+    file = artifacts.open("a.csv")
+
+    # Another writer pushes the directory over budget and evicts the entry
+    artifacts.max_bytes = 1
+    artifacts.put("b.csv", b"y")
+    assert not os.path.exists(artifacts.path("a.csv"))
+
+    assert b"".join(cache.iter_file(file, chunk_size=4096)) == b"x" * 100_000
+    assert file.closed
+
+
+def test_cached_export_is_served_from_the_open_file(client, db, make_test, record_cycles, monkeypatch):
+    test = record_cycles(make_test(num_cells=3, total_cycles=1), ccv=2)
+    assert test.status == "completed"
+
+    first = client.get(f"/api/tests/{test.id}/export")
+    hits = cache.report_cache.hits
+
+    # Evicted between the lookup and the response body being sent
+    opened = cache.report_cache.open
+
+    def open_then_evict(key):
+        file = opened(key)
+        os.remove(cache.report_cache.path(key))
+        return file
+
+    monkeypatch.setattr(cache.report_cache, "open", open_then_evict)
+    second = client.get(f"/api/tests/{test.id}/export")
+
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["content-length"] == str(len(first.content))
+    assert cache.report_cache.hits == hits + 1
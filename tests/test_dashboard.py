@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, exc
+
+from app import crud, database
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+
+def dashboard_statements(client, url):
+    with count_statements(database.engine) as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize("url", ["/", "/test/", "/test/?status=scheduled"])
+def test_dashboard_query_count_does_not_grow_with_tests(client, make_test, url):
+    make_test(name="Bank 0")
+    few = dashboard_statements(client, url)
+
+    for index in range(1, 40):
+        make_test(name=f"Bank {index}")
+    many = dashboard_statements(client, url)
+
+    assert many == few
+    assert many <= 2
+
+
+def test_cursor_pages_cover_every_test_once(db, make_test):
+    tests = [make_test(name=f"Bank {index}") for index in range(7)]
+    # Ties on start_time are broken by id
+    for test in tests[:4]:
+        test.start_time = datetime(2026, 1, 1)
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor = crud.get_dashboard_tests(db, limit=3, cursor=cursor)
+        seen.extend(row.id for row in rows)
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(test.id for test in tests)
+
+
+def test_tests_always_have_a_start_time(db, make_test):
+    test = make_test()
+    test.start_time = None
+    with pytest.raises(exc.IntegrityError):
+        db.commit()
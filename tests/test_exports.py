@@ -0,0 +1,215 @@
+import asyncio
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+import pytest
+
+from app import cache, crud, pdf, reports
+from benchmarks.baselines import baseline_csv
+
+
+@pytest.fixture
+def thread_render_pool(monkeypatch):
+    """Render PDFs in threads, spawning worker processes is slow for a test."""
+    pool = pdf.RenderPool(1, "thread", 4)
+    monkeypatch.setattr(pdf, "render_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def test_csv_matches_the_original_export(db, make_test, record_cycles, storage_mode):
+    # Different snapshot counts per phase give each cycle its own CCV columns
+    test = record_cycles(make_test(num_cells=6, total_cycles=2), cycles=2, ccv=[3, 5, 0, 2])
+
+    exported = b"".join(reports.iter_test_csv(test.id)).decode()
+
+    db.expire_all()
+    assert exported == baseline_csv(test)
+
+
+def test_csv_route_serves_the_export(client, db, make_test, record_cycles):
+    test = record_cycles(make_test(num_cells=3), ccv=2)
+
+    response = client.get(f"/api/tests/{test.id}/export")
+
+    assert response.status_code == 200
+    db.expire_all()
+    assert response.text == baseline_csv(test)
+    assert client.get("/api/tests/999999/export").status_code == 404
+
+
+def test_pdf_report_is_built_off_the_event_loop(client, make_test, record_cycles, thread_render_pool, monkeypatch):
+    test = record_cycles(make_test(num_cells=3, total_cycles=1), ccv=2)
+    loops = []
+
+    def pdf_report(db, test_id):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return build(db, test_id)
+
+    build = reports.pdf_report
+    monkeypatch.setattr(reports, "pdf_report", pdf_report)
+
+    response = client.get(f"/api/tests/{test.id}/export/pdf")
+
+    assert response.status_code == 200
+    assert response.content.startswith(b"%PDF")
+    assert loops == [None]
+
+
+def test_pdf_of_a_completed_test_is_served_from_the_cache(client, make_test, record_cycles, thread_render_pool):
+    test = record_cycles(make_test(num_cells=3, total_cycles=1), ccv=2)
+
+    first = client.get(f"/api/tests/{test.id}/export/pdf")
+    hits = cache.report_cache.stats()["hits"]
+    second = client.get(f"/api/tests/{test.id}/export/pdf")
+
+    assert second.content == first.content
+    assert second.headers["content-length"] == str(len(first.content))
+    assert cache.report_cache.stats()["hits"] == hits + 1
+    assert client.get("/api/tests/999999/export/pdf").status_code == 404
+
+
+def stored_readings(db, test):
+    """Every reading of a test as the columnar export should hold it, in a comparable order."""
+    db.expire_all()
+    rows = []
+    for cycle in crud.get_cycles_for_test(db, test.id):
+        for reading in crud.get_readings_for_cycle(db, cycle.id):
+            rows.append((cycle.cycle_number, cycle.phase, reading.reading_type, reading.sequence_number,
+                         reading.cell_number, float(np.float32(reading.value)),
+                         reading.timestamp.replace(tzinfo=timezone.utc)))
+    return sorted(rows, key=lambda row: (row[0], row[1], row[2], row[3] or 0, row[4]))
+
+
+def exported_rows(table):
+    rows = zip(*(table.column(name).to_pylist() for name in table.schema.names))
+    return sorted(rows, key=lambda row: (row[0], row[1], row[2], row[3] or 0, row[4]))
+
+
+def assert_readings_schema(schema):
+    assert schema.field("phase").type == pa.dictionary(pa.int8(), pa.string())
+    assert schema.field("reading_type").type == pa.dictionary(pa.int8(), pa.string())
+    assert schema.field("value").type == pa.float32()
+    assert schema.field("timestamp").type == pa.timestamp("us", tz="UTC")
+    assert schema.names == reports.READINGS_SCHEMA.names
+
+
+def test_parquet_export_is_typed_and_dictionary_encoded(client, db, make_test, record_cycles, storage_mode):
+    test = record_cycles(make_test(num_cells=4, total_cycles=1), ccv=[2, 3])
+
+    response = client.get(f"/api/tests/{test.id}/export/parquet")
+
+    assert response.status_code == 200
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    table = parquet.read()
+    assert_readings_schema(table.schema)
+    assert table.schema.metadata[b"test_id"] == str(test.id).encode()
+    assert exported_rows(table) == stored_readings(db, test)
+    for index in range(parquet.metadata.num_columns):
+        column = parquet.metadata.row_group(0).column(index)
+        assert any("DICTIONARY" in encoding for encoding in column.encodings)
+        assert column.compression == reports.COLUMNAR_COMPRESSION.upper()
+
+
+def test_arrow_export_streams_the_same_readings(client, db, make_test, record_cycles, storage_mode):
+    test = record_cycles(make_test(num_cells=4, total_cycles=1), ccv=[2, 3])
+
+    response = client.get(f"/api/tests/{test.id}/export/arrow")
+
+    assert response.status_code == 200
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert_readings_schema(table.schema)
+    assert exported_rows(table) == stored_readings(db, test)
+    assert client.get("/api/tests/999999/export/arrow").status_code == 404
+
+
+def test_bulk_csv_has_one_deflated_member_per_test(client, db, make_test, record_cycles):
+    tests = [record_cycles(make_test(num_cells=3, name=f"Bank {n}"), ccv=2) for n in range(2)]
+
+    response = client.get("/api/export/bulk", params={"test_ids": [test.id for test in tests]})
+
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == [f"test_{test.id}_export.csv" for test in tests]
+    for test, member in zip(tests, archive.infolist()):
+        assert member.compress_type == zipfile.ZIP_DEFLATED
+        assert archive.read(member) == b"".join(reports.iter_test_csv(test.id))
+
+
+def test_bulk_parquet_members_are_stored_uncompressed(client, db, make_test, record_cycles):
+    tests = [record_cycles(make_test(num_cells=3, name=f"Bank {n}"), ccv=2) for n in range(2)]
+
+    response = client.get("/api/export/bulk", params={"test_ids": [test.id for test in tests], "format": "parquet"})
+
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.namelist() == [f"test_{test.id}_readings.parquet" for test in tests]
+    for test, member in zip(tests, archive.infolist()):
+        assert member.compress_type == zipfile.ZIP_STORED
+        table = pq.read_table(io.BytesIO(archive.read(member)))
+        assert exported_rows(table) == stored_readings(db, test)
+
+
+def test_bulk_ids_outside_the_range_are_left_out_not_missing(client, db, make_test):
+    old, new = make_test(name="Old"), make_test(name="New")
+    old.start_time, new.start_time = datetime(2026, 1, 15), datetime(2026, 2, 15)
+    db.commit()
+    params = {"test_ids": [old.id, new.id], "started_from": "2026-02-01", "started_to": "2026-02-28"}
+
+    response = client.get("/api/export/bulk", params=params)
+
+    assert response.status_code == 200
+    assert zipfile.ZipFile(io.BytesIO(response.content)).namelist() == [f"test_{new.id}_export.csv"]
+    response = client.get("/api/export/bulk", params={**params, "test_ids": [new.id, 999999]})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Tests not found: [999999]"
+
+
+SHEET_NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def xlsx_sheets(content):
+    """{sheet name: rows of cell elements} of a workbook, read with the stdlib."""
+    archive = zipfile.ZipFile(io.BytesIO(content))
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    names = [sheet.get("name") for sheet in workbook.iterfind("x:sheets/x:sheet", SHEET_NS)]
+    return {
+        name: [row.findall("x:c", SHEET_NS)
+               for row in ET.fromstring(archive.read(f"xl/worksheets/sheet{index}.xml")).iterfind(".//x:row", SHEET_NS)]
+        for index, name in enumerate(names, start=1)
+    }
+
+
+def test_xlsx_has_a_numeric_sheet_per_cycle_and_phase(client, db, make_test, record_cycles, storage_mode):
+    test = record_cycles(make_test(num_cells=3, total_cycles=2), cycles=2, ccv=[2, 3, 0, 1])
+
+    response = client.get(f"/api/tests/{test.id}/export/xlsx")
+
+    assert response.status_code == 200
+    sheets = xlsx_sheets(response.content)
+    db.expire_all()
+    cycles = sorted(crud.get_cycles_for_test(db, test.id), key=lambda c: (c.cycle_number, c.phase.capitalize()))
+    assert list(sheets) == [f"Cycle {cycle.cycle_number} {cycle.phase.capitalize()}" for cycle in cycles]
+    for cycle, rows in zip(cycles, sheets.values()):
+        readings = crud.get_readings_for_cycle(db, cycle.id)
+        assert len(rows) == 1 + test.bank.num_cells
+        for cell_number, row in enumerate(rows[1:], start=1):
+            # No t="s"/t="str": every cell is a number, not text
+            assert all(cell.get("t") is None for cell in row)
+            values = [float(cell.find("x:v", SHEET_NS).text) for cell in row]
+            # OCV first, then the CCV snapshots in sequence order
+            expected = sorted(
+                (r for r in readings if r.cell_number == cell_number),
+                key=lambda r: (r.reading_type != "OCV", r.sequence_number or 0)
+            )
+            assert values == pytest.approx([cell_number, *(r.value for r in expected)], abs=1e-6)
+    assert client.get("/api/tests/999999/export/xlsx").status_code == 404
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import event
+
+from app import crud, database
+
+
+def captured_selects(engine, fn):
+    """Run `fn()` and return the (statement, parameters) of every SELECT it sent."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+
+def sequential_scans(engine, statement, parameters):
+    """Plan lines of `statement` that read a whole table instead of going through an index."""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if engine.dialect.name == "postgresql":
+            # Tiny test tables are cheaper to scan, only a missing index should force it
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + statement, parameters)
+            plan = [row[0] for row in cursor.fetchall()]
+            return [line for line in plan if "Seq Scan" in line]
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        plan = [row[-1] for row in cursor.fetchall()]
+        return [line for line in plan if line.startswith("SCAN") and "INDEX" not in line]
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def sorts(engine, statement, parameters):
+    """Plan lines of `statement` that sort rows instead of reading them in index order."""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if engine.dialect.name == "postgresql":
+            cursor.execute("SET LOCAL enable_sort = off")
+            cursor.execute("EXPLAIN " + statement, parameters)
+            return [row[0] for row in cursor.fetchall() if "Sort" in row[0]]
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [row[-1] for row in cursor.fetchall() if "TEMP B-TREE" in row[-1]]
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def seeded(db, make_test):
+    tests = [make_test(num_cells=4, name=f"Bank {index}") for index in range(3)]
+    for test in tests:
+        crud.create_ocv_readings(db, test.id, [2.1] * 4)
+        for _ in range(3):
+            crud.create_ccv_readings(db, test.id, [2.0] * 4)
+    return tests[1]
+
+
+@pytest.mark.parametrize("query", [
+    "get_active_cycle",
+    "get_cycles_for_test",
+    "get_readings_for_cycle",
+    "get_reading_columns",
+])
+def test_hot_queries_use_an_index(db, seeded, query):
+    test = seeded
+    cycle = crud.get_active_cycle(db, test.id, test.current_cycle, test.current_phase)
+    calls = {
+        "get_active_cycle": lambda: crud.get_active_cycle(db, test.id, cycle.cycle_number, cycle.phase),
+        "get_cycles_for_test": lambda: crud.get_cycles_for_test(db, test.id),
+        "get_readings_for_cycle": lambda: crud.get_readings_for_cycle(db, cycle.id),
+        "get_reading_columns": lambda: crud.get_reading_columns(db, [cycle.id]),
+    }
+
+    statements = captured_selects(database.engine, calls[query])
+
+    assert statements
+    for statement, parameters in statements:
+        assert sequential_scans(database.engine, statement, parameters) == [], statement
+
+
+def test_streamed_exports_read_in_index_order(db, seeded):
+    cycle = crud.get_cycles_for_test(db, seeded.id)[0]
+
+    def stream():
+        crud.iter_cycle_readings(db, cycle.id).all()
+        crud.iter_typed_readings(db, cycle.id).all()
+
+    statements = captured_selects(database.engine, stream)
+
+    assert len(statements) == 2
+    for statement, parameters in statements:
+        assert sequential_scans(database.engine, statement, parameters) == [], statement
+        assert sorts(database.engine, statement, parameters) == [], statement
@@ -0,0 +1,123 @@
+import asyncio
+import csv
+import io
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.util import greenlet_spawn
+
+from app import crud, ingest, models
+
+
+class FakeConnection:
+    """Stands in for a connection of the given DBAPI driver, recording executemany calls."""
+
+    def __init__(self, driver):
+        self.dialect = SimpleNamespace(driver=driver)
+        self.executed = []
+
+    def execute(self, statement, rows):
+        self.executed.append(rows)
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self._connection = FakeConnection(driver)
+
+    def connection(self):
+        return self._connection
+
+
+def reading_rows(count, cycle_id=1):
+    timestamp = datetime(2026, 1, 1, 12, 0, 0)
+    return ingest.snapshot_rows(
+        ingest.snapshot(cycle_id, "CCV", "discharge", [2.0 + cell / 1000 for cell in range(count)],
+                        sequence_number=3, timestamp=timestamp)
+    )
+
+
+def test_snapshot_is_written_in_one_statement(db, make_test):
+    test = make_test(num_cells=8)
+
+    cycle, stats = crud.create_ocv_readings(db, test.id, [2.1] * 8)
+    assert stats.rows == 8
+    assert stats.method == ("snapshot" if ingest.STORAGE_MODE == "snapshot" else "insert")
+
+    cycle, stats, alerts = crud.create_ccv_readings(db, test.id, [2.0] * 8)
+    assert stats.rows == 8
+    if ingest.STORAGE_MODE != "snapshot":
+        stored = db.scalar(select(func.count()).select_from(models.Reading).where(models.Reading.cycle_id == cycle.id))
+        assert stored == 16
+
+
+@pytest.mark.parametrize("driver", ["psycopg2", "asyncpg"])
+@pytest.mark.parametrize("offset, method", [(-1, "insert"), (0, "copy"), (1, "copy")])
+def test_copy_is_used_from_copy_min_rows(monkeypatch, driver, offset, method):
+    copied = []
+    monkeypatch.setattr(ingest, f"_copy_{driver}", lambda connection, rows: copied.append(rows))
+    session = FakeSession(driver)
+    rows = reading_rows(ingest.COPY_MIN_ROWS + offset)
+
+    stats = ingest.insert_readings(session, rows)
+
+    assert stats.method == method
+    assert stats.rows == len(rows)
+    if method == "copy":
+        assert copied == [rows] and session.connection().executed == []
+    else:
+        assert copied == [] and session.connection().executed == [rows]
+
+
+def test_other_drivers_never_copy(monkeypatch):
+    monkeypatch.setattr(ingest, "_copy_psycopg2", pytest.fail)
+    monkeypatch.setattr(ingest, "_copy_asyncpg", pytest.fail)
+    session = FakeSession("pysqlite")
+
+    stats = ingest.insert_readings(session, reading_rows(ingest.COPY_MIN_ROWS * 2))
+
+    assert stats.method == "insert"
+
+
+def test_copy_psycopg2_streams_csv_in_column_order():
+    statements = []
+
+    class Cursor:
+        def copy_expert(self, sql, buffer):
+            statements.append((sql, buffer.read()))
+
+        def close(self):
+            pass
+
+    connection = SimpleNamespace(connection=SimpleNamespace(dbapi_connection=SimpleNamespace(cursor=Cursor)))
+    rows = reading_rows(3)
+    rows[1]["sequence_number"] = None
+
+    ingest._copy_psycopg2(connection, rows)
+
+    (sql, payload), = statements
+    assert sql.startswith(f"COPY readings ({', '.join(ingest.READING_COLUMNS)}) FROM STDIN")
+    records = list(csv.reader(io.StringIO(payload)))
+    assert records[0] == ["1", "CCV", "1", "2.0", "3", "2026-01-01 12:00:00", "discharge"]
+    assert records[1][4] == ""  # NULL in COPY csv format
+    assert len(records) == 3
+
+
+def test_copy_asyncpg_sends_records_in_column_order():
+    calls = []
+
+    class DriverConnection:
+        async def copy_records_to_table(self, table, records, columns):
+            calls.append((table, records, columns))
+
+    connection = SimpleNamespace(connection=SimpleNamespace(driver_connection=DriverConnection()))
+    rows = reading_rows(2)
+
+    # await_only needs the greenlet context run_sync provides
+    asyncio.run(greenlet_spawn(ingest._copy_asyncpg, connection, rows))
+
+    (table, records, columns), = calls
+    assert table == "readings"
+    assert columns == list(ingest.READING_COLUMNS)
+    assert records == [tuple(row[column] for column in ingest.READING_COLUMNS) for row in rows]
@@ -0,0 +1,104 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud, database, jobs
+
+
+@pytest.fixture
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "EXPORT_JOB_DIR", str(tmp_path))
+    return tmp_path
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            # Pooled async connections belong to this event loop
+            await database.async_engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_only_jobs_without_a_recent_heartbeat_are_requeued(db, make_test):
+    test = make_test()
+    crud.create_export_job(db, test.id, "csv")
+    crud.create_export_job(db, test.id, "csv")
+    lost, alive = crud.claim_export_job(db), crud.claim_export_job(db)
+
+    # Both started long ago, only one still has a worker refreshing it
+    db.query(type(lost)).update({"started_at": datetime.utcnow() - timedelta(hours=2),
+                                 "heartbeat_at": datetime.utcnow() - timedelta(hours=2)})
+    db.commit()
+    assert crud.touch_export_job(db, alive.id, alive.attempt)
+
+    assert crud.requeue_stale_export_jobs(db, datetime.utcnow() - timedelta(minutes=5)) == 1
+    db.expire_all()
+    assert crud.get_export_job(db, lost.id).status == "queued"
+    assert crud.get_export_job(db, alive.id).status == "running"
+
+
+def test_a_requeued_attempt_loses_its_claim(db, make_test):
+    test = make_test()
+    job = crud.create_export_job(db, test.id, "csv")
+    first = crud.claim_export_job(db).attempt
+    crud.requeue_stale_export_jobs(db, datetime.utcnow() + timedelta(seconds=1))
+    second = crud.claim_export_job(db).attempt
+    assert second == first + 1
+
+    assert not crud.touch_export_job(db, job.id, first)
+    assert not crud.owns_export_job(db, job.id, first)
+    assert not crud.finish_export_job(db, job.id, first, size_bytes=1)
+    assert crud.finish_export_job(db, job.id, second, size_bytes=2)
+    db.expire_all()
+    assert crud.get_export_job(db, job.id).size_bytes == 2
+
+
+def test_heartbeat_is_refreshed_while_the_export_runs(db, make_test, job_dir, monkeypatch):
+    test = make_test()
+    crud.create_export_job(db, test.id, "csv")
+    job = crud.claim_export_job(db)
+    claimed_at = job.heartbeat_at
+    monkeypatch.setattr(jobs, "EXPORT_JOB_HEARTBEAT_SECONDS", 0.02)
+
+    def slow_csv(test_id, path, key):
+        time.sleep(0.3)
+        with open(path, "wb") as file:
+            file.write(b"csv")
+
+    monkeypatch.setattr(jobs, "_write_csv", slow_csv)
+    run(jobs.ExportWorker(1)._execute(job))
+
+    db.expire_all()
+    finished = crud.get_export_job(db, job.id)
+    assert finished.status == "completed"
+    assert finished.heartbeat_at > claimed_at
+    assert (job_dir / os.path.basename(jobs.job_path(job))).read_bytes() == b"csv"
+
+
+def test_result_of_a_lost_claim_is_discarded(db, make_test, job_dir, monkeypatch):
+    test = make_test()
+    crud.create_export_job(db, test.id, "csv")
+    job = crud.claim_export_job(db)
+    attempt = job.attempt
+
+    def csv_while_reclaimed(test_id, path, key):
+        # The job is requeued and picked up elsewhere while this attempt still renders
+        with database.SessionLocal() as other:
+            crud.requeue_stale_export_jobs(other, datetime.utcnow() + timedelta(seconds=1))
+            crud.claim_export_job(other)
+        with open(path, "wb") as file:
+            file.write(b"stale")
+
+    monkeypatch.setattr(jobs, "_write_csv", csv_while_reclaimed)
+    run(jobs.ExportWorker(1)._execute(job))
+
+    db.expire_all()
+    current = crud.get_export_job(db, job.id)
+    assert (current.status, current.attempt) == ("running", attempt + 1)
+    assert os.listdir(job_dir) == []
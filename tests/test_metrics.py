@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+
+from app.metrics import PoolMetrics, instrumented_pool
+
+
+def test_checkout_timeouts_are_counted():
+    metrics = PoolMetrics()
+    engine = create_engine(
+        "sqlite://", poolclass=instrumented_pool(QueuePool, metrics),
+        pool_size=1, max_overflow=0, pool_timeout=0.01,
+    )
+    held = engine.connect()
+    for _ in range(3):
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    held.close()
+
+    stats = metrics.snapshot(engine.pool)
+    assert stats["timeouts"] == 3
+    assert stats["wait_seconds"]["count"] == 4
+
+
+def test_concurrent_timeouts_are_not_lost():
+    metrics = PoolMetrics()
+
+    def time_out():
+        for _ in range(10000):
+            metrics.timed_out()
+
+    threads = [threading.Thread(target=time_out) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert metrics.timeouts == 80000
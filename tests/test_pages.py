@@ -0,0 +1,34 @@
+from app import crud
+
+
+def test_dashboard_lists_tests(client, make_test):
+    make_test(name="Alpha bank")
+    make_test(name="Beta bank")
+
+    for url in ("/", "/test/"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "Alpha bank" in response.text and "Beta bank" in response.text
+
+
+def test_details_page_renders_readings(client, db, make_test):
+    test = make_test(num_cells=4)
+    crud.create_ocv_readings(db, test.id, [2.1, 2.2, 2.3, 2.4])
+    crud.create_ccv_readings(db, test.id, [2.0, 2.0, 1.9, 2.0])
+
+    response = client.get(f"/test/{test.id}")
+
+    assert response.status_code == 200
+    assert "Cell Analytics" in response.text
+    assert "2.30" in response.text
+
+
+def test_take_readings_form(client, make_test):
+    test = make_test()
+
+    assert client.get(f"/test/{test.id}/readings").status_code == 200
+
+
+def test_missing_test_pages_are_404(client):
+    assert client.get("/test/999999").status_code == 404
+    assert client.get("/test/999999/readings").status_code == 404
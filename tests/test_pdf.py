@@ -0,0 +1,62 @@
+import re
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import LongTable
+
+from app import pdf
+
+# A4 less the report's 72pt margins
+FRAME_WIDTH, FRAME_HEIGHT = A4[0] - 144, A4[1] - 144
+
+
+def readings_table(num_cells, ccv_snapshots):
+    header = ['Cell #', 'OCV (V)'] + [f'CCV {seq} (V)' for seq in range(1, ccv_snapshots + 1)]
+    return [header] + [[str(cell), "2.10", *["1.95"] * ccv_snapshots] for cell in range(1, num_cells + 1)]
+
+
+def test_wide_tables_are_split_into_column_chunks_that_fit():
+    table = readings_table(10, 40)
+
+    chunks = list(pdf.readings_tables(table, FRAME_WIDTH))
+
+    assert len(chunks) > 1
+    assert [first for first, _, _ in chunks][0] == 'OCV (V)'
+    assert chunks[-1][1] == 'CCV 40 (V)'
+    covered = []
+    for _, _, chunk in chunks:
+        assert isinstance(chunk, LongTable)
+        assert chunk.repeatRows == 1
+        assert sum(chunk._colWidths) <= FRAME_WIDTH
+        assert [row[0] for row in chunk._cellvalues] == [row[0] for row in table]
+        covered.extend(chunk._cellvalues[0][1:])
+    assert covered == table[0][1:]
+
+
+def test_tall_chunks_repeat_the_header_on_every_page():
+    table = readings_table(300, 40)
+
+    for _, _, chunk in pdf.readings_tables(table, FRAME_WIDTH):
+        chunk.wrap(FRAME_WIDTH, FRAME_HEIGHT)
+        pages = chunk.split(FRAME_WIDTH, FRAME_HEIGHT)
+        assert len(pages) > 1
+        header = chunk._cellvalues[0]
+        assert all(page._cellvalues[0] == header for page in pages)
+
+
+def test_large_report_paginates_every_column():
+    table = readings_table(300, 40)
+    report = {
+        "bank_name": "Bank",
+        "test_id": 1,
+        "status": "Completed",
+        "total_cycles": 1,
+        "generated": "2026-03-01 08:00:00",
+        "cycles": [{"cycle_number": 1, "table": table, "duration": "4h 0m"}],
+    }
+    chunks = len(list(pdf.readings_tables(table, FRAME_WIDTH)))
+    rows_per_page = int(FRAME_HEIGHT // pdf.READINGS_ROW_HEIGHT) - 1
+
+    content = pdf.render_test_report(report)
+
+    pages = len(re.findall(rb"/Type /Page\b", content))
+    assert pages >= chunks * -(-300 // rows_per_page)
@@ -0,0 +1,140 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import crud, database, ingest, schemas
+
+NUM_CELLS = 3
+START = datetime(2026, 3, 1, 8, 0)
+
+
+@pytest.fixture
+def active_test(db, make_test):
+    test = make_test(num_cells=NUM_CELLS)
+    crud.create_ocv_readings(db, test.id, [2.1] * NUM_CELLS)
+    return test
+
+
+def stored_ccv(db, test):
+    """{sequence_number: (timestamp, [values in cell order])} of the active cycle."""
+    db.expire_all()
+    cycle = crud.get_active_cycle(db, test.id, test.current_cycle, test.current_phase)
+    snapshots = {}
+    for reading in crud.get_readings_for_cycle(db, cycle.id):
+        if reading.reading_type == "CCV":
+            timestamp, values = snapshots.setdefault(reading.sequence_number, (reading.timestamp, {}))
+            values[reading.cell_number] = reading.value
+    return {sequence: (timestamp, [values[cell] for cell in sorted(values)])
+            for sequence, (timestamp, values) in snapshots.items()}
+
+
+def snapshot(minute, value):
+    return {"readings": [value] * NUM_CELLS, "timestamp": (START + timedelta(minutes=minute)).isoformat()}
+
+
+def test_batch_gets_consecutive_sequences_in_timestamp_order(client, db, active_test, storage_mode):
+    # Sent out of order, numbered by time
+    batch = [snapshot(5, 1.95), snapshot(1, 2.0), snapshot(3, 1.98)]
+
+    response = client.post(f"/api/tests/{active_test.id}/ccv/batch", json={"snapshots": batch})
+    follow_up = client.post(f"/api/tests/{active_test.id}/ccv/batch", json={"snapshots": [snapshot(7, 1.9)]})
+
+    assert response.status_code == 201
+    assert response.json()["sequences"] == [1, 2, 3]
+    assert follow_up.json()["sequences"] == [4]
+    stored = stored_ccv(db, active_test)
+    assert sorted(stored) == [1, 2, 3, 4]
+    assert [stored[sequence][0] for sequence in (1, 2, 3, 4)] == [START + timedelta(minutes=m) for m in (1, 3, 5, 7)]
+    assert [stored[sequence][1][0] for sequence in (1, 2, 3, 4)] == pytest.approx([2.0, 1.98, 1.95, 1.9])
+
+
+def test_batch_is_written_in_one_transaction(client, active_test):
+    commits = []
+    engine = database.async_engine.sync_engine
+
+    def count(connection):
+        commits.append(connection)
+
+    event.listen(engine, "commit", count)
+    try:
+        response = client.post(f"/api/tests/{active_test.id}/ccv/batch",
+                               json={"snapshots": [snapshot(minute, 2.0) for minute in range(4)]})
+    finally:
+        event.remove(engine, "commit", count)
+
+    assert response.status_code == 201
+    assert len(commits) == 1
+
+
+def test_failed_batch_leaves_nothing_behind(db, active_test, monkeypatch):
+    write = ingest.write_snapshots
+
+    def write_then_fail(db, snapshots):
+        write(db, snapshots)
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(ingest, "write_snapshots", write_then_fail)
+    with pytest.raises(RuntimeError):
+        crud.create_ccv_batch(db, active_test.id, [
+            schemas.TimedReadingsCreate(readings=[2.0] * NUM_CELLS, timestamp=START + timedelta(minutes=minute))
+            for minute in range(3)
+        ])
+    db.rollback()
+    monkeypatch.undo()
+
+    assert stored_ccv(db, active_test) == {}
+    # The sequence numbers reserved by the failed batch were rolled back too
+    _, _, sequences, _ = crud.create_ccv_batch(db, active_test.id, [
+        schemas.TimedReadingsCreate(readings=[2.0] * NUM_CELLS, timestamp=START)
+    ])
+    assert sequences == [1]
+
+
+@pytest.mark.parametrize("bad", [
+    {"readings": [2.0] * (NUM_CELLS - 1), "timestamp": START.isoformat()},
+    {"readings": [2.0] * NUM_CELLS},
+    {"readings": ["high"] * NUM_CELLS, "timestamp": START.isoformat()},
+])
+def test_invalid_snapshot_rejects_the_whole_batch(client, db, active_test, bad):
+    batch = [snapshot(0, 2.0), bad, snapshot(2, 1.9)]
+
+    response = client.post(f"/api/tests/{active_test.id}/ccv/batch", json={"snapshots": batch})
+
+    assert response.status_code == 422
+    assert stored_ccv(db, active_test) == {}
+
+
+def test_empty_batch_and_missing_test(client, active_test):
+    assert client.post(f"/api/tests/{active_test.id}/ccv/batch", json={"snapshots": []}).status_code == 422
+    assert client.post("/api/tests/999999/ccv/batch", json={"snapshots": [snapshot(0, 2.0)]}).status_code == 404
+
+
+def test_concurrent_loggers_get_unique_gap_free_sequences(db, active_test):
+    loggers, submissions = 4, 10
+    barrier = threading.Barrier(loggers)
+    results, errors = [], []
+
+    def submit(logger):
+        with database.SessionLocal() as session:
+            barrier.wait()
+            for index in range(submissions):
+                try:
+                    results.extend(crud.create_ccv_batch(session, active_test.id, [
+                        schemas.TimedReadingsCreate(readings=[2.0] * NUM_CELLS,
+                                                    timestamp=START + timedelta(seconds=logger * 100 + index))
+                    ])[2])
+                except Exception as exc:
+                    errors.append(exc)
+                    session.rollback()
+
+    threads = [threading.Thread(target=submit, args=(logger,)) for logger in range(loggers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(results) == list(range(1, loggers * submissions + 1))
+    assert sorted(stored_ccv(db, active_test)) == sorted(results)
@@ -0,0 +1,73 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import crud, ingest
+
+NUM_CELLS = 3
+
+
+@pytest.fixture
+def active_test(db, make_test):
+    test = make_test(num_cells=NUM_CELLS)
+    crud.create_ocv_readings(db, test.id, [2.1] * NUM_CELLS)
+    return test
+
+
+def line(minute, readings=None):
+    timestamp = datetime(2026, 3, 1, 8, 0) + timedelta(minutes=minute)
+    return json.dumps({"readings": readings or [2.0] * NUM_CELLS, "timestamp": timestamp.isoformat()}).encode()
+
+
+def stored_sequences(db, test):
+    db.expire_all()
+    cycle = crud.get_active_cycle(db, test.id, test.current_cycle, test.current_phase)
+    return sorted({reading.sequence_number for reading in crud.get_readings_for_cycle(db, cycle.id)
+                   if reading.reading_type == "CCV"})
+
+
+def post(client, test, lines, **params):
+    # One chunk per line, as a logger would send them
+    return client.post(f"/api/tests/{test.id}/ccv/stream", params=params,
+                       content=iter([item + b"\n" for item in lines[:-1]] + lines[-1:]))
+
+
+def test_stream_commits_in_batches(client, db, active_test, storage_mode):
+    response = post(client, active_test, [line(minute) for minute in range(7)], batch_size=3)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["success"]
+    assert (body["lines"], body["accepted"], body["batches"], body["committed_lines"]) == (7, 7, 3, 7)
+    assert body["rows"] == 7 * NUM_CELLS
+    assert stored_sequences(db, active_test) == list(range(1, 8))
+
+
+def test_rejected_lines_are_reported_and_the_rest_stored(client, db, active_test):
+    lines = [line(0), b"{not json", line(1, [2.0] * (NUM_CELLS + 1)), b"", line(2)]
+
+    response = post(client, active_test, lines, batch_size=2)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert not body["success"]
+    assert (body["accepted"], body["rejected"], body["committed_lines"]) == (2, 2, 5)
+    assert [error["line"] for error in body["errors"]] == [2, 3]
+    assert "Expected 3 readings" in body["errors"][1]["error"]
+    assert stored_sequences(db, active_test) == [1, 2]
+
+
+def test_oversized_line_keeps_committed_batches_and_drops_the_pending_one(
+        client, db, active_test, monkeypatch):
+    monkeypatch.setattr(ingest, "STREAM_MAX_LINE_BYTES", 200)
+    lines = [line(minute) for minute in range(5)] + [b'{"readings": [' + b"2.0, " * 100]
+
+    response = post(client, active_test, lines, batch_size=3)
+
+    assert response.status_code == 413
+    detail = response.json()["detail"]
+    assert "Line 6 exceeds 200 bytes" in detail["error"]
+    # Lines 4 and 5 were still pending when the stream was cut off
+    assert (detail["committed_lines"], detail["accepted"], detail["batches"]) == (3, 3, 1)
+    assert stored_sequences(db, active_test) == [1, 2, 3]